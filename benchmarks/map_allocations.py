@@ -0,0 +1,89 @@
+"""Memory allocated while mapping one 0xAxxx diagnosis response into its SdoDataBody.
+
+Maps the same fully enabled ``DiagnosisData`` payload repeatedly and prints, per mapped response, the time, the peak of
+temporary memory above the baseline and the number of memory blocks allocated and still alive afterwards, measured with
+:mod:`tracemalloc`. ``asdict`` replays the previous mapping, which deep copied the container to find the enabled
+entries and decoded every value; ``copy`` and ``in place`` are ``SdoDataController._map`` with ``in_place`` off and on.
+``lazy`` maps with ``lazy`` on and then reads ``ALStatus`` and ``LinkConnStatus`` only.
+
+    python benchmarks/map_allocations.py --number 2000
+"""
+import argparse
+import gc
+import struct
+import timeit
+import tracemalloc
+from dataclasses import asdict, fields
+from pyetg1510 import LoggingLevel, SysLog
+from pyetg1510.mailbox import SdoDataController, is_primitive
+from pyetg1510.sdo_axxx_master_diagnosis import DiagnosisData
+
+
+def asdict_map(sdo_data: DiagnosisData, raw_data: bytes):
+    """Map the way ``SdoDataController._map`` did before unpack plans."""
+    values = list(struct.unpack(sdo_data.unpack_format, raw_data))
+    values = [f.strip(b"\0").decode() if type(f) is bytes else f for f in values]
+    enabled = {k: v for k, v in asdict(sdo_data).items() if v["enable"]}
+    i = 0
+    for key in enabled:
+        entry = getattr(sdo_data, key)
+        if is_primitive(entry.value):
+            entry.value = values[i]
+            i += 1
+        else:
+            count = int(entry.size / struct.calcsize(entry.format))
+            entry.value = values[i : i + count]
+            i += count
+
+
+def measure(map_response, number: int):
+    """Return (peak temporary bytes, blocks allocated and kept) per mapped response."""
+    map_response()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        blocks = len(tracemalloc.take_snapshot().traces)
+        peak = 0
+        for _ in range(number):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            map_response()
+            _, current_peak = tracemalloc.get_traced_memory()
+            peak = max(peak, current_peak - before)
+        kept = len(tracemalloc.take_snapshot().traces) - blocks
+    finally:
+        tracemalloc.stop()
+    return peak, kept / number
+
+
+def run(args: argparse.Namespace):
+    print(f"{'mapping':<9} {'time [us]':>10} {'peak temporary [B]':>19} {'blocks kept':>12}")
+    raw_data = None
+    for name in ("asdict", "copy", "in place", "lazy"):
+        sdo_data = DiagnosisData()
+        for each_field in fields(sdo_data):
+            getattr(sdo_data, each_field.name).enable = True
+        if raw_data is None:
+            raw_data = bytes(range(struct.calcsize(sdo_data.unpack_format)))
+        controller = SdoDataController(session=None, in_place=name == "in place", lazy=name == "lazy")
+        if name == "asdict":
+            map_response = lambda: asdict_map(sdo_data, raw_data)
+        elif name == "lazy":
+            map_response = lambda: (
+                controller._map(sdo_data, memoryview(raw_data)),
+                sdo_data.ALStatus.value,
+                sdo_data.LinkConnStatus.value,
+            )
+        else:
+            map_response = lambda: controller._map(sdo_data, memoryview(raw_data))
+        elapsed = min(timeit.repeat(map_response, number=args.number, repeat=args.repeat)) / args.number * 1e6
+        peak, kept = measure(map_response, args.number)
+        print(f"{name:<9} {elapsed:>10.2f} {peak:>19} {kept:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="responses mapped per repetition")
+    parser.add_argument("--repeat", type=int, default=5)
+    SysLog.set_loglevel(LoggingLevel.WARNING)
+    run(parser.parse_args())
@@ -0,0 +1,86 @@
+"""Batching benchmark for the sendmmsg/recvmmsg transport with several gateways.
+
+Starts one simulator per gateway and runs ``ETG1510Profile.fetch_all`` against all of them at once. The asyncio backend,
+one ``MmsgEndpoint`` per connection and one ``MmsgEndpoint`` shared by every connection are compared. The last columns
+show how many datagrams each ``sendmmsg``/``recvmmsg`` call carried on average.
+
+    python benchmarks/mmsg_gateways.py --gateways 1 4 16 --subdevices 16 --latency 0.002
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pyetg1510 import ETG1510Profile, LoggingLevel, MasterODSpecification, ObjectDictionaryCache, SysLog
+from pyetg1510.mailbox import EtherCATMasterConnection, MmsgEndpoint, RttEstimator, TransportBackend
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+
+async def measure(args: argparse.Namespace, addresses, od_cache: ObjectDictionaryCache, mode: str):
+    shared = MmsgEndpoint() if mode == "shared" else None
+    connections, endpoints, profiles = [], [], []
+    for host, port in addresses:
+        options = {}
+        if mode != "asyncio":
+            endpoint = shared or MmsgEndpoint()
+            endpoints.append(endpoint)
+            options = {"backend": TransportBackend.MMSG, "mmsg_endpoint": endpoint}
+        connection = EtherCATMasterConnection(
+            host, port, window=7, rtt_estimator=RttEstimator(initial_rto=0.1), **options
+        )
+        connections.append(connection)
+        profiles.append(ETG1510Profile(master_od=MasterODSpecification(connection=connection, od_cache=od_cache)))
+    for connection in connections:
+        await connection.open()
+    try:
+        # every simulator has the same object dictionary: restore it from the cache
+        await asyncio.gather(*(profile.master_od.get_object_dictionary() for profile in profiles))
+        for connection in connections:
+            connection.statistics.requests = 0
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            await asyncio.gather(*(profile.fetch_all() for profile in profiles))
+        elapsed = time.perf_counter() - started
+    finally:
+        for connection in connections:
+            connection.close()
+    requests = sum(connection.statistics.requests for connection in connections)
+    endpoints = list({id(endpoint): endpoint for endpoint in endpoints}.values())
+    send_calls = sum(endpoint.send_calls for endpoint in endpoints)
+    receive_calls = sum(endpoint.receive_calls for endpoint in endpoints)
+    per_send = f"{sum(endpoint.sent for endpoint in endpoints) / send_calls:.1f}" if send_calls else "-"
+    per_receive = f"{sum(endpoint.received for endpoint in endpoints) / receive_calls:.1f}" if receive_calls else "-"
+    return elapsed, requests, per_send, per_receive
+
+
+async def run(args: argparse.Namespace):
+    print(f"{'gateways':>8} {'mode':>8} {'seconds':>8} {'req/s':>9} {'dgram/send':>10} {'dgram/recv':>10}")
+    for gateways in args.gateways:
+        simulators = [
+            MailboxGatewaySimulator(subdevices=args.subdevices, latency=args.latency, jitter=args.jitter)
+            for _ in range(gateways)
+        ]
+        addresses = [await simulator.start() for simulator in simulators]
+        directory = tempfile.TemporaryDirectory()
+        od_cache = ObjectDictionaryCache(os.path.join(directory.name, "od.json"))
+        try:
+            for mode in ("asyncio", "private", "shared"):
+                elapsed, requests, per_send, per_receive = await measure(args, addresses, od_cache, mode)
+                print(
+                    f"{gateways:>8} {mode:>8} {elapsed:>8.3f} {requests / elapsed:>9.1f} {per_send:>10} {per_receive:>10}"
+                )
+        finally:
+            for simulator in simulators:
+                simulator.close()
+            directory.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gateways", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--subdevices", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3, help="fetch_all sweeps per measurement")
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random delay added to latency in seconds")
+    SysLog.set_loglevel(LoggingLevel.WARNING)
+    asyncio.run(run(parser.parse_args()))
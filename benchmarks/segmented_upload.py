@@ -0,0 +1,56 @@
+"""Segmented SDO upload throughput against the local mailbox gateway simulator.
+
+Uploads the configured address list (0xF020, 252 bytes with complete access) repeatedly for each simulated mailbox
+size and prints the segment rate and payload throughput.
+
+    python benchmarks/segmented_upload.py --mailbox-sizes 16 32 64 128 --uploads 200
+"""
+import argparse
+import asyncio
+import time
+from dataclasses import fields
+from pyetg1510 import LoggingLevel, MasterDiagnosisMetadataMapper, SysLog
+from pyetg1510.mailbox import EtherCATMasterConnection, RttEstimator, SdoDataController
+from pyetg1510.sdo_fxxx_controls import ConfiguredAddressList
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+INDEX = 0xF020
+
+
+async def run(args: argparse.Namespace):
+    print(f"{'mailbox':>7} {'segments':>8} {'seconds':>8} {'segments/s':>10} {'kB/s':>8}")
+    for mailbox_size in args.mailbox_sizes:
+        simulator = MailboxGatewaySimulator(subdevices=125, latency=args.latency, mailbox_size=mailbox_size)
+        host, port = await simulator.start()
+        try:
+            rtt_estimator = RttEstimator(initial_rto=max(0.05, 4 * args.latency))
+            async with EtherCATMasterConnection(host, port, rtt_estimator=rtt_estimator) as connection:
+                controller = SdoDataController(session=connection)
+                sdo_metadata = MasterDiagnosisMetadataMapper.find(INDEX).metadata.for_request(INDEX)
+                sdo_data = ConfiguredAddressList()
+                for each_field in fields(sdo_data):
+                    getattr(sdo_data, each_field.name).enable = True
+                segments = 0
+                size = 0
+                started = time.perf_counter()
+                for _ in range(args.uploads):
+                    transaction = await controller.fetch(sdo_metadata=sdo_metadata, sdo_data=sdo_data)
+                    if transaction.segmented_upload is not None:
+                        segments += transaction.segmented_upload.segments
+                        size += transaction.segmented_upload.size
+                elapsed = time.perf_counter() - started
+            print(
+                f"{mailbox_size:>7} {segments:>8} {elapsed:>8.3f} {segments / elapsed:>10.1f} "
+                f"{size / elapsed / 1000:>8.1f}"
+            )
+        finally:
+            simulator.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mailbox-sizes", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--uploads", type=int, default=100, help="uploads per mailbox size")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated response delay in seconds")
+    SysLog.set_loglevel(LoggingLevel.WARNING)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,62 @@
+"""Throughput benchmark against the local mailbox gateway simulator.
+
+Discovers the object dictionary of a simulated master and sweeps it with ``ETG1510Profile.fetch_all`` for each
+combination of network size and pipeline window.
+
+    python benchmarks/simulator_throughput.py --subdevices 8 32 125 --windows 1 4 7 --latency 0.002 --jitter 0.001
+"""
+import argparse
+import asyncio
+import time
+from pyetg1510 import ETG1510Profile, LoggingLevel, MasterODSpecification, SysLog
+from pyetg1510.mailbox import EtherCATMasterConnection, RttEstimator, TransportBackend
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+
+async def run(args: argparse.Namespace):
+    print(f"{'subdevices':>10} {'window':>6} {'objects':>7} {'seconds':>8} {'req/s':>9} {'retrans':>7}")
+    for subdevices in args.subdevices:
+        simulator = MailboxGatewaySimulator(
+            subdevices=subdevices, latency=args.latency, jitter=args.jitter, loss=args.loss, seed=args.seed
+        )
+        host, port = await simulator.start()
+        try:
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+            for window in args.windows:
+                connection = EtherCATMasterConnection(
+                    host,
+                    port,
+                    window=window,
+                    backend=TransportBackend(args.backend),
+                    rtt_estimator=RttEstimator(initial_rto=max(0.05, 4 * (args.latency + args.jitter))),
+                )
+                master_od.connection = connection
+                profile = ETG1510Profile(master_od=master_od)
+                async with connection:
+                    started = time.perf_counter()
+                    for _ in range(args.rounds):
+                        result = await profile.fetch_all()
+                    elapsed = time.perf_counter() - started
+                requests = connection.statistics.requests
+                print(
+                    f"{subdevices:>10} {window:>6} {len(result):>7} {elapsed:>8.3f} "
+                    f"{requests / elapsed:>9.1f} {connection.statistics.retransmissions:>7}"
+                )
+        finally:
+            simulator.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subdevices", type=int, nargs="+", default=[8, 32, 125])
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 2, 4, 7])
+    parser.add_argument("--rounds", type=int, default=5, help="fetch_all sweeps per measurement")
+    parser.add_argument("--latency", type=float, default=0.001, help="simulated response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random delay added to latency in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability that the simulator drops a request")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--backend", choices=[b.value for b in TransportBackend], default="asyncio")
+    SysLog.set_loglevel(LoggingLevel.WARNING)
+    asyncio.run(run(parser.parse_args()))
@@ -6,6 +6,8 @@ from .sdo_8xxx_configuration_data import *
 from .sdo_9xxx_information_data import *
 from .sdo_axxx_master_diagnosis import *
 from .sdo_fxxx_controls import *
+from .diagnosis_store import *
+from .od_cache import *
 
 VERSION = (0, 0, 1)
 
@@ -0,0 +1,244 @@
+"""
+0xAxxx 診断データの列指向ストア
+
+サブデバイス毎の :class:`DiagnosisData <pyetg1510.sdo_axxx_master_diagnosis.DiagnosisData>` を、サブデバイス毎の行と
+サブインデックス毎の列を持つ NumPy の構造化配列1つにまとめる。ネットワーク全体の集計をベクトル演算で行える。
+
+NumPy はオプションの依存パッケージ。 ``pip install pyetg1510[numpy]`` でインストールする。
+"""
+from dataclasses import dataclass, field, fields
+from struct import calcsize
+from typing import Dict, Hashable, List, Tuple, Union
+from pyetg1510.helper import SysLog
+from pyetg1510.mailbox.sdo_application_interface import SdoDataBody, SdoEntry, UnpackPlan, is_primitive
+from pyetg1510.sdo_axxx_master_diagnosis import DiagnosisData
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = SysLog.logger
+
+
+def _numpy_type(format: str) -> "numpy.dtype":
+    """struct の format 文字（標準サイズ）に対応する NumPy の型
+
+    Raises:
+        TypeError: 数値型以外の format の場合
+    """
+    size = calcsize("=" + format)
+    if format == "?":
+        return numpy.dtype(numpy.bool_)
+    elif format in "bhilq":
+        return numpy.dtype(f"=i{size}")
+    elif format in "BHILQ":
+        return numpy.dtype(f"=u{size}")
+    elif format in "efd":
+        return numpy.dtype(f"=f{size}")
+    raise TypeError(f"Format '{format}' can not be stored in a column.")
+
+
+class StoredSdoEntry(SdoEntry):
+    """値を :class:`DiagnosisStore` の行に保持する :class:`SdoEntry <pyetg1510.mailbox.sdo_application_interface.SdoEntry>`
+
+    :attr:`value` は参照する度に行の値を Python の値（リストの場合は新しいリスト）に変換して返し、代入すると行に書き込む。
+    """
+
+    def __init__(self, entry: SdoEntry, column: "numpy.ndarray", row: int):
+        self._column = column
+        self._row = row
+        self.name = entry.name
+        self.sub_index = entry.sub_index
+        self.format = entry.format
+        self.size = entry.size
+        self.enable = entry.enable
+        self.value = entry.value
+
+    @property
+    def value(self):
+        return self._column[self._row].tolist()
+
+    @value.setter
+    def value(self, value):
+        self._column[self._row] = value
+
+    @property
+    def value_kind(self) -> Hashable:
+        # fixed by the column
+        return "list" if self._column.ndim > 1 else "primitive"
+
+    def __deepcopy__(self, memo) -> SdoEntry:
+        # a copy does not follow the store
+        entry = SdoEntry(sub_index=self.sub_index, value=self.value, format=self.format, size=self.size)
+        entry.name, entry.enable, entry.changed = self.name, self.enable, self.changed
+        return entry
+
+
+@dataclass
+class DiagnosisStore:
+    """0xAxxx 診断データを1つの NumPy 構造化配列に格納するストア
+
+    :attr:`data` はインデックス毎の行と、 ``template`` のフィールド名の列を持つ。リストのエントリは要素数分の列
+    （サブ配列）になる。 :meth:`attach` したデータコンテナのエントリは行を参照する :class:`StoredSdoEntry` に置き換わるため、
+    データコンテナはそのまま使える。 :class:`SdoDataController <pyetg1510.mailbox.sdo_application_interface.SdoDataController>`
+    の ``column_store`` に指定すると、レスポンスを Python の値を作らずに行へ直接書き込む。無効なエントリの列は初期値の
+    まま変わらない。
+
+    使用例:
+        .. code-block:: python
+
+            profile = ETG1510Profile(master_od=master_od, columnar=True)
+            await profile.fetch_all()
+            store = profile.diagnosis_store
+            total = store.data["CyclicWCErrorCounter"].sum()
+            failed = [store.indexes[row] for row in store.data["FrameErrorCounterPort"].any(axis=1).nonzero()[0]]
+
+    Args:
+        indexes(List[int]): 行に割り当てるSDOインデックス
+        template(type): 列の定義に使う SdoDataBody のクラス
+
+    Raises:
+        ImportError: NumPy がインストールされていない場合
+    """
+
+    indexes: List[int]
+    template: type = field(default=DiagnosisData)
+    data: "numpy.ndarray" = field(default=None, init=False, repr=False)
+    """インデックス毎の行を持つ構造化配列"""
+    _rows: Dict[int, int] = field(default=None, init=False, repr=False)
+    _containers: Dict[int, int] = field(default_factory=dict, init=False, repr=False)
+    _views: Dict[int, SdoDataBody] = field(default_factory=dict, init=False, repr=False)
+    _targets: Dict[tuple, Tuple["numpy.dtype", "numpy.ndarray", UnpackPlan]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    def __post_init__(self):
+        if numpy is None:
+            raise ImportError("DiagnosisStore requires numpy. Install it with 'pip install pyetg1510[numpy]'.")
+        self.indexes = list(self.indexes)
+        self._rows = {index: row for row, index in enumerate(self.indexes)}
+        self.data = numpy.zeros(len(self.indexes), dtype=self.dtype(self.template))
+
+    @staticmethod
+    def dtype(template: type) -> "numpy.dtype":
+        """``template`` の既定値から列の型を作成する
+
+        Raises:
+            TypeError: 数値型とそのリスト以外のエントリがある場合
+        """
+        sdo_data = template()
+        columns = []
+        for each_field in fields(sdo_data):
+            entry = getattr(sdo_data, each_field.name)
+            if is_primitive(entry.value) and not isinstance(entry.value, str):
+                columns.append((each_field.name, _numpy_type(entry.format)))
+            elif type(entry.value) is list:
+                columns.append((each_field.name, _numpy_type(entry.format), (len(entry.value),)))
+            else:
+                raise TypeError(f"{each_field.name} : {type(entry.value)} can not be stored in a column.")
+        return numpy.dtype(columns)
+
+    @classmethod
+    def from_entries(cls, entries: Dict[int, SdoDataBody], template: type = DiagnosisData) -> "DiagnosisStore":
+        """インデックス毎のデータコンテナのうち ``template`` のインスタンスを全て登録したストアを作成する
+
+        Args:
+            entries(Dict[int, SdoDataBody]): :attr:`ConcreteSDODataFactory.entries
+                <pyetg1510.mailbox.sdo_application_interface.ConcreteSDODataFactory.entries>`
+            template(type): 登録する SdoDataBody のクラス
+        """
+        indexes = [index for index, sdo_data in entries.items() if isinstance(sdo_data, template)]
+        store = cls(indexes, template=template)
+        for index in indexes:
+            store.attach(index, entries[index])
+        return store
+
+    def attach(self, index: int, sdo_data: SdoDataBody):
+        """データコンテナのエントリを行を参照する :class:`StoredSdoEntry` に置き換える。現在の値は行にコピーする。
+
+        Args:
+            index(int): SDOインデックス
+            sdo_data(SdoDataBody): ``template`` のデータコンテナ
+
+        Raises:
+            KeyError: 行の無いインデックスの場合
+        """
+        row = self._rows[index]
+        if self._views.get(index) is sdo_data:
+            return
+        for name in sdo_data._field_names():
+            # also moves the entries attached to another store
+            setattr(sdo_data, name, StoredSdoEntry(getattr(sdo_data, name), self.data[name], row))
+        self._containers[id(sdo_data)] = row
+        self._views[index] = sdo_data
+
+    def holds(self, index: int, sdo_data: SdoDataBody) -> bool:
+        """``sdo_data`` をインデックスの行に :meth:`attach` している場合True"""
+        return self._views.get(index) is sdo_data
+
+    def matches(self, entries: Dict[int, SdoDataBody]) -> bool:
+        """``entries`` の ``template`` のインスタンスが、全てこのストアの行に :meth:`attach` したものの場合True"""
+        indexes = [index for index, sdo_data in entries.items() if isinstance(sdo_data, self.template)]
+        return indexes == self.indexes and all(self.holds(index, entries[index]) for index in indexes)
+
+    def row(self, index: int) -> int:
+        """インデックスの行番号"""
+        return self._rows[index]
+
+    def view(self, index: int) -> SdoDataBody:
+        """インデックスに :meth:`attach` したデータコンテナ。値は行を参照する。"""
+        return self._views[index]
+
+    def decode(self, sdo_data: SdoDataBody, raw_data: Union[bytes, memoryview]) -> bool:
+        """受信したデータ本体を ``sdo_data`` の行に直接書き込む
+
+        Args:
+            sdo_data(SdoDataBody): レスポンスの対象のデータコンテナ
+            raw_data(Union[bytes, memoryview]): データ本体
+
+        Return:
+            bool: 書き込んだ場合True。 ``sdo_data`` が登録されていない場合はFalse
+
+        Raises:
+            ValueError: 全てのエントリが無効な場合、リストの要素数が列と異なる場合
+        """
+        row = self._containers.get(id(sdo_data))
+        if row is None:
+            return False
+        # the kind of each value is fixed by its column: enable, size and format decide the layout
+        entries = [getattr(sdo_data, name) for name in sdo_data._field_names()]
+        layout = tuple((entry.size, entry.format) if entry.enable else None for entry in entries)
+        target = self._targets.get(layout)
+        if target is None:
+            target = self._targets[layout] = self._compile(sdo_data, sdo_data.unpack_plan)
+        wire, columns, plan = target
+        # keep the plan of the container in step for the change tracking of the controller
+        sdo_data._unpack_plan = plan
+        if len(raw_data) < wire.itemsize:
+            logger.error(f"Data: {bytes(raw_data)}, Unpack format: {sdo_data.unpack_format}")
+            raw_data = bytes(raw_data) + b"\0" * (wire.itemsize - len(raw_data))
+        columns[row : row + 1] = numpy.frombuffer(raw_data, dtype=wire, count=1)
+        return True
+
+    def _compile(self, sdo_data: SdoDataBody, plan: UnpackPlan) -> Tuple["numpy.dtype", "numpy.ndarray", UnpackPlan]:
+        """``plan`` のレイアウトの受信データの型と、書き込み先の列のビューを作成する"""
+        if plan.struct.size <= 0:
+            raise ValueError(f"All member are disabled. ({plan.format}) Nothing to fetch data.")
+        names, formats = [], []
+        for name, _, count, decode in plan.assignments:
+            column = self.data.dtype[name]
+            if decode or count is None:
+                raise TypeError(f"{name} : {plan.format} can not be stored in a column.")
+            if count:
+                if column.shape != (count,):
+                    raise ValueError(f"{name} has {count} items. Column holds {column.shape[0]}.")
+                formats.append((_numpy_type(getattr(sdo_data, name).format), (count,)))
+            else:
+                formats.append(_numpy_type(getattr(sdo_data, name).format))
+            names.append(name)
+        wire = numpy.dtype(
+            {"names": names, "formats": formats, "offsets": list(plan.offsets), "itemsize": plan.struct.size}
+        )
+        # a view of several fields is assigned field by field in order
+        return wire, self.data[names], plan
@@ -2,15 +2,21 @@
 
 ETG.1510データ収集制御モジュール。 ``sdo_*xxx_`` から始まるモジュールで定義されたメタデータを通じてデータモデルを参照。
 """
+import asyncio
+from collections import deque
 from dataclasses import dataclass, field, fields
-from pyetg1510.mailbox.connection import EtherCATMasterConnection
+from pyetg1510.mailbox.connection import EtherCATMasterConnection, BlockingEtherCATMasterConnection
 from pyetg1510.mailbox.sdo_application_interface import (
     SdoDataBody,
+    SdoEntry,
+    SdoSnapshot,
     ConcreteSDODataFactory,
     is_primitive,
     SdoMetadataMapper,
+    SdoMetadata,
     MappingMember,
     SdoDataController,
+    BlockingSdoDataController,
     ODListFormat,
     SDOInfoDescriptionFormat,
     SDOInfoEntryFormat,
@@ -21,21 +27,32 @@ from pyetg1510.sdo_1xxx_master_object import (
     HardwareVersionFormat,
     SoftwareVersionFormat,
     IndentityObjectFormat,
+    IndentityObjectData,
 )
 from pyetg1510.sdo_8xxx_configuration_data import ConfigurationDataFormat
 from pyetg1510.sdo_9xxx_information_data import InformationDataFormat
 from pyetg1510.sdo_axxx_master_diagnosis import DiagnosisDataFormat
+from pyetg1510.diagnosis_store import DiagnosisStore
+from pyetg1510.od_cache import ObjectDictionaryCache
 from pyetg1510.sdo_fxxx_controls import (
     DetectModulesCommandFormat,
     MasterDiagDataFormat,
     DiagInterfaceControlFormat,
     ConfiguredAddressListFormat,
 )
-from typing import List, Tuple
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from pyetg1510.helper import SysLog
 
 logger = SysLog.logger
 
+_REQUEST_ERRORS = (ValueError, KeyError, StopAsyncIteration, asyncio.TimeoutError, OSError)
+"""1つのリクエストの失敗として扱う例外
+
+SDO Abort (ValueError)、ODに無いインデックス (KeyError)、タイムアウト、閉じた接続 (ConnectionError) などの通信エラー。
+Python 3.10 以前の asyncio.TimeoutError は組み込みの TimeoutError と別のクラスのため両方を含める（組み込みの TimeoutError
+は OSError の派生クラス）。
+"""
+
 
 class MasterDiagnosisMetadataMapper(SdoMetadataMapper):
     """定義された :obj:`メタデータ <pyetg1510.mailbox.sdo_data_factory.SdoMetadata>` とそのインデックス範囲を関連付けるクラス
@@ -65,16 +82,23 @@ class MasterODSpecification:
 
     Args:
         connection(EtherCATMasterConnection): 通信コネクタオブジェクト
+        od_cache(ObjectDictionaryCache): ODの構成のキャッシュ。指定した場合、メインデバイスの識別情報とODリストが
+            キャッシュと一致すれば Description の問い合わせを省く。Noneの場合は毎回全て問い合わせる。
 
     """
 
     connection: EtherCATMasterConnection
     sdo_data_entity: ConcreteSDODataFactory = field(default_factory=ConcreteSDODataFactory, init=False)
+    od_cache: Optional[ObjectDictionaryCache] = None
+    """ODの構成のキャッシュ"""
 
     def __post_init__(self):
         self.data_handler = SdoDataController(session=self.connection, get_info=True)
+        self.identity_handler = SdoDataController(session=self.connection, get_info=False)
         self.current_index = 0
         self.current_subindex = 0
+        self.max_sub_indexes: Dict[int, int] = {}
+        """インデックス毎の Object Description の最大サブインデックス"""
 
     async def get_object_dictionary(self):
         """SDO Information serviceによりmain deviceのODを問い合わせ、その仕様をsdo_data_entryへ登録。
@@ -87,55 +111,169 @@ class MasterODSpecification:
         3. 個々のODのDescriptionを要求し、作成した実体をレスポンスに従い更新。
         4. sdo_data_entryに問い合わせたデータが作成される。
 
+        ``od_cache`` を指定した場合は、1の後に 0x1018 Identity Object を取得し、キャッシュに構成があれば2の実体を
+        キャッシュから作成して3を省く。無ければ3の後に構成をキャッシュに保存する。
+
         """
         logger.info("Fetch OD List")
-        await self.data_handler.fetch(sdo_metadata=ODListFormat, sdo_data=ODListFormat.response_container())
-
-        for self.current_index in self.data_handler.sdo_data.ObjectIndex.value:
-            logger.info(f"==== Index {self.current_index}, format :{ODListFormat.response_container.__name__}")
-            _selected: MappingMember = MasterDiagnosisMetadataMapper.find(self.current_index)
-            if _selected is not None:
-                # Create instances by sdo factory.
-                self.sdo_data_entity.create(index=self.current_index, template=_selected.metadata.response_container)
-            else:
-                logger.warning(f"Index : {self.current_index} is not defined for any specification.")
+        transaction = await self.data_handler.fetch(
+            sdo_metadata=ODListFormat, sdo_data=ODListFormat.response_container()
+        )
+        od_list = transaction.sdo_data
+        indexes = list(od_list.ObjectIndex.value)
+        cache_key = None
+        if self.od_cache is not None:
+            cache_key = await self._identify(indexes)
+            if cache_key is not None and self._load_layout(indexes, cache_key):
+                return
+
+        for self.current_index in indexes:
+            _selected = self._register_index(self.current_index)
+            if _selected is None:
                 continue
-            SDOInfoDescriptionFormat.index = self.current_index
             logger.info("Fetch Object Description")
-            await self.data_handler.fetch(
-                sdo_metadata=SDOInfoDescriptionFormat, sdo_data=SDOInfoDescriptionFormat.response_container()
+            transaction = await self.data_handler.fetch(
+                sdo_metadata=SDOInfoDescriptionFormat.for_request(self.current_index),
+                sdo_data=SDOInfoDescriptionFormat.response_container(),
             )
-            # apply max subindex to configuration model
-            if hasattr(self.data_handler.sdo_data, "MaxSubindex"):
-                _selected.metadata.max_sub_index = self.data_handler.sdo_data.MaxSubindex.value
-            else:
-                _selected.metadata.max_sub_index = 0
-            logger.info(f"Max sub index: {_selected.metadata.max_sub_index}")
-            for field in fields(self.sdo_data_entity.entries[self.current_index]):
-                entry = getattr(self.sdo_data_entity.entries[self.current_index], field.name)
-                self.current_subindex = entry.sub_index
-                logger.info(f"   ---- Subindex {self.current_subindex}")
-                SDOInfoEntryFormat.index = self.current_index
-                SDOInfoEntryFormat.sub_index = self.current_subindex
+            self._apply_description(transaction.sdo_data)
+            for entry in self._entries(self.current_index):
                 logger.info("Fetch Entry Description")
-                await self.data_handler.fetch(
-                    sdo_metadata=SDOInfoEntryFormat, sdo_data=SDOInfoEntryFormat.response_container()
+                transaction = await self.data_handler.fetch(
+                    sdo_metadata=SDOInfoEntryFormat.for_request(self.current_index, self.current_subindex),
+                    sdo_data=SDOInfoEntryFormat.response_container(),
                 )
-                if "AbortCode" not in self.data_handler.sdo_data.__dict__:
-                    if entry is not None:
-                        entry.name = self.data_handler.sdo_data.Data.value
-                        if is_primitive(entry.value):
-                            entry.size = int(self.data_handler.sdo_data.BitLength.value / 8)
-                        entry.enable = True
-                        logger.info(
-                            f"Index: {self.current_index}. Subindex:{self.current_subindex} is Enabled. Size:{entry.size}"
-                        )
-                        logger.info(f"     {entry}")
-                    else:
-                        logger.error(f"{self.current_index}:{self.current_subindex} is not found on definition.")
+                self._apply_entry(entry, transaction.sdo_data)
 
+        if cache_key is not None:
+            self.od_cache.put(cache_key, self.layout())
         logger.info("============ Information data fetch complete ==============")
 
+    async def _identify(self, indexes: List[int]) -> Optional[str]:
+        """0x1018 Identity Object を取得し、 :attr:`od_cache` のキーを作成する。取得できない場合はNone"""
+        if IndentityObjectFormat.index not in indexes:
+            logger.warning("OD List has no identity object (0x1018). OD cache is not used.")
+            return None
+        try:
+            transaction = await self.identity_handler.fetch(*self._identity_request())
+        except _REQUEST_ERRORS as e:
+            logger.warning(f"Identity object (0x1018) could not be read. OD cache is not used: {e!r}")
+            return None
+        return ObjectDictionaryCache.key(transaction.sdo_data, indexes)
+
+    @staticmethod
+    def _identity_request() -> Tuple[SdoMetadata, IndentityObjectData]:
+        """全てのエントリを有効にした 0x1018 Identity Object のリクエスト"""
+        identity = IndentityObjectData()
+        for each_field in fields(identity):
+            getattr(identity, each_field.name).enable = True
+        return IndentityObjectFormat.for_request(IndentityObjectFormat.index), identity
+
+    def layout(self) -> Dict[str, dict]:
+        """収集したODの構成を :class:`ObjectDictionaryCache <pyetg1510.od_cache.ObjectDictionaryCache>` に保存する形式で返す
+
+        Return:
+            Dict[str, dict]: インデックス毎の最大サブインデックスと、有効なエントリの名前とサイズ
+        """
+        objects = {}
+        for index, sdo_data in self.sdo_data_entity.entries.items():
+            entries = {}
+            for each_field in fields(sdo_data):
+                entry = getattr(sdo_data, each_field.name)
+                if entry.enable:
+                    entries[each_field.name] = {"name": entry.name, "size": entry.size}
+            objects[str(index)] = {"max_sub_index": self.max_sub_indexes.get(index, 0), "entries": entries}
+        return {"objects": objects}
+
+    def _load_layout(self, indexes: List[int], cache_key: str) -> bool:
+        """キャッシュしたODの構成から実体を作成する
+
+        Return:
+            bool: 作成した場合True。キャッシュに無い場合、テンプレートと一致しない場合はFalse
+        """
+        layout = self.od_cache.get(cache_key)
+        if layout is None:
+            logger.info(f"OD cache {cache_key} not found. Fetch object descriptions.")
+            return False
+        created = {}
+        try:
+            for index in indexes:
+                selected = MasterDiagnosisMetadataMapper.find(index)
+                if selected is None:
+                    continue
+                cached = layout["objects"][str(index)]
+                sdo_data = self.sdo_data_entity.createProduct(selected.metadata.response_container)
+                for name, entry_layout in cached["entries"].items():
+                    entry = getattr(sdo_data, name)
+                    entry.name, entry.size, entry.enable = entry_layout["name"], entry_layout["size"], True
+                created[index] = (sdo_data, cached["max_sub_index"])
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"OD cache {cache_key} does not match the data model: {e!r}. Fetch object descriptions.")
+            return False
+        for index, (sdo_data, max_sub_index) in created.items():
+            self.sdo_data_entity.registerProduct(index, sdo_data)
+            self.max_sub_indexes[index] = max_sub_index
+        logger.info(f"OD of {len(created)} indexes loaded from OD cache {cache_key}")
+        return True
+
+    def _register_index(self, index: int) -> Optional[MappingMember]:
+        """ODリストのインデックスに対応するメタデータを探し、実体を作成する"""
+        logger.info(f"==== Index {index}, format :{ODListFormat.response_container.__name__}")
+        _selected: MappingMember = MasterDiagnosisMetadataMapper.find(index)
+        if _selected is None:
+            logger.warning(f"Index : {index} is not defined for any specification.")
+            return None
+        # Create instances by sdo factory.
+        self.sdo_data_entity.create(index=index, template=_selected.metadata.response_container)
+        return _selected
+
+    def _apply_description(self, description: SdoDataBody):
+        """Object Descriptionのレスポンスを反映する
+
+        最大サブインデックスは :attr:`max_sub_indexes` に保持する。モジュールで共有するメタデータは変更しない。
+        """
+        max_sub_index = description.MaxSubindex.value if hasattr(description, "MaxSubindex") else 0
+        self.max_sub_indexes[self.current_index] = max_sub_index
+        logger.info(f"Max sub index: {max_sub_index}")
+
+    def _entries(self, index: int) -> Iterator[SdoEntry]:
+        """インデックスのエントリを順に返す。 :attr:`current_subindex` にサブインデックスを設定する"""
+        for field in fields(self.sdo_data_entity.entries[index]):
+            entry = getattr(self.sdo_data_entity.entries[index], field.name)
+            self.current_subindex = entry.sub_index
+            logger.info(f"   ---- Subindex {self.current_subindex}")
+            yield entry
+
+    def _apply_entry(self, entry: SdoEntry, entry_description: SdoDataBody):
+        """Entry Descriptionのレスポンスを反映する"""
+        if "AbortCode" not in entry_description.__dict__:
+            if entry is not None:
+                entry.name = entry_description.Data.value
+                if is_primitive(entry.value):
+                    entry.size = int(entry_description.BitLength.value / 8)
+                entry.enable = True
+                logger.info(
+                    f"Index: {self.current_index}. Subindex:{self.current_subindex} is Enabled. Size:{entry.size}"
+                )
+                logger.info(f"     {entry}")
+            else:
+                logger.error(f"{self.current_index}:{self.current_subindex} is not found on definition.")
+
+
+@dataclass
+class SdoDownload:
+    """:meth:`ETG1510Profile.download_all` で書き込むエントリ
+
+    Args:
+        index(int): SDOインデックス
+        sub_index(int): 書き込むエントリのサブインデックス。Noneの場合はオブジェクト全体を書き込む。
+    """
+
+    index: int
+    sub_index: Optional[int] = None
+    error: Optional[Exception] = field(default=None, init=False)
+    """書き込みに失敗した場合の例外"""
+
 
 @dataclass
 class ETG1510Profile:
@@ -157,6 +295,14 @@ class ETG1510Profile:
         master_od(MasterODSpecification): :meth:`get_object_dictionaryメソッド <pyetg1510.etg_1510.MasterODSpecification.get_object_dictionary>`
                                         を実行してODを収集完了した後のMasterODSpecificationオブジェクト
         watch_index_list(List[int]): 監視対象のSDOインデックスリスト。未定義の場合はOD全て対象。
+        in_place(bool): Trueの場合、リストの値を既存のリストに書き込む（ :attr:`SdoDataController.in_place
+            <pyetg1510.mailbox.sdo_application_interface.SdoDataController>` ）
+        columnar(bool): Trueの場合、0xAxxx の診断データを :attr:`diagnosis_store` に列指向で格納する。NumPy が必要。
+            ODの収集前に作成してもよい（ストアは収集後に作成する）。
+        lazy(bool): Trueの場合、エントリの値を参照した時に復号する（ :attr:`SdoDataController.lazy
+            <pyetg1510.mailbox.sdo_application_interface.SdoDataController>` ）
+        track_changes(bool): Trueの場合、前回と同じ受信データの復号を省き、値が変化したエントリを記録する。
+            :meth:`changes` を使う場合はTrueにする。
 
     Return:
         Tuple[int, SdoDataBody]: SDOインデックス, 取得したSDOデータコンテナ
@@ -166,31 +312,87 @@ class ETG1510Profile:
     """収集したメインデバイスのオブジェクトディクショナリ"""
     watch_index_list: List[int] = None
     """イテレータで収集する際に、収集対象となるインデックスリストを指定する場合はそのリストを設定する。指定しない場合は全て返す"""
+    in_place: bool = False
+    """リストの値を既存のリストに書き込む場合True"""
+    columnar: bool = False
+    """0xAxxx の診断データを :class:`DiagnosisStore <pyetg1510.diagnosis_store.DiagnosisStore>` に格納する場合True"""
+    lazy: bool = False
+    """エントリの値を参照した時に復号する場合True"""
+    track_changes: bool = False
+    """値が変化したエントリを記録する場合True"""
 
     def __post_init__(self):
-        self.data_handler = SdoDataController(session=self.master_od.connection, get_info=False)
         self.watch_address = 0
         self.sdo_database = self.master_od.sdo_data_entity.entries
+        self._diagnosis_store: Optional[DiagnosisStore] = None
+        if self.columnar:
+            # the rows of the OD collected so far, none before get_object_dictionary()
+            self._diagnosis_store = DiagnosisStore.from_entries(self.sdo_database)
+        self.data_handler = SdoDataController(
+            session=self.master_od.connection,
+            get_info=False,
+            in_place=self.in_place,
+            column_store=self._diagnosis_store,
+            lazy=self.lazy,
+            track_changes=self.track_changes,
+        )
 
     def __aiter__(self):
         return self
 
-    async def __anext__(self):
+    @property
+    def diagnosis_store(self) -> Optional[DiagnosisStore]:
+        """診断データの列指向ストア。 ``columnar`` がFalseの場合はNone
+
+        ODの収集後、最初に参照またはデータを収集した時に診断データの行を割り当てる。ODを収集し直した場合は割り当て直す。
+
+        Raises:
+            ValueError: ``columnar`` がTrueで、ODを収集する前に参照した場合
+        """
+        if self.columnar:
+            if not self.sdo_database:
+                raise ValueError("The diagnosis store is allocated after get_object_dictionary() of the master OD.")
+            if not self._diagnosis_store.matches(self.sdo_database):
+                self._allocate_diagnosis_store()
+        return self._diagnosis_store
+
+    def _allocate_diagnosis_store(self):
+        """現在のODの診断データの行を持つ :attr:`diagnosis_store` を作成し、データコントローラに設定する"""
+        self._diagnosis_store = DiagnosisStore.from_entries(self.sdo_database)
+        self.data_handler.column_store = self._diagnosis_store
+        logger.info(f"Diagnosis store allocated for {len(self._diagnosis_store.indexes)} subdevices")
+
+    @property
+    def sdo_index_list(self) -> List[int]:
+        """収集対象のインデックスリスト"""
         if self.watch_index_list is None:
-            sdo_index_list = list(self.master_od.sdo_data_entity.entries.keys())
+            return list(self.master_od.sdo_data_entity.entries.keys())
         else:
-            sdo_index_list = self.watch_index_list
+            return self.watch_index_list
+
+    def _metadata(self, index: int) -> SdoMetadata:
+        """インデックスに対応するメタデータから、リクエストするインデックスと最大サブインデックスを設定した写しを作成する"""
+        if self.columnar:
+            sdo_data = self.sdo_database.get(index)
+            store = self._diagnosis_store
+            if isinstance(sdo_data, store.template) and not store.holds(index, sdo_data):
+                # the first request after get_object_dictionary()
+                self._allocate_diagnosis_store()
+        metadata = MasterDiagnosisMetadataMapper.find(index).metadata
+        return metadata.for_request(index, max_sub_index=self.master_od.max_sub_indexes.get(index))
+
+    async def __anext__(self):
+        sdo_index_list = self.sdo_index_list
         if len(sdo_index_list) <= self.watch_address:
             self.watch_address = 0
             raise StopAsyncIteration
         # ToDo: sdo_index_listの要素に self.master_od.sdo_data_entity.entries.keys() が含まれなければ異常終了する
-        sdo_metadata = MasterDiagnosisMetadataMapper.find(sdo_index_list[self.watch_address]).metadata
-        sdo_metadata.index = sdo_index_list[self.watch_address]
+        sdo_metadata = self._metadata(sdo_index_list[self.watch_address])
         logger.info(f"==== Fetch and update data index:{sdo_index_list[self.watch_address]}")
-        await self.data_handler.fetch(
+        transaction = await self.data_handler.fetch(
             sdo_metadata=sdo_metadata, sdo_data=self.sdo_database[sdo_index_list[self.watch_address]]
         )
-        report = (sdo_index_list[self.watch_address], self.data_handler.sdo_data)
+        report = (sdo_index_list[self.watch_address], transaction.sdo_data)
         self.watch_address += 1
         return report
 
@@ -205,8 +407,453 @@ class ETG1510Profile:
             SdoDataBody: 取得したSDOデータコンテナ
         """
 
-        sdo_metadata = MasterDiagnosisMetadataMapper.find(index).metadata
-        sdo_metadata.index = index
-        await self.data_handler.fetch(sdo_metadata=sdo_metadata, sdo_data=self.sdo_database[index])
+        sdo_metadata = self._metadata(index)
+        transaction = await self.data_handler.fetch(sdo_metadata=sdo_metadata, sdo_data=self.sdo_database[index])
+        return transaction.sdo_data
+
+    async def get_many(
+        self, indexes: Iterable[int], concurrency: Optional[int] = None
+    ) -> Dict[int, Union[SdoDataBody, Exception]]:
+        """指定した複数のインデックスのSDOを、同時に実行するリクエスト数を制限して取得する
+
+        最大 ``concurrency`` 個のリクエストを同時に送信したままにするため、全体の所要時間はおおよそ
+        RTT × ceil(インデックス数 / concurrency) となる。取得に失敗したインデックスは例外を値として返し、残りの取得は続ける。
+
+        使用例:
+            .. code-block:: python
+
+                results = await profile.get_many(range(0xA000, 0xA12C), concurrency=7)
+                failed = {index: e for index, e in results.items() if isinstance(e, Exception)}
+
+        Args:
+            indexes(Iterable[int]): SDOインデックス。重複したインデックスは1回だけ取得する。
+            concurrency(int): 同時に実行するリクエスト数。Noneの場合はコネクタの ``window``
+
+        Return:
+            Dict[int, Union[SdoDataBody, Exception]]: 指定した順のSDOインデックスと、取得したSDOデータコンテナまたは失敗した例外の辞書。
+            ODに無いインデックスは KeyError、SDO Abort は ValueError、タイムアウトは TimeoutError、閉じた接続は ConnectionError
+
+        Raises:
+            ValueError: ``concurrency`` が1未満の場合
+        """
+        indexes = list(dict.fromkeys(indexes))
+        results = {index: sdo_data async for index, sdo_data in self.as_completed(indexes, concurrency=concurrency)}
+        return {index: results[index] for index in indexes}
+
+    async def as_completed(
+        self, indexes: Optional[Iterable[int]] = None, concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, Union[SdoDataBody, Exception]]]:
+        """指定したインデックスのリクエストを同時に実行し、レスポンスを受信した順に返す
+
+        :meth:`get_many` と同様に最大 ``concurrency`` 個のリクエストを同時に送信したままにし、受信したSDOから順に返す。
+        全てのレスポンスを待たずに処理を始められる。取得に失敗したインデックスは :meth:`get_many` と同じく例外を値として返す。
+        途中でイテレーションを終了する場合は ``aclose()`` すること。残りのリクエストを取り消す。
+
+        使用例:
+            .. code-block:: python
+
+                async for index, sdo_data in profile.as_completed(concurrency=7):
+                    if not isinstance(sdo_data, Exception):
+                        update(index, sdo_data)
+
+        Args:
+            indexes(Iterable[int]): SDOインデックス。Noneの場合は :attr:`sdo_index_list`
+            concurrency(int): 同時に実行するリクエスト数。Noneの場合はコネクタの ``window``
+
+        Return:
+            AsyncIterator[Tuple[int, Union[SdoDataBody, Exception]]]: SDOインデックスと、取得したSDOデータコンテナまたは失敗した例外
+
+        Raises:
+            ValueError: ``concurrency`` が1未満の場合
+        """
+        indexes = list(dict.fromkeys(self.sdo_index_list if indexes is None else indexes))
+        if concurrency is None:
+            concurrency = self.master_od.connection.window
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be 1 or more. Set to {concurrency}")
+        queue = deque(indexes)
+        completed: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            try:
+                while queue:
+                    index = queue.popleft()
+                    logger.info(f"==== Fetch and update data index:{index}")
+                    try:
+                        # KeyError for an index that is not in the OD
+                        sdo_data = self.sdo_database[index]
+                        transaction = await self.data_handler.fetch(
+                            sdo_metadata=self._metadata(index), sdo_data=sdo_data
+                        )
+                        sdo_data = transaction.sdo_data
+                    except _REQUEST_ERRORS as e:
+                        logger.warning(f"Fetch of index:{index} failed: {e!r}")
+                        sdo_data = e
+                    completed.put_nowait((index, sdo_data))
+            except Exception as e:
+                # e.g. a closed connection: hand it over to the iteration
+                completed.put_nowait((None, e))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, len(queue)))]
+        try:
+            for _ in indexes:
+                index, sdo_data = await completed.get()
+                if index is None:
+                    raise sdo_data
+                yield index, sdo_data
+        finally:
+            for each_worker in workers:
+                each_worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def fetch_all(self) -> Dict[int, SdoDataBody]:
+        """収集対象のインデックスを全てパイプラインで取得する
+
+        コネクタの ``window`` の数だけリクエストを同時に送信したままにするため、全体の所要時間は
+        おおよそ RTT × ceil(インデックス数 / window) となる。コネクタを :meth:`open <pyetg1510.mailbox.connection.EtherCATMasterConnection.open>`
+        していない場合はリクエスト毎にエンドポイントを作成する。
+
+        Return:
+            Dict[int, SdoDataBody]: SDOインデックスと取得したSDOデータコンテナの辞書
+        """
+        sdo_index_list = self.sdo_index_list
+        queue = deque(sdo_index_list)
+
+        async def worker():
+            while queue:
+                index = queue.popleft()
+                sdo_metadata = self._metadata(index)
+                logger.info(f"==== Fetch and update data index:{index}")
+                await self.data_handler.fetch(sdo_metadata=sdo_metadata, sdo_data=self.sdo_database[index])
+
+        await asyncio.gather(*[worker() for _ in range(min(self.master_od.connection.window, len(queue)))])
+        return {index: self.sdo_database[index] for index in sdo_index_list}
+
+    async def snapshot_all(self) -> Dict[int, SdoSnapshot]:
+        """収集対象のインデックスを :meth:`fetch_all` で取得し、 :class:`SdoSnapshot
+        <pyetg1510.mailbox.sdo_application_interface.SdoSnapshot>` を返す
+
+        返した値は次の収集で変わらないため、そのままキューなどに保持できる。
+
+        Return:
+            Dict[int, SdoSnapshot]: SDOインデックスと取得したデータの写しの辞書
+        """
+        return {index: sdo_data.snapshot() for index, sdo_data in (await self.fetch_all()).items()}
+
+    async def changes(self) -> AsyncIterator[Tuple[int, Dict[str, object]]]:
+        """収集対象のインデックスを :meth:`fetch_all` で取得し、値が変化したインデックスとエントリだけを返す
+
+        初回はインデックス毎に有効なエントリ全てを返す。 ``track_changes`` をTrueにして作成すること。
+
+        使用例:
+            .. code-block:: python
+
+                profile = ETG1510Profile(master_od=master_od, track_changes=True)
+                while True:
+                    async for index, changed in profile.changes():
+                        store(index, changed)
+
+        Return:
+            AsyncIterator[Tuple[int, Dict[str, object]]]: SDOインデックスと、変化したエントリのフィールド名と値の辞書
+
+        Raises:
+            ValueError: ``track_changes`` がFalseの場合
+        """
+        if not self.track_changes:
+            raise ValueError("changes() requires track_changes=True.")
+        for index, sdo_data in (await self.fetch_all()).items():
+            if sdo_data.changed_fields:
+                yield index, {name: getattr(sdo_data, name).value for name in sdo_data.changed_fields}
+
+    async def download(self, index: int, sub_index: Optional[int] = None):
+        """データモデルに設定した値を SDO Download で書き込む
+
+        使用例:
+            .. code-block:: python
+
+                profile.sdo_database[0xF200].ResetDiagInfo.value = True
+                await profile.download(0xF200, sub_index=16)
+
+        Args:
+            index(int): SDOインデックス
+            sub_index(int): 書き込むエントリのサブインデックス。Noneの場合はオブジェクト全体を書き込む。
+
+        Raises:
+            ValueError: ダウンロードが中断 (SDO Abort) された場合
+            KeyError: ODに無いインデックスの場合
+        """
+        sdo_data = self.sdo_database[index]
+        logger.info(f"==== Download data index:{index}, subindex:{sub_index}")
+        await self.data_handler.download(sdo_metadata=self._metadata(index), sdo_data=sdo_data, sub_index=sub_index)
+
+    async def download_all(self, downloads: Iterable[SdoDownload]) -> List[SdoDownload]:
+        """複数の書き込みを :meth:`fetch_all` と同様にパイプラインで実行する
+
+        コネクタの ``window`` の数だけリクエストを同時に送信したままにする。書き込みに失敗しても残りの書き込みは続け、
+        失敗した書き込みは :attr:`SdoDownload.error` に例外を設定する。ODに無いインデックスは KeyError、SDO Abort は
+        ValueError、タイムアウトは TimeoutError、閉じた接続は ConnectionError となる。
+
+        Args:
+            downloads(Iterable[SdoDownload]): 書き込むエントリ
+
+        Return:
+            List[SdoDownload]: 書き込んだエントリ。失敗したものは error が設定される。
+        """
+        downloads = list(downloads)
+        queue = deque(downloads)
+
+        async def worker():
+            while queue:
+                download = queue.popleft()
+                logger.info(f"==== Download data index:{download.index}, subindex:{download.sub_index}")
+                try:
+                    # KeyError for an index that is not in the OD
+                    sdo_data = self.sdo_database[download.index]
+                    await self.data_handler.download(
+                        sdo_metadata=self._metadata(download.index), sdo_data=sdo_data, sub_index=download.sub_index
+                    )
+                except _REQUEST_ERRORS as e:
+                    logger.warning(f"Download of index:{download.index} failed: {e}")
+                    download.error = e
+
+        await asyncio.gather(*[worker() for _ in range(min(self.master_od.connection.window, len(queue)))])
+        return downloads
+
+
+@dataclass
+class BlockingMasterODSpecification(MasterODSpecification):
+    """:class:`MasterODSpecification` の同期版
+
+    Args:
+        connection(BlockingEtherCATMasterConnection): 通信コネクタオブジェクト
+        od_cache(ObjectDictionaryCache): ODの構成のキャッシュ
+    """
+
+    connection: BlockingEtherCATMasterConnection
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.data_handler = BlockingSdoDataController(session=self.connection, get_info=True)
+        self.identity_handler = BlockingSdoDataController(session=self.connection, get_info=False)
+
+    def get_object_dictionary(self):
+        """SDO Information serviceによりmain deviceのODを問い合わせ、その仕様をsdo_data_entryへ登録。
+
+        手順は :meth:`MasterODSpecification.get_object_dictionary` と同じ。
+        """
+        logger.info("Fetch OD List")
+        od_list = self.data_handler.fetch(
+            sdo_metadata=ODListFormat, sdo_data=ODListFormat.response_container()
+        ).sdo_data
+        indexes = list(od_list.ObjectIndex.value)
+        cache_key = None
+        if self.od_cache is not None:
+            cache_key = self._identify(indexes)
+            if cache_key is not None and self._load_layout(indexes, cache_key):
+                return
+
+        for self.current_index in indexes:
+            _selected = self._register_index(self.current_index)
+            if _selected is None:
+                continue
+            logger.info("Fetch Object Description")
+            description = self.data_handler.fetch(
+                sdo_metadata=SDOInfoDescriptionFormat.for_request(self.current_index),
+                sdo_data=SDOInfoDescriptionFormat.response_container(),
+            ).sdo_data
+            self._apply_description(description)
+            for entry in self._entries(self.current_index):
+                logger.info("Fetch Entry Description")
+                entry_description = self.data_handler.fetch(
+                    sdo_metadata=SDOInfoEntryFormat.for_request(self.current_index, self.current_subindex),
+                    sdo_data=SDOInfoEntryFormat.response_container(),
+                ).sdo_data
+                self._apply_entry(entry, entry_description)
+
+        if cache_key is not None:
+            self.od_cache.put(cache_key, self.layout())
+        logger.info("============ Information data fetch complete ==============")
+
+    def _identify(self, indexes: List[int]) -> Optional[str]:
+        """0x1018 Identity Object を取得し、 :attr:`od_cache` のキーを作成する。取得できない場合はNone"""
+        if IndentityObjectFormat.index not in indexes:
+            logger.warning("OD List has no identity object (0x1018). OD cache is not used.")
+            return None
+        try:
+            identity = self.identity_handler.fetch(*self._identity_request()).sdo_data
+        except _REQUEST_ERRORS as e:
+            logger.warning(f"Identity object (0x1018) could not be read. OD cache is not used: {e!r}")
+            return None
+        return ObjectDictionaryCache.key(identity, indexes)
+
+
+@dataclass
+class BlockingETG1510Profile(ETG1510Profile):
+    """ETG.1510 データ収集イテレータ（同期版）
+
+    :class:`ETG1510Profile` と同じデータモデルを、asyncio を使わずに ``for`` 文で収集する。
+    ``async for`` で使うと TypeError を送出する。
+
+    使用例:
+        .. code-block:: python
+
+            connection = BlockingEtherCATMasterConnection("192.168.2.254", 34980)
+            master_od = BlockingMasterODSpecification(connection=connection)
+            master_od.get_object_dictionary()
+            for index, sdo in BlockingETG1510Profile(master_od=master_od):
+                pass
+
+    Args:
+        master_od(BlockingMasterODSpecification): ODを収集完了した後のBlockingMasterODSpecificationオブジェクト
+        watch_index_list(List[int]): 監視対象のSDOインデックスリスト。未定義の場合はOD全て対象。
+    """
+
+    master_od: BlockingMasterODSpecification
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.data_handler = BlockingSdoDataController(
+            session=self.master_od.connection,
+            get_info=False,
+            in_place=self.in_place,
+            column_store=self._diagnosis_store,
+            lazy=self.lazy,
+            track_changes=self.track_changes,
+        )
+
+    def __aiter__(self):
+        raise TypeError(f"{type(self).__name__} is not an asynchronous iterator. Use 'for' instead of 'async for'.")
+
+    async def __anext__(self):
+        raise TypeError(f"{type(self).__name__} is not an asynchronous iterator. Use next() instead of anext().")
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Tuple[int, SdoDataBody]:
+        sdo_index_list = self.sdo_index_list
+        if len(sdo_index_list) <= self.watch_address:
+            self.watch_address = 0
+            raise StopIteration
+        sdo_metadata = self._metadata(sdo_index_list[self.watch_address])
+        logger.info(f"==== Fetch and update data index:{sdo_index_list[self.watch_address]}")
+        transaction = self.data_handler.fetch(
+            sdo_metadata=sdo_metadata, sdo_data=self.sdo_database[sdo_index_list[self.watch_address]]
+        )
+        report = (sdo_index_list[self.watch_address], transaction.sdo_data)
+        self.watch_address += 1
+        return report
+
+    def get_sdo(self, index: int) -> SdoDataBody:
+        """
+        指定したインデックスのSDOを取得する
+
+        Args:
+            index(int): SDOインデックス
+
+        Return:
+            SdoDataBody: 取得したSDOデータコンテナ
+        """
+        sdo_metadata = self._metadata(index)
+        return self.data_handler.fetch(sdo_metadata=sdo_metadata, sdo_data=self.sdo_database[index]).sdo_data
+
+    def get_many(
+        self, indexes: Iterable[int], concurrency: Optional[int] = None
+    ) -> Dict[int, Union[SdoDataBody, Exception]]:
+        """指定した複数のインデックスのSDOを順に取得する
 
-        return self.data_handler.sdo_data
+        Args:
+            indexes(Iterable[int]): SDOインデックス。重複したインデックスは1回だけ取得する。
+            concurrency(int): :meth:`ETG1510Profile.get_many` との互換のための引数。同期版では使用しない。
+
+        Return:
+            Dict[int, Union[SdoDataBody, Exception]]: 指定した順のSDOインデックスと、取得したSDOデータコンテナまたは失敗した例外の辞書
+        """
+        return dict(self.as_completed(indexes))
+
+    def as_completed(
+        self, indexes: Optional[Iterable[int]] = None, concurrency: Optional[int] = None
+    ) -> Iterator[Tuple[int, Union[SdoDataBody, Exception]]]:
+        """指定したインデックスのSDOを順に取得し、取得した順に返す
+
+        Args:
+            indexes(Iterable[int]): SDOインデックス。Noneの場合は :attr:`sdo_index_list`
+            concurrency(int): :meth:`ETG1510Profile.as_completed` との互換のための引数。同期版では使用しない。
+
+        Return:
+            Iterator[Tuple[int, Union[SdoDataBody, Exception]]]: SDOインデックスと、取得したSDOデータコンテナまたは失敗した例外
+        """
+        for index in dict.fromkeys(self.sdo_index_list if indexes is None else indexes):
+            try:
+                # KeyError for an index that is not in the OD
+                sdo_data = self.sdo_database[index]
+                sdo_data = self.data_handler.fetch(sdo_metadata=self._metadata(index), sdo_data=sdo_data).sdo_data
+            except _REQUEST_ERRORS as e:
+                logger.warning(f"Fetch of index:{index} failed: {e!r}")
+                sdo_data = e
+            yield index, sdo_data
+
+    def fetch_all(self) -> Dict[int, SdoDataBody]:
+        """収集対象のインデックスを全て順に取得する
+
+        Return:
+            Dict[int, SdoDataBody]: SDOインデックスと取得したSDOデータコンテナの辞書
+        """
+        return dict(self)
+
+    def snapshot_all(self) -> Dict[int, SdoSnapshot]:
+        """収集対象のインデックスを :meth:`fetch_all` で取得し、 :class:`SdoSnapshot
+        <pyetg1510.mailbox.sdo_application_interface.SdoSnapshot>` を返す
+
+        Return:
+            Dict[int, SdoSnapshot]: SDOインデックスと取得したデータの写しの辞書
+        """
+        return {index: sdo_data.snapshot() for index, sdo_data in self.fetch_all().items()}
+
+    def changes(self) -> Iterator[Tuple[int, Dict[str, object]]]:
+        """収集対象のインデックスを :meth:`fetch_all` で取得し、値が変化したインデックスとエントリだけを返す
+
+        Return:
+            Iterator[Tuple[int, Dict[str, object]]]: SDOインデックスと、変化したエントリのフィールド名と値の辞書
+
+        Raises:
+            ValueError: ``track_changes`` がFalseの場合
+        """
+        if not self.track_changes:
+            raise ValueError("changes() requires track_changes=True.")
+        for index, sdo_data in self.fetch_all().items():
+            if sdo_data.changed_fields:
+                yield index, {name: getattr(sdo_data, name).value for name in sdo_data.changed_fields}
+
+    def download(self, index: int, sub_index: Optional[int] = None):
+        """データモデルに設定した値を SDO Download で書き込む
+
+        Args:
+            index(int): SDOインデックス
+            sub_index(int): 書き込むエントリのサブインデックス。Noneの場合はオブジェクト全体を書き込む。
+
+        Raises:
+            ValueError: ダウンロードが中断 (SDO Abort) された場合
+            KeyError: ODに無いインデックスの場合
+        """
+        sdo_data = self.sdo_database[index]
+        logger.info(f"==== Download data index:{index}, subindex:{sub_index}")
+        self.data_handler.download(sdo_metadata=self._metadata(index), sdo_data=sdo_data, sub_index=sub_index)
+
+    def download_all(self, downloads: Iterable[SdoDownload]) -> List[SdoDownload]:
+        """複数の書き込みを順に実行する
+
+        Args:
+            downloads(Iterable[SdoDownload]): 書き込むエントリ
+
+        Return:
+            List[SdoDownload]: 書き込んだエントリ。失敗したものは error が設定される。
+        """
+        downloads = list(downloads)
+        for download in downloads:
+            try:
+                self.download(download.index, sub_index=download.sub_index)
+            except _REQUEST_ERRORS as e:
+                logger.warning(f"Download of index:{download.index} failed: {e}")
+                download.error = e
+        return downloads
@@ -1,5 +1,7 @@
 from pyetg1510.mailbox.connection import *
 from pyetg1510.mailbox.mailbox_gateway import *
+from pyetg1510.mailbox.mmsg_transport import *
+from pyetg1510.mailbox.recorder import *
 from pyetg1510.mailbox.sdo_application_interface import *
 
 VERSION = (0, 0, 1)
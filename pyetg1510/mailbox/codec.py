@@ -0,0 +1,94 @@
+"""ctypes.Structure のビットフィールドを struct で符号化・復号するモジュール
+
+``_fields_`` から格納単位（storage unit）毎の :class:`struct.Struct` フォーマットと、各フィールドのシフト量・マスクを
+あらかじめ求めておき、整数演算だけでリトルエンディアンのフレームを作成・解析する。
+"""
+from ctypes import Structure, sizeof
+from struct import Struct
+from typing import Dict, Tuple, Type
+
+_UNIT_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+
+class StructureCodec:
+    """ctypes.Structure のレイアウトをコンパイルしたコーデック
+
+    同じ型のビットフィールドが格納単位に収まる限り詰め、収まらない場合や型が変わる場合は次の格納単位へ進める
+    （ ``_pack_ = 1`` のリトルエンディアンのレイアウト）。
+
+    Args:
+        structure(Type[Structure]): 対象の ctypes.Structure クラス
+
+    Raises:
+        ValueError: 求めたレイアウトのサイズが ctypes のサイズと一致しない場合
+    """
+
+    _cache: Dict[Type[Structure], "StructureCodec"] = {}
+
+    def __init__(self, structure: Type[Structure]):
+        self.structure = structure
+        names = []
+        layout = []
+        unit_formats = "<"
+        unit = -1
+        current_type = None
+        used_bits = 0
+        for item in structure._fields_:
+            name, field_type = item[0], item[1]
+            unit_bits = sizeof(field_type) * 8
+            bits = item[2] if len(item) > 2 else unit_bits
+            if len(item) == 2 or field_type is not current_type or used_bits + bits > unit_bits:
+                unit += 1
+                unit_formats += _UNIT_FORMATS[sizeof(field_type)]
+                current_type = field_type if len(item) > 2 else None
+                used_bits = 0
+            names.append(name)
+            layout.append((unit, used_bits, (1 << bits) - 1))
+            used_bits += bits
+        self.names: Tuple[str, ...] = tuple(names)
+        """フィールド名（ ``_fields_`` の順）"""
+        self._layout: Tuple[Tuple[int, int, int], ...] = tuple(layout)
+        self._units = unit + 1
+        self.struct = Struct(unit_formats)
+        self.size: int = self.struct.size
+        """符号化したバイト数"""
+        if self.size != sizeof(structure):
+            raise ValueError(
+                f"Layout of {structure.__name__} is {self.size} bytes, but ctypes says {sizeof(structure)} bytes."
+            )
+
+    @classmethod
+    def of(cls, structure: Type[Structure]) -> "StructureCodec":
+        """ctypes.Structure クラスのコーデックを返す。一度作成したコーデックは再利用する。"""
+        codec = cls._cache.get(structure)
+        if codec is None:
+            codec = cls._cache[structure] = cls(structure)
+        return codec
+
+    def _units_of(self, values) -> list:
+        units = [0] * self._units
+        for (unit, shift, mask), value in zip(self._layout, values):
+            units[unit] |= (int(value) & mask) << shift
+        return units
+
+    def pack(self, *values: int) -> bytes:
+        """フィールドの値（ ``_fields_`` の順）を符号化する"""
+        return self.struct.pack(*self._units_of(values))
+
+    def pack_into(self, buffer, offset: int, *values: int):
+        """フィールドの値（ ``_fields_`` の順）を ``buffer`` の ``offset`` へ符号化する"""
+        self.struct.pack_into(buffer, offset, *self._units_of(values))
+
+    def pack_structure(self, structure: Structure) -> bytes:
+        """ctypes.Structure オブジェクトを符号化する"""
+        return self.pack(*[getattr(structure, name) for name in self.names])
+
+    def unpack(self, buffer, offset: int = 0) -> Tuple[int, ...]:
+        """``buffer`` の ``offset`` からフィールドの値（ ``_fields_`` の順）を復号する"""
+        units = self.struct.unpack_from(buffer, offset)
+        return tuple((units[unit] >> shift) & mask for unit, shift, mask in self._layout)
+
+    def unpack_into(self, buffer, structure: Structure, offset: int = 0):
+        """``buffer`` の ``offset`` から復号した値を ctypes.Structure オブジェクトへ設定する"""
+        for name, value in zip(self.names, self.unpack(buffer, offset)):
+            setattr(structure, name, value)
@@ -1,52 +1,741 @@
 """UDP/IP非同期通信モジュール
 """
 import asyncio
-from dataclasses import dataclass, field
+import socket
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from enum import Enum
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+from pyetg1510.helper import SysLog
+from pyetg1510.mailbox.mailbox_gateway import (
+    MailBoxFrameOffsetAddress,
+    SdoRequestCommand,
+    SdoResponseCommand,
+    SdoService,
+)
+from pyetg1510.mailbox.mmsg_transport import MMSG_SUPPORTED, MmsgDatagramTransport, MmsgEndpoint
+
+logger = SysLog.logger
+
+MAX_SESSION_COUNTER = 7
+"""Mailbox header の Cnt が取り得る最大値。Cnt は 1..7 を巡回する。"""
+
+_CNT_OFFSET = MailBoxFrameOffsetAddress.MAILBOX_HEADER.value + 5
+_SERVICE_OFFSET = MailBoxFrameOffsetAddress.COE_HEADER.value + 1
+_INDEX_OFFSET = MailBoxFrameOffsetAddress.SDO_HEADER.value + 1
+_ADDRESSED_COMMANDS = {
+    SdoService.REQUEST.value: (
+        SdoRequestCommand.SDOREQ_DOWNLOAD.value,
+        SdoRequestCommand.SDOREQ_UPLOAD.value,
+        SdoRequestCommand.SDOREQ_ABORT_TRANSFER.value,
+    ),
+    SdoService.RESPONSE.value: (
+        SdoResponseCommand.SDORES_UPLOAD.value,
+        SdoResponseCommand.SDORES_DOWNLOAD.value,
+        SdoRequestCommand.SDOREQ_ABORT_TRANSFER.value,
+    ),
+}
+"""index, subindex を持つ SDO コマンド（セグメント転送は SDO header の後ろが全てデータ）"""
+
+
+def get_session_counter(frame: bytes) -> int:
+    """フレームの Mailbox header から Cnt を取り出す"""
+    return (frame[_CNT_OFFSET] >> 4) & 0x07
+
+
+def set_session_counter(frame: bytearray, session_counter: int):
+    """フレームの Mailbox header の Cnt を書き換える"""
+    frame[_CNT_OFFSET] = (frame[_CNT_OFFSET] & 0x8F) | (session_counter << 4)
+
+
+def get_sdo_address(frame: bytes) -> Optional[Tuple[int, int]]:
+    """SDO リクエスト/レスポンスフレームの (index, subindex) を返す。
+
+    SDO Information やセグメント転送など、SDO header に index, subindex を持たないフレームはNone
+    """
+    if len(frame) < MailBoxFrameOffsetAddress.SDO_DATA.value:
+        return None
+    service = frame[_SERVICE_OFFSET] >> 4
+    command = frame[MailBoxFrameOffsetAddress.SDO_HEADER.value] >> 5
+    if service not in _ADDRESSED_COMMANDS or command not in _ADDRESSED_COMMANDS[service]:
+        return None
+    return int.from_bytes(frame[_INDEX_OFFSET : _INDEX_OFFSET + 2], "little"), frame[_INDEX_OFFSET + 2]
+
+
+def is_response_to(sdo_address: Optional[Tuple[int, int]], frame: bytes) -> bool:
+    """``frame`` が (index, subindex) ``sdo_address`` へのリクエストに対するレスポンスになり得るかを返す
+
+    Args:
+        sdo_address(Tuple[int, int]): リクエストの :func:`get_sdo_address` 。SDO Information やセグメント転送はNone
+        frame(bytes): 受信したフレーム
+
+    Return:
+        bool: index/subindex を持つリクエストには同じ index/subindex のレスポンス、持たないリクエストには
+        index/subindex を持たないレスポンスか SDO Abort の場合にTrue
+    """
+    response_address = get_sdo_address(frame)
+    if sdo_address is not None:
+        return response_address == sdo_address
+    return response_address is None or (
+        frame[MailBoxFrameOffsetAddress.SDO_HEADER.value] >> 5 == SdoRequestCommand.SDOREQ_ABORT_TRANSFER.value
+    )
+
+
+class TransportBackend(Enum):
+    """常時接続モードで用いるトランスポートの実装"""
+
+    ASYNCIO = "asyncio"
+    """asyncio 標準のデータグラムトランスポート"""
+    MMSG = "mmsg"
+    """sendmmsg/recvmmsg でまとめて送受信するトランスポート (Linux専用)"""
+
+
+@dataclass
+class RttEstimator:
+    """RTT推定とリトランスミッションタイムアウト(RTO)の算出
+
+    TCP (RFC 6298) と同様に、平滑化RTT(SRTT)とその変動(RTTVAR)から RTO = SRTT + 4 × RTTVAR を求める。
+    サンプルを得るまでは ``initial_rto`` を用い、RTOは ``min_rto`` 以上 ``max_rto`` 以下に制限する。
+
+    RFC 6298 の下限1秒はインターネット経由のTCP向けの値で、同じLAN上のゲートウェイには長すぎる。一方、メールボックスの
+    レスポンス時間はメインデバイスのサイクルやメールボックスのポーリングで数十ms程度揺らぐため、平滑化したRTTが数msでも
+    RTOをそこまで縮めると、遅れただけのレスポンスを待たずに再送してしまう。 ``min_rto`` の既定値 0.1秒はこの揺らぎを
+    上回り、かつ失われたフレームを1秒よりずっと早く再送できる値とした。
+
+    Args:
+        initial_rto(float): 最初のサンプルを得るまでのRTO（秒）
+        min_rto(float): RTOの下限（秒）。応答時間の揺らぎが大きいゲートウェイではこの値を大きくする。
+        max_rto(float): RTOの上限（秒）。応答の遅いゲートウェイではこの値を大きくする。
+    """
+
+    initial_rto: float = field(default=1.0)
+    min_rto: float = field(default=0.1)
+    max_rto: float = field(default=3.0)
+    srtt: float = field(default=None, init=False)
+    """平滑化RTT（秒）"""
+    rttvar: float = field(default=None, init=False)
+    """RTTの変動（秒）"""
+    rto: float = field(default=None, init=False)
+    """現在のRTO（秒）"""
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __post_init__(self):
+        self.rto = self.initial_rto
+
+    def update(self, sample: float):
+        """RTTのサンプルを反映してRTOを更新する
+
+        Args:
+            sample(float): 計測したRTT（秒）。再送したリクエストのRTTは用いないこと。
+        """
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - sample)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * sample
+        self.rto = min(max(self.srtt + self.K * self.rttvar, self.min_rto), self.max_rto)
+
+
+@dataclass
+class TokenBucket:
+    """トークンバケット
+
+    トークンは毎秒 ``rate`` 個ずつ ``capacity`` 個まで溜まる。 :meth:`reserve` は不足分を前借りして予約し、
+    予約した順に送信時刻を割り当てるため、複数のコルーチンやスレッドで共有しても先着順に公平に待たされる。
+
+    Args:
+        rate(float): 1秒あたりに補充するトークン数
+        capacity(float): 溜められるトークン数の上限（バースト）。省略時は ``rate`` （1秒分）
+    """
+
+    rate: float
+    capacity: float = field(default=None)
+    tokens: float = field(default=None, init=False)
+    """現在のトークン数。予約により負になる。"""
+    updated_at: float = field(default_factory=time.monotonic, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.rate <= 0:
+            raise ValueError(f"rate must be positive. Set to {self.rate}")
+        if self.capacity is None:
+            self.capacity = self.rate
+        self.tokens = self.capacity
+
+    def reserve(self, amount: float, now: float) -> float:
+        """トークンを予約し、使用できるまでの待ち時間を返す
+
+        Args:
+            amount(float): 予約するトークン数
+            now(float): 現在時刻（ :func:`time.monotonic` ）
+
+        Return:
+            float: 待ち時間（秒）
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
 
 
 @dataclass
-class Messages:
-    send: any = field(init=True)
-    receive: any = field(init=False)
+class RateLimiter:
+    """Mailbox Gateway への送信レート制限
+
+    リクエスト数/秒とバイト数/秒の2つのトークンバケットで送信を制限する。再送も1リクエストとして数える。
+    同じゲートウェイを使う複数のコネクタで制限を共有する場合は、同じインスタンスを ``rate_limiter`` に指定する。
 
+    Args:
+        requests_per_second(float): 1秒あたりの最大リクエスト数。Noneの場合は制限しない。
+        bytes_per_second(float): 1秒あたりの最大送信バイト数。Noneの場合は制限しない。
+        burst_requests(float): 連続して送信できるリクエスト数。省略時は1秒分
+        burst_bytes(float): 連続して送信できるバイト数。省略時は1秒分
+    """
+
+    requests_per_second: Optional[float] = field(default=None)
+    bytes_per_second: Optional[float] = field(default=None)
+    burst_requests: Optional[float] = field(default=None)
+    burst_bytes: Optional[float] = field(default=None)
+    _buckets: Tuple[Tuple[TokenBucket, bool], ...] = field(default=(), init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        buckets = []
+        if self.requests_per_second is not None:
+            buckets.append((TokenBucket(self.requests_per_second, self.burst_requests), False))
+        if self.bytes_per_second is not None:
+            buckets.append((TokenBucket(self.bytes_per_second, self.burst_bytes), True))
+        self._buckets = tuple(buckets)
+
+    def reserve(self, size: int) -> float:
+        """1リクエスト分のトークンを予約し、送信できるまでの待ち時間を返す
+
+        Args:
+            size(int): 送信するフレームのバイト数
+
+        Return:
+            float: 待ち時間（秒）
+        """
+        with self._lock:
+            now = time.monotonic()
+            return max((bucket.reserve(size if by_size else 1, now) for bucket, by_size in self._buckets), default=0.0)
+
+
+@dataclass
+class ConnectionStatistics:
+    """コネクタの通信統計"""
 
-class UDPClientConnection:
-    def __init__(self, message: Messages, on_con_lost):
-        self.message: Messages = message
-        self.on_con_lost = on_con_lost
+    requests: int = 0
+    """送信したリクエスト数（再送を除く）"""
+    responses: int = 0
+    """レスポンスを受信したリクエスト数"""
+    retransmissions: int = 0
+    """再送回数"""
+    timeouts: int = 0
+    """全ての再送がタイムアウトしたリクエスト数"""
+    throttled: int = 0
+    """レート制限により送信を待たされた回数（再送を含む）"""
+    throttle_time: float = 0.0
+    """レート制限により送信を待たされた時間の合計（秒）"""
+
+
+@dataclass
+class PendingRequest:
+    """レスポンス待ちのリクエスト"""
+
+    session_counter: int
+    """送信時に割り当てた Cnt"""
+    sdo_address: Optional[Tuple[int, int]]
+    """リクエストした (index, subindex) 。レスポンスの照合に用いる"""
+    waiter: asyncio.Future
+    fragments: Optional[asyncio.Queue] = None
+    """最初のレスポンス以降に届いたレスポンス。 :meth:`EtherCATMasterConnection.request_fragments` の場合のみ"""
+    sent_at: float = 0.0
+    """最後に送信した時刻（ :func:`time.perf_counter` ）"""
+
+
+class MailboxGatewayProtocol(asyncio.DatagramProtocol):
+    """Mailbox Gateway 用UDPプロトコル
+
+    受信したデータグラムを :class:`EtherCATMasterConnection` へ渡し、待機中のコルーチンへ振り分ける。
+    """
+
+    def __init__(self, connection: "EtherCATMasterConnection"):
+        self.connection = connection
         self.transport = None
 
     def connection_made(self, transport):
         self.transport = transport
-        self.transport.sendto(self.message.send)
 
     def datagram_received(self, data, addr):
-        self.message.receive = data
-        self.transport.close()
+        self.connection._dispatch(data)
 
     def error_received(self, exc):
-        print("Error received:", exc)
+        logger.warning(f"Error received: {exc}")
 
     def connection_lost(self, exc):
-        # self.transport.close()
-        self.on_con_lost.set_result(True)
+        self.connection._abort(exc)
 
 
 @dataclass
-class EtherCATMasterConnection:
+class MailboxGatewayConnection:
+    """Mailbox Gateway コネクタの共通部分
+
+    レスポンスが :attr:`rto` 以内に得られなければ同じフレームを再送し、再送毎に待ち時間を ``backoff`` 倍する。
+    待ち時間を延ばすのはタイムアウトしたリクエスト自身だけで、 :attr:`rto` は再送していないレスポンスのRTTからのみ更新する。
+    ``retries`` 回再送してもレスポンスが得られなければ TimeoutError とする。
+
+    Args:
+        host(str): Mailbox Gateway のアドレス
+        port(int): Mailbox Gateway のポート番号
+        retries(int): タイムアウト時の再送回数
+        backoff(float): 再送毎にRTOを増加させる倍率
+        rtt_estimator(RttEstimator): RTT推定器。RTOの初期値や上下限を変更する場合に指定する。
+        rate_limiter(RateLimiter): 送信レート制限。Noneの場合は制限しない。
+        recorder(SessionRecorder): 送受信したフレームを記録する :class:`SessionRecorder
+            <pyetg1510.mailbox.recorder.SessionRecorder>` 。Noneの場合は記録しない。
+    """
+
     host: str = field(default_factory=str, init=True)
     port: int = field(default=9001, init=True)
+    retries: int = field(default=3, init=True)
+    backoff: float = field(default=2.0, init=True)
+    rtt_estimator: RttEstimator = field(default_factory=RttEstimator, init=True)
+    rate_limiter: Optional[RateLimiter] = field(default=None, init=True)
+    recorder: Optional["SessionRecorder"] = field(default=None, init=True, compare=False)
     received_data: any = field(default=None, init=False)
+    statistics: ConnectionStatistics = field(default_factory=ConnectionStatistics, init=False, compare=False)
+    _session_counter: int = field(default=0, init=False, repr=False, compare=False)
+
+    @property
+    def rto(self) -> float:
+        """現在のRTO（秒）"""
+        return self.rtt_estimator.rto
+
+    @property
+    def srtt(self) -> float:
+        """平滑化RTT（秒）。まだサンプルが無い場合はNone"""
+        return self.rtt_estimator.srtt
+
+    def _throttle_delay(self, size: int) -> float:
+        if self.rate_limiter is None:
+            return 0.0
+        delay = self.rate_limiter.reserve(size)
+        if delay > 0:
+            self.statistics.throttled += 1
+            self.statistics.throttle_time += delay
+        return delay
+
+    def _received(self, frame: bytes, response: bytes, sent_at: float, attempt: int):
+        round_trip = time.perf_counter() - sent_at
+        if attempt == 0:
+            # Karn's algorithm: RTT of retransmitted requests is ambiguous
+            self.rtt_estimator.update(round_trip)
+        self.statistics.responses += 1
+        if self.recorder is not None:
+            self.recorder.record(bytes(frame), response, sent_at, round_trip)
 
-    async def send_data(self, message):
+    def _received_fragment(self, frame: bytes, response: bytes, sent_at: float):
+        """最初のレスポンス以降に受信したレスポンスを記録する。RTTの推定には用いない。"""
+        self.statistics.responses += 1
+        if self.recorder is not None:
+            self.recorder.record(bytes(frame), response, sent_at, time.perf_counter() - sent_at)
+
+    @property
+    def _fragment_timeout(self) -> float:
+        """最初のレスポンス以降のレスポンスを待つ時間（秒）。再送を使い切るまでの待ち時間と同じ"""
+        return min(self.rtt_estimator.rto * self.backoff**self.retries, self.rtt_estimator.max_rto)
+
+    def _next_session_counter(self) -> int:
+        self._session_counter = self._session_counter % MAX_SESSION_COUNTER + 1
+        return self._session_counter
+
+
+@dataclass
+class EtherCATMasterConnection(MailboxGatewayConnection):
+    """Mailbox Gateway とのUDP非同期通信コネクタ
+
+    :meth:`open` を呼び出すと、 :meth:`close` までの間ひとつのトランスポートを使い回す常時接続モードになる。
+    :meth:`open` せずに :meth:`send_data` を呼び出した場合は、従来どおりリクエスト毎にエンドポイントを作成・破棄する。
+    再送の制御は :class:`MailboxGatewayConnection` を参照。
+
+    常時接続モードでは、最大 ``window`` 個のリクエストを同時に送信したままにできる（パイプライン）。
+    送信するフレームの Mailbox header の Cnt を未使用の値に書き換え、レスポンスは Cnt と index/subindex で照合する。
+
+    使用例:
+        .. code-block:: python
+
+            async with EtherCATMasterConnection("192.168.2.254", 34980, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+
+    ``backend`` に :attr:`TransportBackend.MMSG` を指定すると、イベントループの同じ周回で送信されたフレーム
+    （ ``window`` 個のパイプラインや :meth:`ETG1510Profile.fetch_all` の並列リクエスト）を1回の ``sendmmsg`` で送信し、
+    レスポンスを ``recvmmsg`` でまとめて受信する。1つの接続では Cnt の数（最大7個）までしかまとめられないため、
+    複数の Mailbox Gateway と通信する場合は同じ :class:`MmsgEndpoint
+    <pyetg1510.mailbox.mmsg_transport.MmsgEndpoint>` を ``mmsg_endpoint`` に渡し、全ての接続のフレームをまとめて送受信する。
+
+    Args:
+        window(int): 同時に送信したままにできるリクエスト数（1..7）
+        backend(TransportBackend): トランスポートの実装
+        mmsg_endpoint(MmsgEndpoint): ``backend`` が :attr:`TransportBackend.MMSG` の場合に用いるソケット。
+            Noneの場合は接続毎にソケットを作成する。
+    """
+
+    window: int = field(default=1, init=True)
+    backend: TransportBackend = field(default=TransportBackend.ASYNCIO, init=True)
+    mmsg_endpoint: Optional[MmsgEndpoint] = field(default=None, init=True, repr=False, compare=False)
+    _transport: asyncio.DatagramTransport = field(default=None, init=False, repr=False, compare=False)
+    _pending: Dict[int, PendingRequest] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _slots: asyncio.Semaphore = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not 1 <= self.window <= MAX_SESSION_COUNTER:
+            raise ValueError(f"window must be within 1-{MAX_SESSION_COUNTER}. Set to {self.window}")
+        if self.backend is TransportBackend.MMSG and not MMSG_SUPPORTED:
+            raise NotImplementedError("TransportBackend.MMSG is only available on Linux.")
+        if self.mmsg_endpoint is not None and self.backend is not TransportBackend.MMSG:
+            raise ValueError("mmsg_endpoint requires backend=TransportBackend.MMSG.")
+
+    @property
+    def is_open(self) -> bool:
+        """トランスポートが開いていればTrue"""
+        return self._transport is not None and not self._transport.is_closing()
+
+    @property
+    def in_flight(self) -> int:
+        """レスポンス待ちのリクエスト数"""
+        return len(self._pending)
+
+    async def open(self):
+        """Mailbox Gateway へのトランスポートを開き、常時接続モードにする。既に開いている場合は何もしない。"""
+        if self.is_open:
+            return
         loop = asyncio.get_running_loop()
-        on_con_lost = loop.create_future()
-        messages = Messages(message)
-        transport, protocol = await loop.create_datagram_endpoint(
-            lambda: UDPClientConnection(messages, on_con_lost), remote_addr=(self.host, self.port)
+        if self.backend is TransportBackend.MMSG:
+            self._transport = await self._open_mmsg_transport(loop)
+        else:
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: MailboxGatewayProtocol(self), remote_addr=(self.host, self.port)
+            )
+        self._pending = {}
+        self._slots = asyncio.Semaphore(self.window)
+        logger.debug(f"Connection to {self.host}:{self.port} opened.")
+
+    async def _open_mmsg_transport(self, loop: asyncio.AbstractEventLoop) -> MmsgDatagramTransport:
+        infos = await loop.getaddrinfo(self.host, self.port, type=socket.SOCK_DGRAM)
+        endpoint = self.mmsg_endpoint if self.mmsg_endpoint is not None else MmsgEndpoint()
+        return endpoint.create_transport(loop, infos[0][4], MailboxGatewayProtocol(self))
+
+    def close(self):
+        """トランスポートを閉じる。レスポンス待ちのコルーチンには ConnectionError を送出する。"""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+            logger.debug(f"Connection to {self.host}:{self.port} closed.")
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def send_data(self, message: bytes) -> bytes:
+        """リクエストを送信し、レスポンスを待つ
+
+        Args:
+            message(bytes): 送信するフレーム
+
+        Return:
+            bytes: 受信したフレーム。 :attr:`received_data` にも格納する。
+
+        Raises:
+            TimeoutError: 再送してもレスポンスが得られない場合
+        """
+        if self.is_open:
+            self.received_data = await self._request(message)
+            return self.received_data
+
+        # one endpoint per request unless the connection has been opened
+        async with replace(self) as connection:
+            connection.statistics = self.statistics
+            self.received_data = await connection._request(message)
+        return self.received_data
+
+    async def request_fragments(self, message: bytes) -> AsyncIterator[bytes]:
+        """リクエストを送信し、同じ Cnt で届くレスポンスを受信順に返す
+
+        SDO Information service のフラグメントのように、ひとつのリクエストに複数のレスポンスが返る場合に用いる。
+        最初のレスポンスまでは :meth:`send_data` と同じく再送し、以降のレスポンスは再送せずに待つ。
+        イテレーションを終了するまで Cnt を確保したままにするため、不要になったら ``aclose()`` すること。
+
+        Args:
+            message(bytes): 送信するフレーム
+
+        Return:
+            AsyncIterator[bytes]: 受信したフレーム
+
+        Raises:
+            TimeoutError: 再送しても最初のレスポンスが得られない場合、次のレスポンスが届かない場合
+        """
+        if not self.is_open:
+            async with replace(self) as connection:
+                connection.statistics = self.statistics
+                responses = connection.request_fragments(message)
+                try:
+                    async for response in responses:
+                        yield response
+                finally:
+                    await responses.aclose()
+            return
+
+        async with self._slots:
+            frame, pending = self._register(message)
+            pending.fragments = asyncio.Queue()
+            try:
+                self.received_data = await self._transmit(frame, pending)
+                yield self.received_data
+                while True:
+                    try:
+                        self.received_data = await asyncio.wait_for(pending.fragments.get(), self._fragment_timeout)
+                    except asyncio.TimeoutError:
+                        self.statistics.timeouts += 1
+                        raise asyncio.TimeoutError(
+                            f"No further response for Cnt:{pending.session_counter} from {self.host}:{self.port}."
+                        )
+                    self._received_fragment(frame, self.received_data, pending.sent_at)
+                    yield self.received_data
+            finally:
+                self._release(pending)
+
+    async def _request(self, message: bytes) -> bytes:
+        async with self._slots:
+            frame, pending = self._register(message)
+            try:
+                return await self._transmit(frame, pending)
+            finally:
+                self._release(pending)
+
+    def _register(self, message: bytes) -> Tuple[bytearray, PendingRequest]:
+        """未使用の Cnt を割り当てたフレームと、そのレスポンス待ちを登録する"""
+        frame = bytearray(message)
+        session_counter = self._allocate_session_counter()
+        set_session_counter(frame, session_counter)
+        pending = PendingRequest(
+            session_counter=session_counter,
+            sdo_address=get_sdo_address(frame),
+            waiter=asyncio.get_running_loop().create_future(),
         )
-        try:
-            await asyncio.wait_for(on_con_lost, 3)
-            self.received_data = messages.receive
-        finally:
-            transport.close()
+        self._pending[session_counter] = pending
+        self.statistics.requests += 1
+        return frame, pending
+
+    def _release(self, pending: PendingRequest):
+        self._pending.pop(pending.session_counter, None)
+        pending.waiter.cancel()
+
+    async def _transmit(self, frame: bytearray, pending: PendingRequest) -> bytes:
+        """フレームを送信し、最初のレスポンスを待つ。タイムアウトした場合は再送する。"""
+        session_counter = pending.session_counter
+        timeout = self.rtt_estimator.rto
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                self.statistics.retransmissions += 1
+                logger.debug(f"Retransmit Cnt:{session_counter} ({attempt}/{self.retries}) to {self.host}:{self.port}")
+            delay = self._throttle_delay(len(frame))
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if not self.is_open:
+                    raise ConnectionError(f"Connection to {self.host}:{self.port} closed.")
+            sent_at = pending.sent_at = time.perf_counter()
+            self._transport.sendto(frame)
+            try:
+                response = await asyncio.wait_for(asyncio.shield(pending.waiter), timeout)
+            except asyncio.TimeoutError:
+                timeout = min(timeout * self.backoff, self.rtt_estimator.max_rto)
+                continue
+            self._received(frame, response, sent_at, attempt)
+            return response
+        self.statistics.timeouts += 1
+        raise asyncio.TimeoutError(f"No response from {self.host}:{self.port} after {self.retries} retransmissions.")
+
+    def _allocate_session_counter(self) -> int:
+        for _ in range(MAX_SESSION_COUNTER):
+            session_counter = self._next_session_counter()
+            if session_counter not in self._pending:
+                return session_counter
+        raise RuntimeError("No free session counter.")
+
+    def _dispatch(self, data: bytes):
+        pending = None
+        if len(data) > _CNT_OFFSET:
+            sdo_address = get_sdo_address(data)
+            session_counter = get_session_counter(data)
+            if session_counter:
+                # the gateway echoes Cnt: a datagram without a pending Cnt is a late duplicate
+                pending = self._pending.get(session_counter)
+                if pending is not None and not is_response_to(pending.sdo_address, data):
+                    pending = None
+            elif sdo_address is not None:
+                pending = next((p for p in self._pending.values() if p.sdo_address == sdo_address), None)
+            elif len(self._pending) == 1:
+                pending = next(iter(self._pending.values()))
+        if pending is not None and pending.waiter.done() and pending.fragments is not None:
+            # further response to a request waiting for fragments
+            pending.fragments.put_nowait(data)
+            return
+        if pending is None or pending.waiter.done():
+            logger.debug(f"Discarded unexpected datagram from {self.host}:{self.port}: {data}")
+            return
+        pending.waiter.set_result(data)
+
+    def _abort(self, exc):
+        for pending in list(self._pending.values()):
+            if not pending.waiter.done():
+                pending.waiter.set_exception(exc or ConnectionError(f"Connection to {self.host}:{self.port} closed."))
+
+
+@dataclass
+class BlockingEtherCATMasterConnection(MailboxGatewayConnection):
+    """Mailbox Gateway とのUDP同期通信コネクタ
+
+    asyncio を使わないスレッドベースのアプリケーション向けに、 :class:`EtherCATMasterConnection` と同じフレームを
+    ブロッキングソケットで送受信する。ソケットは最初の :meth:`send_data` で開き、 :meth:`close` まで使い回す。
+    複数スレッドから共有した場合、リクエストはひとつずつ順に処理する。再送の制御は :class:`MailboxGatewayConnection` を参照。
+
+    使用例:
+        .. code-block:: python
+
+            with BlockingEtherCATMasterConnection("192.168.2.254", 34980) as connection:
+                master_od = BlockingMasterODSpecification(connection=connection)
+                master_od.get_object_dictionary()
+    """
+
+    _socket: socket.socket = field(default=None, init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    @property
+    def is_open(self) -> bool:
+        """ソケットが開いていればTrue"""
+        return self._socket is not None
+
+    def open(self):
+        """Mailbox Gateway へのソケットを開く。既に開いている場合は何もしない。"""
+        if self.is_open:
+            return
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.connect((self.host, self.port))
+        logger.debug(f"Connection to {self.host}:{self.port} opened.")
+
+    def close(self):
+        """ソケットを閉じる"""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            logger.debug(f"Connection to {self.host}:{self.port} closed.")
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def send_data(self, message: bytes) -> bytes:
+        """リクエストを送信し、レスポンスを待つ
+
+        Args:
+            message(bytes): 送信するフレーム
+
+        Return:
+            bytes: 受信したフレーム。 :attr:`received_data` にも格納する。
+
+        Raises:
+            TimeoutError: 再送してもレスポンスが得られない場合
+        """
+        with self._lock:
+            self.received_data, _, _ = self._transmit(message)
+            return self.received_data
+
+    def request_fragments(self, message: bytes) -> Iterator[bytes]:
+        """リクエストを送信し、同じ Cnt で届くレスポンスを受信順に返す
+
+        :meth:`EtherCATMasterConnection.request_fragments` の同期版。イテレーションを終了するまで他のリクエストを待たせるため、
+        不要になったら ``close()`` すること。
+
+        Args:
+            message(bytes): 送信するフレーム
+
+        Return:
+            Iterator[bytes]: 受信したフレーム
+
+        Raises:
+            TimeoutError: 再送しても最初のレスポンスが得られない場合、次のレスポンスが届かない場合
+        """
+        with self._lock:
+            self.received_data, frame, sent_at = self._transmit(message)
+            yield self.received_data
+            session_counter = get_session_counter(frame)
+            sdo_address = get_sdo_address(frame)
+            while True:
+                response = self._receive(session_counter, sdo_address, time.perf_counter() + self._fragment_timeout)
+                if response is None:
+                    self.statistics.timeouts += 1
+                    raise TimeoutError(f"No further response for Cnt:{session_counter} from {self.host}:{self.port}.")
+                self._received_fragment(frame, response, sent_at)
+                self.received_data = response
+                yield response
+
+    def _transmit(self, message: bytes) -> Tuple[bytes, bytearray, float]:
+        """フレームを送信し、最初のレスポンスと送信したフレーム、送信時刻を返す。タイムアウトした場合は再送する。"""
+        self.open()
+        frame = bytearray(message)
+        session_counter = self._next_session_counter()
+        set_session_counter(frame, session_counter)
+        sdo_address = get_sdo_address(frame)
+        self.statistics.requests += 1
+        timeout = self.rtt_estimator.rto
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                self.statistics.retransmissions += 1
+                logger.debug(f"Retransmit Cnt:{session_counter} ({attempt}/{self.retries}) to {self.host}:{self.port}")
+            delay = self._throttle_delay(len(frame))
+            if delay > 0:
+                time.sleep(delay)
+            sent_at = time.perf_counter()
+            self._socket.send(frame)
+            response = self._receive(session_counter, sdo_address, sent_at + timeout)
+            if response is None:
+                timeout = min(timeout * self.backoff, self.rtt_estimator.max_rto)
+                continue
+            self._received(frame, response, sent_at, attempt)
+            return response, frame, sent_at
+        self.statistics.timeouts += 1
+        raise TimeoutError(f"No response from {self.host}:{self.port} after {self.retries} retransmissions.")
+
+    def _receive(
+        self, session_counter: int, sdo_address: Optional[Tuple[int, int]], deadline: float
+    ) -> Optional[bytes]:
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            self._socket.settimeout(remaining)
+            try:
+                data = self._socket.recv(0xFFFF)
+            except socket.timeout:
+                return None
+            except ConnectionRefusedError as e:
+                logger.warning(f"Error received: {e}")
+                return None
+            # a late response to an earlier request has a different Cnt or SDO address
+            if len(data) <= _CNT_OFFSET:
+                return data
+            if get_session_counter(data) in (0, session_counter) and is_response_to(sdo_address, data):
+                return data
+            logger.debug(f"Discarded unexpected datagram from {self.host}:{self.port}: {data}")
@@ -1,13 +1,16 @@
 """Mailbox Gateway 通信フレーム制御モジュール
 
 """
+import logging
 import sys
 from ctypes import *
-from bitarray import bitarray, util
+from struct import pack
+from bitarray import bitarray
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Union
 from pyetg1510.helper import SysLog
+from pyetg1510.mailbox.codec import StructureCodec
 
 logger = SysLog.logger
 
@@ -88,8 +91,8 @@ class EtherCATHeader(Structure):
     _pack_ = 1
     _fields_ = [
         ("Length", c_uint16, 11),  # 'H' -> int
-        ("Reserved", c_uint8, 1),  # '?' -> bool
-        ("DataType", c_uint8, 4),  # 'B' -> int
+        ("Reserved", c_uint16, 1),  # '?' -> bool
+        ("DataType", c_uint16, 4),  # 'B' -> int
     ]
 
 
@@ -110,8 +113,8 @@ class CoEHeader(Structure):
     _pack_ = 1
     _fields_ = [
         ("Number", c_uint16, 9),  # 'H' -> int
-        ("Reserved", c_uint8, 3),  # 'B' -> int
-        ("Service", c_uint8, 4),  # 'B' -> int
+        ("Reserved", c_uint16, 3),  # 'B' -> int
+        ("Service", c_uint16, 4),  # 'B' -> int
     ]
 
 
@@ -140,6 +143,29 @@ class SDOResponse(Structure):
     ]
 
 
+class SDODownloadRequest(Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("SizeIndicator", c_uint8, 1),  # True : enable following size specification
+        ("TransferType", c_uint8, 1),  # True: Expedited / False: Normal
+        ("DataSetSize", c_uint8, 2),  # 0: 4byte, 1 : 3byte, 2: 2byte, 3: 1byte
+        ("CompleteAccess", c_uint8, 1),  # multi subindex
+        ("CommandSpecifier", c_uint8, 3),  # defined as 'SdoRequestCommand' enum type
+        ("Index", c_uint16, 16),  # 'H' -> int
+        ("SubIndex", c_uint8, 8),  # 'B' -> int
+    ]
+
+
+class SDOSegmentHeader(Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("LastSegment", c_uint8, 1),  # True: last segment
+        ("SegDataSize", c_uint8, 3),  # unused bytes of a 7 byte segment
+        ("Toggle", c_uint8, 1),  # alternates with every segment, starting at 0
+        ("CommandSpecifier", c_uint8, 3),  # defined as 'SdoResponseCommand' enum type
+    ]
+
+
 class SDOInformationHeader(Structure):
     _pack_ = 1
     _fields_ = [
@@ -164,6 +190,14 @@ class SDOInformationEntryRequest(Structure):
     _fields_ = [("Index", c_uint16, 16), ("Subindex", c_uint8, 8), ("ValueInfo", c_uint8, 8)]
 
 
+_ETHERCAT_HEADER_CODEC = StructureCodec.of(EtherCATHeader)
+_MAILBOX_HEADER_CODEC = StructureCodec.of(MailboxHeader)
+_COE_HEADER_CODEC = StructureCodec.of(CoEHeader)
+_SDO_REQUEST_CODEC = StructureCodec.of(SDORequest)
+_SDO_INFORMATION_HEADER_CODEC = StructureCodec.of(SDOInformationHeader)
+_SDO_DOWNLOAD_REQUEST_CODEC = StructureCodec.of(SDODownloadRequest)
+
+
 @dataclass
 class SDOMessage:
     sdo_service: SdoService = field(default_factory=SdoService, init=True)
@@ -218,13 +252,21 @@ class SDOMessage:
 
         return _bitarray
 
-    def make_coe_header(self, sdo_data_size: int, increase_session: bool = True) -> bitarray:
+    def make_header_frame(self, sdo_data_size: int, increase_session: bool = True) -> bytes:
+        """EtherCAT header, Mailbox header, CoE header のバイト列を作成する
+
+        Args:
+            sdo_data_size(int): CoE header に続くSDO部分のバイト数
+            increase_session(bool): Trueの場合、session_counter を進めてから Cnt に設定する
+
+        Return:
+            bytes: 3つのヘッダを連結したバイト列
+        """
         # CoE Header message parameter set
         self.coe_header.Number = 0
         self.coe_header.Reserved = 0
         self.coe_header.Service = self.sdo_service.value
-        coe_header_bytes = self.get_bytes(self.coe_header)
-        body_size = int((sdo_data_size + len(coe_header_bytes)) / 8)
+        body_size = sdo_data_size + _COE_HEADER_CODEC.size
         self.mailbox_header.Length = body_size
         self.mailbox_header.Address = self.station_address
         self.mailbox_header.Channel = 0
@@ -243,22 +285,25 @@ class SDOMessage:
 
         self.mailbox_header.Cnt = self.session_counter
         self.mailbox_header.Reserved = 0
-        mailbox_header_bytes = self.get_bytes(self.mailbox_header)
 
         # EtherCAT Header message parameter set
-        total_length = int(len(mailbox_header_bytes) / 8) + body_size
+        total_length = _MAILBOX_HEADER_CODEC.size + body_size
 
         self.ethercat_header.Length = total_length
         self.ethercat_header.Reserved = 0
         self.ethercat_header.DataType = EtherCATProtocolType.MAILBOX.value
-        ecat_header_bytes = self.get_bytes(self.ethercat_header)
 
         # join whole frames
-        _bitarray = bitarray()
-        _bitarray.extend(ecat_header_bytes)
-        _bitarray.extend(mailbox_header_bytes)
-        _bitarray.extend(coe_header_bytes)
+        return (
+            _ETHERCAT_HEADER_CODEC.pack_structure(self.ethercat_header)
+            + _MAILBOX_HEADER_CODEC.pack_structure(self.mailbox_header)
+            + _COE_HEADER_CODEC.pack_structure(self.coe_header)
+        )
 
+    def make_coe_header(self, sdo_data_size: int, increase_session: bool = True) -> bitarray:
+        """:meth:`make_header_frame` の bitarray 版。 ``sdo_data_size`` はビット数で指定する。"""
+        _bitarray = bitarray()
+        _bitarray.frombytes(self.make_header_frame(int(sdo_data_size / 8), increase_session))
         return _bitarray
 
 
@@ -273,72 +318,36 @@ class SDOResponseMessage(SDOMessage):
             raise ValueError("Property sdo_service should be only in [Sdoservice.RESPONSE, SdoService.INFO]")
 
     def parse_response_frame(self, response: bytes):
-        def debug_log(s: Structure):
-            result = {f[0]: getattr(s, f[0]) for f in s._fields_}
-            logger.debug(f"{self.__class__.__name__} {s.__class__.__name__}: {result}")
-
-        _bitarray_response = bitarray()
-        _bitarray_response.frombytes(response)
-
-        # Parse EtherCAT header
-        ethercat_header = _bitarray_response[
-            MailBoxFrameOffsetAddress.ETHERCAT_HEADER.value * 8 : MailBoxFrameOffsetAddress.MAILBOX_HEADER.value * 8
-        ]
-        self._map_structure(ethercat_header, self.ethercat_header)
-
-        debug_log(self.ethercat_header)
-
-        # Parse Mailbox header
-        mailbox_header = _bitarray_response[
-            MailBoxFrameOffsetAddress.MAILBOX_HEADER.value * 8 : MailBoxFrameOffsetAddress.COE_HEADER.value * 8
-        ]
-        self._map_structure(mailbox_header, self.mailbox_header)
-
-        debug_log(self.mailbox_header)
+        """受信したフレームのヘッダを復号し、SDOデータ本体を :attr:`data_body` に設定する
 
-        # Parse CoE header
-        coe_header = _bitarray_response[
-            MailBoxFrameOffsetAddress.COE_HEADER.value * 8 : MailBoxFrameOffsetAddress.SDO_HEADER.value * 8
-        ]
-        self._map_structure(coe_header, self.coe_header)
+        ヘッダは ``response`` から直接 ``from_buffer_copy`` で復号し、 :attr:`data_body` は ``response`` の
+        SDOデータ部分を参照する memoryview とする（コピーしない）。
 
-        debug_log(self.coe_header)
+        Args:
+            response(bytes): 受信したフレーム
+        """
 
-        # Parse sdo response data
-        if self.sdo_service == SdoService.INFO:
-            sdo_header = _bitarray_response[
-                MailBoxFrameOffsetAddress.SDO_HEADER.value * 8 : MailBoxFrameOffsetAddress.SDO_DATA.value * 8
-            ]
-            self._map_structure(sdo_header, self.sdo_header)
-
-            data_body_bitarray = _bitarray_response[MailBoxFrameOffsetAddress.SDO_DATA.value * 8 :]
-
-            self.data_body = data_body_bitarray.tobytes()
-
-        else:
-            sdo_header = _bitarray_response[
-                MailBoxFrameOffsetAddress.SDO_HEADER.value * 8 : MailBoxFrameOffsetAddress.SDO_DATA.value * 8
-            ]
-            self._map_structure(sdo_header, self.sdo_header)
+        def debug_log(s: Structure):
+            result = {f[0]: getattr(s, f[0]) for f in s._fields_}
+            logger.debug(f"{self.__class__.__name__} {s.__class__.__name__}: {result}")
 
-            data_body_bitarray = _bitarray_response[MailBoxFrameOffsetAddress.SDO_DATA.value * 8 :]
+        view = memoryview(response)
+        if len(view) < MailBoxFrameOffsetAddress.SDO_DATA.value:
+            # short frame: missing header bytes are decoded as 0
+            view = memoryview(bytes(view).ljust(MailBoxFrameOffsetAddress.SDO_DATA.value, b"\0"))
 
-            self.data_body = data_body_bitarray.tobytes()
+        # Parse EtherCAT header, Mailbox header, CoE header and SDO header
+        self.ethercat_header = EtherCATHeader.from_buffer_copy(view, MailBoxFrameOffsetAddress.ETHERCAT_HEADER.value)
+        self.mailbox_header = MailboxHeader.from_buffer_copy(view, MailBoxFrameOffsetAddress.MAILBOX_HEADER.value)
+        self.coe_header = CoEHeader.from_buffer_copy(view, MailBoxFrameOffsetAddress.COE_HEADER.value)
+        self.sdo_header = type(self.sdo_header).from_buffer_copy(view, MailBoxFrameOffsetAddress.SDO_HEADER.value)
 
-        debug_log(self.sdo_header)
+        # sdo response data body
+        self.data_body = view[MailBoxFrameOffsetAddress.SDO_DATA.value :]
 
-    def _map_structure(self, input: bitarray, struct_obj: Structure):
-        offset = 0
-        if sys.byteorder != input.endian():
-            input.bytereverse()
-        for item in struct_obj._fields_:
-            next_offset = offset + item[2]
-            sliced = input[offset:next_offset]
-            if sys.byteorder != input.endian():
-                sliced.reverse()
-            if len(sliced) > 0:
-                setattr(struct_obj, item[0], util.ba2int(sliced))
-            offset += item[2]
+        if logger.isEnabledFor(logging.DEBUG):
+            for header in (self.ethercat_header, self.mailbox_header, self.coe_header, self.sdo_header):
+                debug_log(header)
 
 
 class SDOCommandMessage(SDOMessage):
@@ -359,19 +368,15 @@ class SDOCommandMessage(SDOMessage):
         else:
             TypeError(f"sdo_header should be SDORequest type.")
 
-        sdo_bitarray = self.get_bytes(self.sdo_header)
+        sdo_bytes = _SDO_REQUEST_CODEC.pack_structure(self.sdo_header)
         if self.sdo_command_data is not None:
-            sdo_bitarray.extend(self.get_bytes(self.sdo_command_data))
+            sdo_bytes += StructureCodec.of(type(self.sdo_command_data)).pack_structure(self.sdo_command_data)
 
         logger.debug(
             f"Request Body: {self.sdo_command_data.__class__.__name__}, Index:{hex(self.index)}, Subindex:{hex(self.sub_index)} specified."
         )
 
-        _bitarray = self.make_coe_header(len(sdo_bitarray))
-        _bitarray.extend(sdo_bitarray)
-
-        # convert bitarray with bytes data and return
-        return _bitarray.tobytes()
+        return self.make_header_frame(len(sdo_bytes)) + sdo_bytes
 
 
 class SDORequestInfoMessage(SDOMessage):
@@ -405,12 +410,42 @@ class SDORequestInfoMessage(SDOMessage):
             f"Request Body: {self.sdo_command_data.__class__.__name__}, Index:{hex(self.index)}, Subindex:{hex(self.sub_index)} specified."
         )
 
-        sdo_bitarray = self.get_bytes(self.sdo_header)
+        sdo_bytes = _SDO_INFORMATION_HEADER_CODEC.pack_structure(self.sdo_header)
         if self.sdo_command_data is not None:
-            sdo_bitarray.extend(self.get_bytes(self.sdo_command_data))
+            sdo_bytes += StructureCodec.of(type(self.sdo_command_data)).pack_structure(self.sdo_command_data)
+
+        return self.make_header_frame(len(sdo_bytes)) + sdo_bytes
+
+
+class SDODownloadMessage(SDOMessage):
+    """Build SDO "Initiate Download" request frame
+
+    1..4 byteのデータは expedited 転送、それ以外は総サイズに続けてデータを格納する normal 転送とする。
+    """
+
+    data: bytes = field(default=b"", init=False)
 
-        _bitarray = self.make_coe_header(len(sdo_bitarray))
-        _bitarray.extend(sdo_bitarray)
+    def __post_init__(self):
+        super().__post_init__()
+        self.sdo_header = SDODownloadRequest()
+
+    def make_request_frame(self, increase_session: bool = True) -> bytes:
+        expedited = 0 < len(self.data) <= 4 and not self.complete_access
+        self.sdo_header.SizeIndicator = 1
+        self.sdo_header.TransferType = int(expedited)
+        self.sdo_header.DataSetSize = 4 - len(self.data) if expedited else 0
+        self.sdo_header.CompleteAccess = int(self.complete_access)
+        self.sdo_header.CommandSpecifier = SdoRequestCommand.SDOREQ_DOWNLOAD.value
+        self.sdo_header.Index = self.index
+        self.sdo_header.SubIndex = self.sub_index
+
+        if expedited:
+            body = bytes(self.data).ljust(4, b"\0")
+        else:
+            body = pack("<I", len(self.data)) + bytes(self.data)
+        logger.debug(
+            f"Download: Index:{hex(self.index)}, Subindex:{hex(self.sub_index)}, {len(self.data)} bytes, expedited: {expedited}"
+        )
 
-        # convert bitarray with bytes data and return
-        return _bitarray.tobytes()
+        sdo_bytes = _SDO_DOWNLOAD_REQUEST_CODEC.pack_structure(self.sdo_header) + body
+        return self.make_header_frame(len(sdo_bytes), increase_session) + sdo_bytes
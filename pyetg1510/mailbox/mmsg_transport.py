@@ -0,0 +1,360 @@
+"""sendmmsg/recvmmsg によるUDPトランスポートモジュール (Linux専用)
+
+送信要求を溜めておき、イベントループの1周につき1回の ``sendmmsg`` でまとめて送信する。
+受信は ``recvmmsg`` で、あらかじめ確保したバッファへ複数のデータグラムを一度に読み込む。
+
+1つの接続がレスポンス待ちにできるリクエストは Mailbox header の Cnt の数（最大7個）までのため、接続毎にソケットを持つと
+1回のシステムコールで送受信できるのも7個までになる。 :class:`MmsgEndpoint` は1つのソケットを複数の Mailbox Gateway
+への接続で共有し、全ての接続のフレームをまとめて送受信する。
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import socket
+import struct
+import sys
+from typing import Dict, List, Optional, Tuple
+
+
+class IOVec(ctypes.Structure):
+    """struct iovec"""
+
+    _fields_ = [
+        ("iov_base", ctypes.c_void_p),
+        ("iov_len", ctypes.c_size_t),
+    ]
+
+
+class MsgHdr(ctypes.Structure):
+    """struct msghdr"""
+
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class MMsgHdr(ctypes.Structure):
+    """struct mmsghdr"""
+
+    _fields_ = [
+        ("msg_hdr", MsgHdr),
+        ("msg_len", ctypes.c_uint),
+    ]
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if not (hasattr(libc, "sendmmsg") and hasattr(libc, "recvmmsg")):
+        return None
+    libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    libc.sendmmsg.restype = ctypes.c_int
+    libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    libc.recvmmsg.restype = ctypes.c_int
+    return libc
+
+
+_libc = _load_libc()
+
+MMSG_SUPPORTED = _libc is not None
+"""sendmmsg/recvmmsg が利用可能であればTrue"""
+
+
+_SOCKADDR_SIZE = 128
+"""sizeof(struct sockaddr_storage)"""
+
+
+def _pack_sockaddr(family: int, address: tuple) -> bytes:
+    """(host, port) を struct sockaddr_in / sockaddr_in6 のバイト列にする"""
+    if family == socket.AF_INET:
+        host, port = address[:2]
+        return struct.pack("=H", family) + struct.pack("!H", port) + socket.inet_pton(family, host) + bytes(8)
+    host, port, flowinfo, scope_id = (tuple(address) + (0, 0))[:4]
+    return (
+        struct.pack("=H", family)
+        + struct.pack("!HI", port, flowinfo)
+        + socket.inet_pton(family, host)
+        + struct.pack("=I", scope_id)
+    )
+
+
+def _unpack_sockaddr(name: bytes) -> Optional[tuple]:
+    """struct sockaddr_in / sockaddr_in6 のバイト列を (host, port) にする。その他のアドレスはNone"""
+    family = struct.unpack_from("=H", name)[0]
+    if family == socket.AF_INET:
+        return socket.inet_ntop(family, name[4:8]), struct.unpack_from("!H", name, 2)[0]
+    if family == socket.AF_INET6:
+        port, flowinfo = struct.unpack_from("!HI", name, 2)
+        return socket.inet_ntop(family, name[8:24]), port, flowinfo, struct.unpack_from("=I", name, 24)[0]
+    return None
+
+
+class _MessageVector:
+    """preallocated buffers, addresses and mmsghdr array for one direction"""
+
+    def __init__(self, batch_size: int, buffer_size: int):
+        self.buffer_size = buffer_size
+        self.buffers = ((ctypes.c_char * buffer_size) * batch_size)()
+        self.names = ((ctypes.c_char * _SOCKADDR_SIZE) * batch_size)()
+        self.iovecs = (IOVec * batch_size)()
+        self.messages = (MMsgHdr * batch_size)()
+        for i in range(batch_size):
+            self.iovecs[i].iov_base = ctypes.addressof(self.buffers[i])
+            self.iovecs[i].iov_len = buffer_size
+            self.messages[i].msg_hdr.msg_name = ctypes.addressof(self.names[i])
+            self.messages[i].msg_hdr.msg_namelen = _SOCKADDR_SIZE
+            self.messages[i].msg_hdr.msg_iov = ctypes.pointer(self.iovecs[i])
+            self.messages[i].msg_hdr.msg_iovlen = 1
+
+
+class MmsgEndpoint:
+    """sendmmsg/recvmmsg で送受信するUDPソケット
+
+    接続していないUDPソケットを1つ開き、宛先毎の :class:`MmsgDatagramTransport` を作成する。イベントループの同じ周回で
+    送信されたデータグラムは宛先に関わらず1回の ``sendmmsg`` で送信し、受信したデータグラムは送信元のアドレスで
+    振り分ける。同じインスタンスを複数の :class:`EtherCATMasterConnection
+    <pyetg1510.mailbox.connection.EtherCATMasterConnection>` に渡すと、複数の Mailbox Gateway へのリクエストを
+    まとめて送受信できる。
+
+    ソケットは最初のトランスポートを作成した時に開き、最後のトランスポートを閉じた時に閉じる。
+    ソケットを接続しないため、ICMP の Port Unreachable などは :meth:`asyncio.DatagramProtocol.error_received` に通知されない。
+
+    使用例:
+        .. code-block:: python
+
+            endpoint = MmsgEndpoint()
+            connections = [
+                EtherCATMasterConnection(host, 34980, window=7, backend=TransportBackend.MMSG, mmsg_endpoint=endpoint)
+                for host in ("192.168.2.254", "192.168.3.254")
+            ]
+
+    Args:
+        batch_size(int): 1回のシステムコールで送受信する最大データグラム数
+        buffer_size(int): データグラム1個あたりのバッファサイズ（バイト）
+    """
+
+    def __init__(self, batch_size: int = 64, buffer_size: int = 1500):
+        if not MMSG_SUPPORTED:
+            raise NotImplementedError("sendmmsg/recvmmsg are only available on Linux.")
+        self._batch_size = batch_size
+        self._send_vector = _MessageVector(batch_size, buffer_size)
+        self._receive_vector = _MessageVector(batch_size, buffer_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sock: Optional[socket.socket] = None
+        self._fileno = -1
+        self._transports: Dict[Tuple[str, int], "MmsgDatagramTransport"] = {}
+        self._send_queue: List[Tuple["MmsgDatagramTransport", bytes]] = []
+        self._flush_scheduled = False
+        self._writer_registered = False
+        self.send_calls = 0
+        """``sendmmsg`` の呼び出し回数"""
+        self.sent = 0
+        """送信したデータグラム数"""
+        self.receive_calls = 0
+        """データグラムを1個以上受信した ``recvmmsg`` の呼び出し回数"""
+        self.received = 0
+        """受信したデータグラム数"""
+
+    @property
+    def is_open(self) -> bool:
+        """ソケットが開いていればTrue"""
+        return self._sock is not None
+
+    @property
+    def family(self) -> Optional[int]:
+        """ソケットのアドレスファミリ。開いていない場合はNone"""
+        return None if self._sock is None else self._sock.family
+
+    def create_transport(
+        self, loop: asyncio.AbstractEventLoop, address: tuple, protocol: asyncio.DatagramProtocol
+    ) -> "MmsgDatagramTransport":
+        """宛先 ``address`` とデータグラムを送受信するトランスポートを作成する
+
+        Args:
+            loop(asyncio.AbstractEventLoop): イベントループ
+            address(tuple): ``getaddrinfo`` で解決した宛先のアドレス
+            protocol(asyncio.DatagramProtocol): 宛先から受信したデータグラムを渡すプロトコル
+
+        Return:
+            MmsgDatagramTransport: 宛先毎のトランスポート
+
+        Raises:
+            ValueError: 同じ宛先のトランスポートが既にある、またはソケットとアドレスファミリが異なる場合
+            RuntimeError: ソケットを開いたイベントループと異なるイベントループから呼び出した場合
+        """
+        family = socket.AF_INET6 if len(address) == 4 else socket.AF_INET
+        peer = tuple(address[:2])
+        if self._sock is None:
+            self._open(loop, family)
+        elif loop is not self._loop:
+            raise RuntimeError("MmsgEndpoint is already used by another event loop.")
+        elif family != self._sock.family:
+            raise ValueError(f"Address family of {peer} differs from the endpoint socket.")
+        if peer in self._transports:
+            raise ValueError(f"A transport to {peer} already exists on this endpoint.")
+        transport = MmsgDatagramTransport(self, tuple(address), _pack_sockaddr(family, address), protocol)
+        self._transports[peer] = transport
+        loop.call_soon(protocol.connection_made, transport)
+        return transport
+
+    def close(self):
+        """全てのトランスポートを閉じる"""
+        for transport in list(self._transports.values()):
+            transport.close()
+
+    def _open(self, loop: asyncio.AbstractEventLoop, family: int):
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        self._loop = loop
+        self._sock = sock
+        self._fileno = sock.fileno()
+        self._loop.add_reader(self._fileno, self._read_ready)
+
+    def _detach(self, transport: "MmsgDatagramTransport"):
+        """トランスポートを外す。最後のトランスポートを外した場合はソケットを閉じる。"""
+        if self._transports.get(transport.peer) is transport:
+            del self._transports[transport.peer]
+        self._send_queue = [item for item in self._send_queue if item[0] is not transport]
+        if self._transports or self._sock is None:
+            return
+        self._loop.remove_reader(self._fileno)
+        if self._writer_registered:
+            self._writer_registered = False
+            self._loop.remove_writer(self._fileno)
+        self._send_queue.clear()
+        self._sock.close()
+        self._sock = None
+        self._fileno = -1
+        self._loop = None
+
+    def _sendto(self, transport: "MmsgDatagramTransport", data):
+        if len(data) > self._send_vector.buffer_size:
+            raise ValueError(f"Datagram size {len(data)} exceeds buffer size {self._send_vector.buffer_size}.")
+        self._send_queue.append((transport, bytes(data)))
+        if not self._flush_scheduled and not self._writer_registered:
+            self._flush_scheduled = True
+            self._loop.call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        while self._send_queue and self._sock is not None:
+            count = min(len(self._send_queue), self._batch_size)
+            vector = self._send_vector
+            for i in range(count):
+                transport, data = self._send_queue[i]
+                ctypes.memmove(vector.buffers[i], data, len(data))
+                vector.iovecs[i].iov_len = len(data)
+                ctypes.memmove(vector.names[i], transport.sockaddr, len(transport.sockaddr))
+                vector.messages[i].msg_hdr.msg_namelen = len(transport.sockaddr)
+            sent = _libc.sendmmsg(self._fileno, vector.messages, count, 0)
+            self.send_calls += 1
+            if sent < 0:
+                err = ctypes.get_errno()
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    if not self._writer_registered:
+                        self._writer_registered = True
+                        self._loop.add_writer(self._fileno, self._write_ready)
+                    return
+                # drop the datagram at the head of the queue, as a failed sendto would
+                transport, _ = self._send_queue.pop(0)
+                transport.get_protocol().error_received(OSError(err, errno.errorcode.get(err, str(err))))
+                continue
+            self.sent += sent
+            del self._send_queue[:sent]
+        if self._writer_registered:
+            self._writer_registered = False
+            self._loop.remove_writer(self._fileno)
+
+    def _write_ready(self):
+        self._flush()
+
+    def _read_ready(self):
+        vector = self._receive_vector
+        while self._sock is not None:
+            for i in range(self._batch_size):
+                vector.iovecs[i].iov_len = vector.buffer_size
+                vector.messages[i].msg_hdr.msg_namelen = _SOCKADDR_SIZE
+            received = _libc.recvmmsg(self._fileno, vector.messages, self._batch_size, socket.MSG_DONTWAIT, None)
+            if received < 0:
+                err = ctypes.get_errno()
+                if err not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    exc = OSError(err, errno.errorcode.get(err, str(err)))
+                    for transport in list(self._transports.values()):
+                        transport.get_protocol().error_received(exc)
+                return
+            self.receive_calls += 1
+            self.received += received
+            for i in range(received):
+                address = _unpack_sockaddr(ctypes.string_at(vector.names[i], vector.messages[i].msg_hdr.msg_namelen))
+                transport = None if address is None else self._transports.get(address[:2])
+                if transport is None:
+                    # not from any of the gateways using this endpoint
+                    continue
+                data = ctypes.string_at(vector.buffers[i], vector.messages[i].msg_len)
+                transport.get_protocol().datagram_received(data, transport.peername)
+            if received < self._batch_size:
+                return
+
+
+class MmsgDatagramTransport(asyncio.DatagramTransport):
+    """:class:`MmsgEndpoint` のソケットで1つの宛先と送受信するトランスポート
+
+    asyncio の DatagramTransport と同じインターフェースでプロトコルへデータグラムを渡す。
+    :meth:`MmsgEndpoint.create_transport` で作成する。
+
+    Args:
+        endpoint(MmsgEndpoint): 送受信に用いるソケット
+        peername(tuple): 宛先のアドレス
+        sockaddr(bytes): 宛先の struct sockaddr
+        protocol(asyncio.DatagramProtocol): 受信したデータグラムを渡すプロトコル
+    """
+
+    def __init__(self, endpoint: MmsgEndpoint, peername: tuple, sockaddr: bytes, protocol: asyncio.DatagramProtocol):
+        super().__init__()
+        self._endpoint = endpoint
+        self._loop = endpoint._loop
+        self.peername = peername
+        self.peer = tuple(peername[:2])
+        self.sockaddr = sockaddr
+        self._protocol = protocol
+        self._closing = False
+        self._extra = {"socket": endpoint._sock, "sockname": endpoint._sock.getsockname(), "peername": peername}
+
+    def get_extra_info(self, name, default=None):
+        return self._extra.get(name, default)
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+    def get_protocol(self):
+        return self._protocol
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def get_write_buffer_size(self) -> int:
+        return sum(len(data) for transport, data in self._endpoint._send_queue if transport is self)
+
+    def sendto(self, data, addr=None):
+        """送信キューに追加する。キューはイベントループの次の周回で他の宛先の分とまとめて送信する。"""
+        if self._closing:
+            return
+        self._endpoint._sendto(self, data)
+
+    def close(self):
+        if self._closing:
+            return
+        self._closing = True
+        self._endpoint._detach(self)
+        self._loop.call_soon(self._protocol.connection_lost, None)
+
+    def abort(self):
+        self.close()
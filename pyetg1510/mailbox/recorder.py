@@ -0,0 +1,274 @@
+"""Mailbox通信の記録・再生モジュール
+
+:class:`SessionRecorder` をコネクタの ``recorder`` に指定すると、送信したリクエストと受信したレスポンスの組を
+タイムスタンプと共にファイルへ記録する。記録したファイルは :class:`ReplayConnection` で再生でき、
+プラントのネットワークに接続せずに :class:`ETG1510Profile <pyetg1510.etg_1510.ETG1510Profile>` などを動作させられる。
+
+ファイル形式（リトルエンディアン）:
+    ヘッダ: ``b"ETGREC"``, バージョン (uint8), 記録開始時刻のUNIX時間 (double)
+
+    レコード: 記録開始からの送信時刻[秒] (double), RTT[秒] (float), リクエスト長 (uint16), レスポンス長 (uint16),
+    リクエスト, レスポンス
+
+ファイル名が ``.gz`` で終わる場合はgzipで圧縮する。
+"""
+import asyncio
+import gzip
+import os
+import struct
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, BinaryIO, Deque, Dict, Iterator, List, Optional, Set
+from pyetg1510.helper import SysLog
+from pyetg1510.mailbox.connection import ConnectionStatistics, get_session_counter, set_session_counter
+
+logger = SysLog.logger
+
+_MAGIC = b"ETGREC"
+_VERSION = 1
+_HEADER = struct.Struct("<6sBd")
+_RECORD = struct.Struct("<dfHH")
+
+
+def _open(path: os.PathLike, mode: str) -> BinaryIO:
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+@dataclass
+class RecordedExchange:
+    """記録したリクエストとレスポンスの組"""
+
+    timestamp: float
+    """記録開始からの送信時刻（秒）"""
+    round_trip: float
+    """送信からレスポンス受信までの時間（秒）"""
+    request: bytes
+    """送信したフレーム"""
+    response: bytes
+    """受信したフレーム"""
+
+
+@dataclass
+class SessionRecorder:
+    """コネクタの送受信を記録する
+
+    使用例:
+        .. code-block:: python
+
+            with SessionRecorder("session.etgrec.gz") as recorder:
+                async with EtherCATMasterConnection("192.168.2.254", 34980, recorder=recorder) as connection:
+                    ...
+
+    Args:
+        path(os.PathLike): 記録するファイルのパス。既存のファイルは上書きする。
+    """
+
+    path: os.PathLike
+    count: int = field(default=0, init=False)
+    """記録したレコード数"""
+    _file: BinaryIO = field(default=None, init=False, repr=False)
+    _started_at: float = field(default=None, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self):
+        self._file = _open(self.path, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, time.time()))
+        self._started_at = time.perf_counter()
+
+    def record(self, request: bytes, response: bytes, sent_at: float, round_trip: float):
+        """リクエストとレスポンスの組を記録する
+
+        Args:
+            request(bytes): 送信したフレーム
+            response(bytes): 受信したフレーム
+            sent_at(float): 送信時刻（ :func:`time.perf_counter` ）
+            round_trip(float): 送信からレスポンス受信までの時間（秒）
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(_RECORD.pack(sent_at - self._started_at, round_trip, len(request), len(response)))
+            self._file.write(request)
+            self._file.write(response)
+            self.count += 1
+
+    def close(self):
+        """ファイルを閉じる"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_session(path: os.PathLike) -> Iterator[RecordedExchange]:
+    """記録したファイルを読み込む
+
+    Args:
+        path(os.PathLike): :class:`SessionRecorder` で記録したファイルのパス
+
+    Return:
+        Iterator[RecordedExchange]: 記録順のリクエストとレスポンスの組
+
+    Raises:
+        ValueError: ファイル形式が異なる場合
+    """
+    with _open(path, "rb") as f:
+        magic, version, _ = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a session record (version {_VERSION}).")
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            timestamp, round_trip, request_size, response_size = _RECORD.unpack(header)
+            request = f.read(request_size)
+            response = f.read(response_size)
+            yield RecordedExchange(timestamp, round_trip, request, response)
+
+
+def _request_key(frame: bytes) -> bytes:
+    """Cnt を除いたリクエストフレーム"""
+    key = bytearray(frame)
+    set_session_counter(key, 0)
+    return bytes(key)
+
+
+@dataclass
+class ReplayConnection:
+    """記録したレスポンスを返す :class:`EtherCATMasterConnection <pyetg1510.mailbox.connection.EtherCATMasterConnection>`
+    の代替コネクタ
+
+    リクエストと Cnt 以外が一致する記録のうち、まだ返していないものを記録順に返す。
+    レスポンスは記録したRTTを ``speed`` で割った時間だけ遅らせて返す。さらに最初の再生では、記録した受信時刻
+    （最初のリクエストからの経過時間を ``speed`` で割った時刻）より前には返さないため、記録したリクエストの間隔も再現する。
+    ``loop`` で繰り返す2周目以降はRTTだけを再現する。
+
+    使用例:
+        .. code-block:: python
+
+            connection = ReplayConnection.load("session.etgrec.gz", speed=None)
+            master_od = MasterODSpecification(connection=connection)
+            await master_od.get_object_dictionary()
+
+    Args:
+        exchanges(List[RecordedExchange]): 再生する記録
+        speed(float): 再生速度の倍率。Noneの場合は遅延なしで返す。
+        loop(bool): Trueの場合、同じリクエストの記録を返し終えたら最初から繰り返す。
+        window(int): 同時に処理するリクエスト数。 :meth:`ETG1510Profile.fetch_all <pyetg1510.etg_1510.ETG1510Profile.fetch_all>` が参照する。
+    """
+
+    exchanges: List[RecordedExchange]
+    speed: Optional[float] = field(default=1.0)
+    loop: bool = field(default=True)
+    window: int = field(default=1)
+    received_data: bytes = field(default=None, init=False)
+    statistics: ConnectionStatistics = field(default_factory=ConnectionStatistics, init=False, compare=False)
+    _queues: Dict[bytes, Deque[RecordedExchange]] = field(default=None, init=False, repr=False, compare=False)
+    _replayed: Set[int] = field(default_factory=set, init=False, repr=False, compare=False)
+    _origin: float = field(default=0.0, init=False, repr=False, compare=False)
+    _started_at: Optional[float] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.speed is not None and self.speed <= 0:
+            raise ValueError(f"speed must be positive. Set to {self.speed}")
+        self._queues = defaultdict(deque)
+        for exchange in self.exchanges:
+            self._queues[_request_key(exchange.request)].append(exchange)
+        self._origin = min((exchange.timestamp for exchange in self.exchanges), default=0.0)
+
+    @classmethod
+    def load(cls, path: os.PathLike, **kwargs) -> "ReplayConnection":
+        """記録したファイルから作成する
+
+        Args:
+            path(os.PathLike): :class:`SessionRecorder` で記録したファイルのパス
+            kwargs: :class:`ReplayConnection` の引数
+        """
+        return cls(list(read_session(path)), **kwargs)
+
+    async def send_data(self, message: bytes) -> bytes:
+        """記録したレスポンスを返す
+
+        Args:
+            message(bytes): 送信するフレーム
+
+        Return:
+            bytes: 記録したレスポンスフレーム。Cnt はリクエストに合わせる。
+
+        Raises:
+            KeyError: リクエストに対応する記録が無い場合
+        """
+        exchange = self._next_exchange(message)
+        self.statistics.requests += 1
+        delay = self._delay(exchange)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._respond(message, exchange)
+
+    async def request_fragments(self, message: bytes) -> AsyncIterator[bytes]:
+        """記録したレスポンスを返す。 :meth:`EtherCATMasterConnection.request_fragments
+        <pyetg1510.mailbox.connection.EtherCATMasterConnection.request_fragments>` の代替
+
+        最初のレスポンスは :meth:`send_data` と同じ。以降は同じリクエストの記録を記録順に返す。
+
+        Args:
+            message(bytes): 送信するフレーム
+
+        Return:
+            AsyncIterator[bytes]: 記録したレスポンスフレーム
+
+        Raises:
+            KeyError: リクエストに対応する記録が無い場合
+        """
+        exchange = self._next_exchange(message)
+        self.statistics.requests += 1
+        round_trip = 0.0
+        while True:
+            delay = self._delay(exchange, round_trip)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            round_trip = exchange.round_trip
+            yield self._respond(message, exchange)
+            exchange = self._next_exchange(message)
+
+    def _next_exchange(self, message: bytes) -> RecordedExchange:
+        key = _request_key(message)
+        queue = self._queues.get(key)
+        if not queue:
+            raise KeyError(f"No recorded response for request {bytes(message).hex()}")
+        exchange = queue.popleft()
+        if self.loop:
+            queue.append(exchange)
+        return exchange
+
+    def _delay(self, exchange: RecordedExchange, waited: float = 0.0) -> float:
+        """レスポンスを返すまでの待ち時間。 ``waited`` は同じリクエストの前のレスポンスまでに再現したRTT"""
+        if self.speed is None:
+            return 0.0
+        now = time.perf_counter()
+        if self._started_at is None:
+            self._started_at = now
+        delay = max(0.0, exchange.round_trip - waited) / self.speed
+        if id(exchange) not in self._replayed:
+            # first pass: not earlier than the response was recorded
+            self._replayed.add(id(exchange))
+            received_at = self._started_at + (exchange.timestamp - self._origin + exchange.round_trip) / self.speed
+            delay = max(delay, received_at - now)
+        return delay
+
+    def _respond(self, message: bytes, exchange: RecordedExchange) -> bytes:
+        response = bytearray(exchange.response)
+        set_session_counter(response, get_session_counter(message))
+        self.statistics.responses += 1
+        self.received_data = bytes(response)
+        return self.received_data
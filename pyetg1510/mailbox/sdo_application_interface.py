@@ -2,14 +2,19 @@
 SDOデータ生成モジュール
 """
 from abc import ABCMeta, abstractmethod
+from bisect import bisect_right
+from copy import deepcopy
 from dataclasses import dataclass, asdict, field
 import dataclasses
-from typing import Dict, Generic, TypeVar, Tuple
-from struct import calcsize, unpack_from, unpack, error
+import logging
+import time
+from typing import Callable, Dict, Generic, Hashable, Optional, TypeVar, Tuple, Union
+from struct import Struct, calcsize, pack, unpack_from, error
 from ctypes import Structure
 from pyetg1510.helper import SysLog
 from pyetg1510.mailbox import (
     EtherCATMasterConnection,
+    BlockingEtherCATMasterConnection,
     SDOInformationODListRequest,
     SDOInformationEntryRequest,
     SDOInformationDescriptionRequest,
@@ -18,12 +23,27 @@ from pyetg1510.mailbox import (
     SDORequestInfoMessage,
     SdoInfoOpcode,
     SDOCommandMessage,
+    SDODownloadMessage,
+    SDOSegmentHeader,
+    SDOInformationHeader,
+    MailboxHeader,
+    MailBoxFrameOffsetAddress,
+    SdoRequestCommand,
+    SdoResponseCommand,
 )
 
 logger = SysLog.logger
 
 T = TypeVar("T")
 is_primitive = lambda x: isinstance(x, (int, float, bool, str))
+_PRIMITIVE_TYPES = (int, float, bool, str)
+
+
+def _value_kind(value) -> Hashable:
+    """値から :attr:`SdoEntry.value_kind` を求める。 :class:`LazySdoEntry` は復号せずに同じ判定をする。"""
+    if isinstance(value, _PRIMITIVE_TYPES):
+        return "primitive"
+    return "list" if type(value) is list else type(value)
 
 
 @dataclass
@@ -129,6 +149,8 @@ class SdoEntry(Generic[T]):
     """
     enable: bool = field(default=False, init=True)
     """Enabled flag by SDO information service"""
+    changed: bool = field(default=False, init=False, compare=False)
+    """直前の収集で値が変化した場合True。 :class:`SdoDataController` の ``track_changes`` がTrueの場合に更新する。"""
 
     def __post_init__(self):
         if self.size is None:
@@ -137,6 +159,190 @@ class SdoEntry(Generic[T]):
             else:
                 self.size = len(self.value) * calcsize(self.format)
 
+    @property
+    def unpack_format(self) -> str:
+        """エントリ部分の struct format。 :attr:`size` が :attr:`format` のサイズより大きければ個数を頭に付ける。"""
+        format_size = calcsize(self.format)
+        if is_primitive(self.value):
+            # for primitive entry value
+            logger.debug(f"{self.value} : is primitive.")
+            if format_size < self.size:
+                return str(int(self.size / format_size)) + self.format
+            return self.format
+        elif hasattr(self.value, "__iter__"):
+            # for iterable object entry
+            logger.debug(f"{self.value} : is NOT primitive. size :{self.size}, format size: {format_size}")
+            return str(int(self.size / format_size)) + self.format
+        return self.format
+
+    @property
+    def value_kind(self) -> Hashable:
+        """復号手順を決める値の種類。数値型・文字列型は ``"primitive"`` 、リストは ``"list"`` 、それ以外は値の型"""
+        return _value_kind(self.value)
+
+    @property
+    def pack_format(self) -> str:
+        """値を書き込む struct format
+
+        数値型の値は1つなので :attr:`format` とする。 :meth:`SdoDataController._map` が受信データの余りを最後のエントリの
+        :attr:`size` に加えるため、 :attr:`unpack_format` は複数個を表す場合がある。
+        """
+        if is_primitive(self.value) and not isinstance(self.value, str):
+            return self.format
+        return self.unpack_format
+
+    def pack_values(self) -> list:
+        """:attr:`pack_format` で struct.pack する値のリスト。文字列はエンコードし、コレクション型は要素を展開する。"""
+        if isinstance(self.value, str):
+            return [self.value.encode()]
+        elif is_primitive(self.value):
+            return [self.value]
+        return list(self.value)
+
+    def pack(self) -> bytes:
+        """値を :attr:`pack_format` でバイト列に変換する
+
+        Raises:
+            struct.error: 値が format に合わない場合
+        """
+        return pack("=" + self.pack_format, *self.pack_values())
+
+
+@dataclass(frozen=True)
+class UnpackPlan:
+    """SdoDataBody の有効なエントリとサイズの組み合わせ毎にコンパイルした復号手順
+
+    :meth:`SdoDataBody.unpack_plan` が作成し、クラスとレイアウト毎に再利用する。
+    """
+
+    format: str
+    """struct.unpack の format"""
+    struct: Struct
+    """format をコンパイルした struct.Struct"""
+    assignments: Tuple[Tuple[str, int, Optional[int], bool], ...]
+    """有効なエントリ毎の (フィールド名, 値の位置, 要素数, 文字列の復号有無) 。要素数は数値型・文字列型は0、
+    リスト以外のコレクション型はNone"""
+    total_size: int
+    """有効なエントリの :attr:`SdoEntry.size` の合計"""
+    item_count: int
+    """format が返す値の数"""
+    layout: tuple = ()
+    """コンパイルしたレイアウト。フィールド毎に、無効なエントリはNone、有効なエントリは (size, format, 値の種類)"""
+    offsets: Tuple[int, ...] = ()
+    """有効なエントリ毎の受信データ中のバイト位置"""
+    entry_structs: Tuple[Struct, ...] = ()
+    """有効なエントリ毎の struct.Struct 。 :meth:`decode_entry` がエントリ単独の復号に使う"""
+    entry_numbers: Dict[str, int] = field(default_factory=dict, compare=False, repr=False)
+    """有効なエントリのフィールド名毎の :attr:`assignments` の位置"""
+
+    @classmethod
+    def compile(cls, entries: list, layout: tuple = ()) -> "UnpackPlan":
+        """有効なエントリの (フィールド名, SdoEntry) のリストから復号手順を作成する"""
+        formats = [entry.unpack_format for _, entry in entries]
+        unpack_format = SdoDataBody._join_formats(formats)
+        compiled = Struct(unpack_format)
+        item_count = len(compiled.unpack(bytes(compiled.size)))
+        assignments = []
+        position = 0
+        for name, entry in entries:
+            decode = entry.format[-1:] in ("s", "p")
+            kind = entry.value_kind
+            if kind == "primitive":
+                assignments.append((name, position, 0, decode))
+                position += 1
+            elif kind == "list":
+                count = int(entry.size / calcsize(entry.format))
+                assignments.append((name, position, count, decode))
+                position += count
+            else:
+                assignments.append((name, position, None, decode))
+        return cls(
+            format=unpack_format,
+            struct=compiled,
+            assignments=tuple(assignments),
+            total_size=sum(entry.size for _, entry in entries),
+            item_count=item_count,
+            layout=layout,
+            offsets=tuple(
+                calcsize(SdoDataBody._join_formats(formats[: i + 1])) - calcsize("=" + formats[i])
+                for i in range(len(formats))
+            ),
+            entry_structs=tuple(Struct("=" + entry_format) for entry_format in formats),
+            entry_numbers={name: number for number, (name, _, _, _) in enumerate(assignments)},
+        )
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # immutable and shared between containers: struct.Struct can not be copied
+        return self
+
+    def matches(self, sdo_data: "SdoDataBody") -> bool:
+        """``sdo_data`` の現在のレイアウトがコンパイルしたレイアウトと同じ場合True。キーを作らずに属性を比較する。"""
+        for name, expected in zip(sdo_data._field_names(), self.layout):
+            entry = getattr(sdo_data, name)
+            if expected is None:
+                if entry.enable:
+                    return False
+            elif (
+                not entry.enable
+                or entry.size != expected[0]
+                or entry.format != expected[1]
+                or entry.value_kind != expected[2]
+            ):
+                return False
+        return True
+
+    def apply(self, sdo_data: "SdoDataBody", values: tuple, in_place: bool = False):
+        """復号した値を各エントリの value に設定する
+
+        Args:
+            sdo_data(SdoDataBody): 値を設定するデータコンテナ
+            values(tuple): :attr:`struct` で復号した値
+            in_place(bool): Trueの場合、リストの値は要素数が同じであれば既存のリストの要素を書き換える。
+                Falseの場合は毎回新しいリストを設定する。
+
+        Raises:
+            TypeError: エントリの値が数値型・文字列型・リストの何れでもない場合
+        """
+        for name, position, count, decode in self.assignments:
+            entry = getattr(sdo_data, name)
+            if count == 0:
+                value = values[position]
+                entry.value = value.strip(b"\0").decode() if decode else value
+            elif count is not None:
+                if decode:
+                    entry.value = [f.strip(b"\0").decode() for f in values[position : position + count]]
+                elif in_place and len(entry.value) == count:
+                    entry.value[:] = values[position : position + count]
+                else:
+                    entry.value = list(values[position : position + count])
+            else:
+                raise TypeError(f"Type unmatched. \n {name} :{type(entry.value)}")
+
+    def decode_entry(self, number: int, raw_data: Union[bytes, memoryview]):
+        """``number`` 番目の有効なエントリだけを受信データから復号する。値は :meth:`apply` と同じ型になる。
+
+        Args:
+            number(int): :attr:`assignments` の位置
+            raw_data(Union[bytes, memoryview]): :attr:`struct` のサイズ以上の受信データ
+
+        Raises:
+            TypeError: エントリの値が数値型・文字列型・リストの何れでもない場合
+        """
+        name, _, count, decode = self.assignments[number]
+        values = self.entry_structs[number].unpack_from(raw_data, self.offsets[number])
+        if count == 0:
+            return values[0].strip(b"\0").decode() if decode else values[0]
+        elif count is not None:
+            return [f.strip(b"\0").decode() for f in values] if decode else list(values)
+        raise TypeError(f"Type unmatched. \n {name} :{self.layout}")
+
+
+_UNPACK_PLANS: Dict[Tuple[type, tuple], UnpackPlan] = {}
+_FIELD_NAMES: Dict[type, Tuple[str, ...]] = {}
+
 
 @dataclass
 class SdoDataBody(AbstructSdoDataBody):
@@ -155,41 +361,108 @@ class SdoDataBody(AbstructSdoDataBody):
                 )
         # self.sub_index_dic = {asdict(self)[k]['sub_index']: k for k in asdict(self)}
 
+    def __getstate__(self):
+        # the received data may be a memoryview over the response frame, which can not be copied
+        state = dict(self.__dict__)
+        fetched = state.get("_fetched")
+        if fetched is not None:
+            state["_fetched"] = (fetched[0], bytes(fetched[1]))
+        if state.get("_previous_raw") is not None:
+            state["_previous_raw"] = bytes(state["_previous_raw"])
+        return state
+
     @property
     def unpack_format(self) -> str:
         """struct.unpack の formatを生成する"""
         # dataの要素のサイズがフォーマットの規定サイズより大きければ規定サイズ個数を頭に付け、そうでなければ
-        result = "="
-        for field in dataclasses.fields(self):
-            entry = getattr(self, field.name)
-            temp = ""
-            format_size = calcsize(entry.format)
-            if not entry.enable:
-                continue
-            if is_primitive(entry.value):
-                # for primitive entry value
-                logger.debug(f"{entry.value} : is primitive.")
-                if format_size < entry.size:
-                    temp += str(int(entry.size / format_size)) + entry.format
-                else:
-                    temp += entry.format
-            elif hasattr(entry.value, "__iter__"):
-                # for iterable object entry
-                temp += str(int(entry.size / format_size)) + entry.format
-                logger.debug(
-                    f"{entry.value} : is NOT primitive. size :{entry.size}, format size: {format_size}, format: {temp}"
-                )
+        return self.unpack_plan.format
+
+    @property
+    def unpack_plan(self) -> UnpackPlan:
+        """現在のレイアウトの :class:`UnpackPlan`
+
+        有効なエントリと、そのサイズ・format・値の種類（数値型・文字列型、リスト、その他）の組み合わせをキーとして
+        クラス毎にキャッシュする。直前に使った手順はインスタンスにも保持し、レイアウトが同じ間はキーを作らずに再利用する。
+        Description の反映などでレイアウトが変わると、次の参照時に新しいレイアウトの手順を作成する。
+        """
+        plan = self.__dict__.get("_unpack_plan")
+        if plan is not None and plan.matches(self):
+            return plan
+        layout = []
+        for name in self._field_names():
+            entry = getattr(self, name)
+            if entry.enable:
+                layout.append((entry.size, entry.format, entry.value_kind))
             else:
-                temp += entry.format
+                layout.append(None)
+        key = (type(self), tuple(layout))
+        plan = _UNPACK_PLANS.get(key)
+        if plan is None:
+            plan = _UNPACK_PLANS[key] = UnpackPlan.compile(
+                [(f.name, getattr(self, f.name)) for f in self._enabled_fields()], layout=key[1]
+            )
+        self._unpack_plan = plan
+        return plan
+
+    def snapshot(self) -> "SdoSnapshot":
+        """直前に受信したデータの :class:`SdoSnapshot` を作成する。データ本体をコピーするだけで復号はしない。
+
+        写すのは受信した値であり、受信後に代入した値は含まない。
+
+        Raises:
+            ValueError: まだレスポンスをマッピングしていない場合
+        """
+        fetched = self.__dict__.get("_fetched")
+        if fetched is None:
+            raise ValueError(f"No response has been mapped to {self.__class__.__name__} yet.")
+        plan, raw_data = fetched
+        # the container refers to the received frame; a snapshot holds only the data body
+        return SdoSnapshot(type(self), plan, bytes(raw_data))
+
+    @property
+    def changed_fields(self) -> Tuple[str, ...]:
+        """直前の収集で値が変化したエントリのフィールド名。初回の収集では有効なエントリ全て。
+
+        :class:`SdoDataController` の ``track_changes`` がTrueの場合に更新する。
+        """
+        return self.__dict__.get("_changed_fields", ())
+
+    def _field_names(self) -> Tuple[str, ...]:
+        """フィールド名（定義順）。クラス毎にキャッシュする。"""
+        names = _FIELD_NAMES.get(type(self))
+        if names is None:
+            names = _FIELD_NAMES[type(self)] = tuple(f.name for f in dataclasses.fields(self))
+        return names
+
+    def _enabled_fields(self) -> list:
+        return [f for f in dataclasses.fields(self) if getattr(self, f.name).enable]
+
+    @staticmethod
+    def _join_formats(formats: list) -> str:
+        """エントリ毎の format を連結する。奇数バイトの位置から奇数バイトのエントリが続かない場合はパディングを入れる。"""
+        result = "="
+        for temp in formats:
             if calcsize(result) % 2 == 0 or calcsize(result + temp) % 2 == 0:
                 result += temp
             else:
                 result += "x" + temp
         return result
 
+    def pack(self) -> bytes:
+        """有効なエントリの値を :attr:`unpack_format` と同じ並びでバイト列に変換する。 :meth:`SdoDataController._map` の逆変換
+
+        Raises:
+            struct.error: 値が format に合わない場合
+        """
+        entries = [getattr(self, f.name) for f in self._enabled_fields()]
+        values = []
+        for entry in entries:
+            values += entry.pack_values()
+        return pack(self._join_formats([entry.pack_format for entry in entries]), *values)
+
     @property
     def total_size(self) -> int:
-        return sum([getattr(self, f.name).size for f in dataclasses.fields(self) if getattr(self, f.name).enable])
+        return self.unpack_plan.total_size
 
     @property
     def values(self):
@@ -209,13 +482,181 @@ class SdoDataBody(AbstructSdoDataBody):
 
     def get_value(self, sub_index: int) -> SdoEntry:
         for item in dataclasses.fields(self):
-            print(getattr(self, item.name).sub_index)
             if getattr(self, item.name).sub_index == sub_index:
                 return getattr(self, item.name)
 
         raise ValueError(f"No such sub index :{sub_index}, attribute: {item.name}, class:{self.__class__.__name__}")
 
 
+_NOT_DECODED = object()
+
+
+class LazySdoEntry(SdoEntry):
+    """値を参照した時に受信データから復号する :class:`SdoEntry`
+
+    :class:`SdoDataController` の ``lazy`` がTrueの場合にデータコンテナのエントリを置き換える。
+    復号した値は次の受信まで :class:`LazyPayload` に保持する。値を代入した場合も次の受信まで代入した値を返す。
+    """
+
+    def __init__(self, entry: SdoEntry, payload: "LazyPayload", field_name: str):
+        self._payload = payload
+        self._field_name = field_name
+        self._value = entry.value
+        self.name = entry.name
+        self.sub_index = entry.sub_index
+        self.format = entry.format
+        self.size = entry.size
+        self.enable = entry.enable
+
+    def __setattr__(self, name, value):
+        if name in ("size", "format", "enable"):
+            # the layout of the received data changes
+            self._payload.stale = True
+        super().__setattr__(name, value)
+
+    @property
+    def value(self):
+        return self._payload.value(self._field_name, self._value)
+
+    @value.setter
+    def value(self, value):
+        if _value_kind(value) != _value_kind(self._value):
+            self._payload.stale = True
+        self._value = value
+        self._payload.decoded[self._field_name] = value
+
+    @property
+    def value_kind(self) -> Hashable:
+        # decided without decoding: a decoded value has the kind the plan was compiled for
+        return _value_kind(self._value)
+
+    def __deepcopy__(self, memo) -> SdoEntry:
+        # a copy holds the decoded value
+        entry = SdoEntry(
+            sub_index=self.sub_index, value=deepcopy(self.value, memo), format=self.format, size=self.size
+        )
+        entry.name, entry.enable, entry.changed = self.name, self.enable, self.changed
+        return entry
+
+
+@dataclass
+class LazyPayload:
+    """遅延復号するデータコンテナの受信データ
+
+    受信データ本体と :class:`UnpackPlan` を保持し、 :class:`LazySdoEntry` が参照したエントリだけを
+    :meth:`UnpackPlan.decode_entry` で復号する。
+    """
+
+    plan: Optional[UnpackPlan] = field(default=None)
+    """受信データのレイアウトの復号手順"""
+    raw_data: bytes = field(default=b"", repr=False)
+    """受信したデータ本体"""
+    decoded: Dict[str, object] = field(default_factory=dict, repr=False)
+    """受信後に復号または代入したフィールド名毎の値"""
+    stale: bool = field(default=True)
+    """:attr:`plan` を作成した後にエントリの有効・サイズ・format・値の種類が変わった場合True"""
+
+    @classmethod
+    def attach(cls, sdo_data: SdoDataBody) -> "LazyPayload":
+        """データコンテナのエントリを :class:`LazySdoEntry` に置き換え、受信データの保持先を作成する"""
+        payload = cls()
+        for name in sdo_data._field_names():
+            setattr(sdo_data, name, LazySdoEntry(getattr(sdo_data, name), payload, name))
+        sdo_data._lazy_payload = payload
+        return payload
+
+    def load(self, plan: UnpackPlan, raw_data: Union[bytes, memoryview]):
+        """受信データを入れ替え、復号済みの値を破棄する"""
+        self.plan = plan
+        self.stale = False
+        self.raw_data = bytes(raw_data)
+        self.decoded.clear()
+
+    def fits(self, raw_data: Union[bytes, memoryview]) -> bool:
+        """レイアウトが変わらず、受信データのサイズが :attr:`plan` と同じ場合True。 :attr:`plan` をそのまま使える。"""
+        return not self.stale and len(raw_data) == self.plan.struct.size
+
+    def value(self, field_name: str, default):
+        """フィールドの値。受信データに含まれない（無効な）エントリ、未受信の場合は ``default``"""
+        value = self.decoded.get(field_name, _NOT_DECODED)
+        if value is not _NOT_DECODED:
+            return value
+        number = None if self.plan is None else self.plan.entry_numbers.get(field_name)
+        if number is None:
+            return default
+        value = self.decoded[field_name] = self.plan.decode_entry(number, self.raw_data)
+        return value
+
+    def __deepcopy__(self, memo):
+        # a copied container has plain entries and attaches its own payload
+        return None
+
+
+@dataclass(frozen=True)
+class SdoSnapshot:
+    """収集したデータコンテナの変更されない写し
+
+    受信データ本体と、同じレイアウトのデータコンテナで共有する :class:`UnpackPlan` だけを保持する。
+    作成時は復号せず、値は参照した時にその都度復号する。 :meth:`SdoDataBody.snapshot` で作成する。
+
+    使用例:
+        .. code-block:: python
+
+            samples = deque(maxlen=10000)
+            async for index, sdo_data in profile:
+                samples.append((index, sdo_data.snapshot()))
+            al_status = samples[-1][1]["ALStatus"]
+    """
+
+    container: type
+    """写したデータコンテナのクラス"""
+    plan: UnpackPlan = field(repr=False)
+    """受信データのレイアウトの復号手順"""
+    raw_data: bytes
+    """受信したデータ本体"""
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """受信データに含まれる（有効な）エントリのフィールド名"""
+        return tuple(self.plan.entry_numbers)
+
+    def __getitem__(self, field_name: str):
+        """エントリの値を復号する
+
+        Raises:
+            KeyError: 受信データに含まれないエントリの場合
+        """
+        return self.plan.decode_entry(self.plan.entry_numbers[field_name], self.raw_data)
+
+    def __contains__(self, field_name: str) -> bool:
+        return field_name in self.plan.entry_numbers
+
+    def get(self, field_name: str, default=None):
+        """エントリの値を復号する。受信データに含まれないエントリの場合は ``default``"""
+        if field_name not in self.plan.entry_numbers:
+            return default
+        return self[field_name]
+
+    @property
+    def values(self) -> Dict[str, object]:
+        """有効なエントリ全ての値"""
+        return {field_name: self[field_name] for field_name in self.plan.entry_numbers}
+
+    def to_sdo_data(self) -> SdoDataBody:
+        """写した値を持つ新しいデータコンテナを作成する
+
+        Return:
+            SdoDataBody: :attr:`container` のインスタンス。有効なエントリのサイズと format は収集時と同じ。
+        """
+        sdo_data = self.container()
+        for field_name, layout in zip(sdo_data._field_names(), self.plan.layout):
+            if layout is not None:
+                entry = getattr(sdo_data, field_name)
+                entry.size, entry.format, entry.enable = layout[0], layout[1], True
+        self.plan.apply(sdo_data, self.plan.struct.unpack_from(self.raw_data))
+        return sdo_data
+
+
 @dataclass
 class SdoMetadata:
     """SDOメタデータ"""
@@ -233,6 +674,28 @@ class SdoMetadata:
     response_container: SdoDataBody.__class__
     """アップロードコマンドのレスポンスデータを格納するSdoDataBodyを基底クラスとしたコンテナクラスを定義"""
 
+    def for_request(
+        self, index: int, sub_index: Optional[int] = None, max_sub_index: Optional[int] = None
+    ) -> "SdoMetadata":
+        """リクエスト毎のインデックス、サブインデックスを設定した写しを返す
+
+        モジュールで共有するメタデータは変更しないため、同時に実行するリクエストが互いのインデックスを書き換えない。
+
+        Args:
+            index(int): SDOインデックス
+            sub_index(int): SDOサブインデックス。Noneの場合はメタデータのサブインデックス
+            max_sub_index(int): Object Description で得た最大サブインデックス。Noneの場合はメタデータの値
+
+        Return:
+            SdoMetadata: リクエストに渡すメタデータ
+        """
+        return dataclasses.replace(
+            self,
+            index=index,
+            sub_index=self.sub_index if sub_index is None else sub_index,
+            max_sub_index=self.max_sub_index if max_sub_index is None else max_sub_index,
+        )
+
 
 @dataclass
 class MappingMember:
@@ -244,8 +707,62 @@ class MappingMember:
     """ :obj:`SDOメタデータ <pyetg1510.mailbox.sdo_data_factory.SdoMetadata>` """
 
 
-class SdoMetadataMapper:
-    """SDOデータマッピングクラス"""
+@dataclass(frozen=True)
+class MappingTable:
+    """:class:`SdoMetadataMapper` の定義から作成したインデックス範囲の検索表
+
+    範囲が重なる場合は優先する定義の範囲で分割し、重ならない区間の先頭インデックスの昇順に並べる。
+    """
+
+    starts: Tuple[int, ...]
+    """区間の先頭インデックス"""
+    members: Tuple[Optional[MappingMember], ...]
+    """区間毎の :class:`MappingMember` 。定義の無い区間はNone"""
+
+    @classmethod
+    def compile(cls, members: list) -> "MappingTable":
+        """優先順に並べた :class:`MappingMember` のリストから作成する"""
+        boundaries = sorted(
+            {member.index_range[0] for member in members} | {member.index_range[1] + 1 for member in members}
+        )
+        starts, selected = [], []
+        for start in boundaries:
+            member = next((m for m in members if m.index_range[0] <= start <= m.index_range[1]), None)
+            if selected and selected[-1] is member:
+                continue
+            starts.append(start)
+            selected.append(member)
+        return cls(starts=tuple(starts), members=tuple(selected))
+
+    def find(self, index: int) -> Optional[MappingMember]:
+        """インデックスを含む区間の :class:`MappingMember` を二分探索する"""
+        position = bisect_right(self.starts, index) - 1
+        if position < 0:
+            return None
+        return self.members[position]
+
+
+_MAPPING_TABLES: Dict[type, MappingTable] = {}
+
+
+class _SdoMetadataMapperMeta(type):
+    """クラス属性を変更したら :class:`MappingTable` を作り直す"""
+
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        _MAPPING_TABLES.clear()
+
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        _MAPPING_TABLES.clear()
+
+
+class SdoMetadataMapper(metaclass=_SdoMetadataMapperMeta):
+    """SDOデータマッピングクラス
+
+    :class:`MappingMember` のクラス属性でインデックス範囲とメタデータを関連付ける。サブクラスはベースクラスの定義を
+    引き継ぎ、同じ名前の定義は置き換える。範囲が重なる場合はサブクラス、同じクラスでは先に定義した範囲を優先する。
+    """
 
     def __post_init__(self):
         """メンバにMappingMember以外のデータが含まれていたらValueErrorとする"""
@@ -255,6 +772,24 @@ class SdoMetadataMapper:
                     f"Can't define as field except '{MappingMember.__class__.__name__}'. Actual {each_field[0]} : {each_field[1]}"
                 )
 
+    @classmethod
+    def members(cls) -> Dict[str, MappingMember]:
+        """優先順の定義名と :class:`MappingMember` の辞書"""
+        members = {}
+        for klass in cls.__mro__:
+            for name, value in vars(klass).items():
+                if isinstance(value, MappingMember) and name not in members:
+                    members[name] = value
+        return members
+
+    @classmethod
+    def mapping_table(cls) -> MappingTable:
+        """クラス毎に一度作成する :class:`MappingTable`"""
+        table = _MAPPING_TABLES.get(cls)
+        if table is None:
+            table = _MAPPING_TABLES[cls] = MappingTable.compile(list(cls.members().values()))
+        return table
+
     @classmethod
     def find(cls, index: int) -> MappingMember:
         """指定したインデックスに応じたODマッピング定義オブジェクトを返す
@@ -263,15 +798,10 @@ class SdoMetadataMapper:
             index(int): SDOインデックス番号
 
         Return:
-            MappingMember: ODマッピング定義オブジェクト
+            MappingMember: ODマッピング定義オブジェクト。該当する定義が無い場合はNone
 
         """
-        for field in vars(cls):
-            if isinstance(vars(cls)[field], MappingMember):
-                index_range = vars(cls)[field].index_range
-                if index_range[0] <= index <= index_range[1]:
-                    return vars(cls)[field]
-        return None
+        return cls.mapping_table().find(index)
 
     @classmethod
     def find_start(cls, index: int):
@@ -352,6 +882,246 @@ SDOInfoErrorFormat = SdoMetadata(
 )
 
 
+@dataclass
+class RequestFrameCache:
+    """作成済みリクエストフレームのキャッシュ
+
+    周期的なポーリングでは、同じエントリへのリクエストフレームは Mailbox header の Cnt 以外は毎回同じになる。
+    (station address, index, subindex, complete access, service) をキーとしてフレームを保持し、そのまま再利用する。
+    Cnt は送信時にコネクションがフレームの複写に設定する。
+
+    Args:
+        maxsize(int): 保持するフレーム数の上限。超えた場合は最も古いフレームから破棄する。
+    """
+
+    maxsize: int = field(default=4096)
+    hits: int = field(default=0, init=False)
+    """キャッシュしたフレームを再利用した回数"""
+    misses: int = field(default=0, init=False)
+    """フレームを作成した回数"""
+    _frames: Dict[Hashable, bytes] = field(default_factory=dict, init=False, repr=False)
+
+    def get(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        """リクエストフレームを取得する
+
+        Args:
+            key(Hashable): フレームのキー
+            build(Callable[[], bytes]): キャッシュに無い場合にフレームを作成する関数
+
+        Return:
+            bytes: 保持しているフレーム
+        """
+        template = self._frames.get(key)
+        if template is None:
+            self.misses += 1
+            template = bytes(build())
+            if len(self._frames) >= self.maxsize:
+                self._frames.pop(next(iter(self._frames)), None)
+            self._frames[key] = template
+        else:
+            self.hits += 1
+        return template
+
+    def clear(self):
+        """保持しているフレームを破棄する"""
+        self._frames.clear()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+def _abort_code(frame: Union[bytes, memoryview]) -> str:
+    """SDO Abort のフレームに含まれる Abort code の表記。含まれない場合は空文字列"""
+    if len(frame) < MailBoxFrameOffsetAddress.SDO_DATA.value + 4:
+        return ""
+    return f" Abort code: {hex(unpack_from('<I', frame, MailBoxFrameOffsetAddress.SDO_DATA.value)[0])}"
+
+
+@dataclass
+class SegmentedUpload:
+    """Upload SDO Segment によるセグメント転送の受信状態
+
+    Initiate upload のレスポンスで通知された総サイズのバッファを確保し、受信したセグメントのデータを順に書き込む。
+
+    Args:
+        index(int): インデックス番号
+        sub_index(int): サブインデックス番号
+        size(int): 転送するデータの総バイト数
+        station_address(int): リクエストの宛先ステーションアドレス
+    """
+
+    index: int
+    sub_index: int
+    size: int
+    station_address: int = field(default=0x0000)
+    buffer: bytearray = field(default=None, init=False, repr=False)
+    """受信データを格納するバッファ"""
+    received: int = field(default=0, init=False)
+    """受信したバイト数"""
+    segments: int = field(default=0, init=False)
+    """受信したセグメント数"""
+    toggle: int = field(default=0, init=False)
+    """次のセグメントリクエストのトグルビット"""
+    completed: bool = field(default=False, init=False)
+    """最後のセグメントを受信した場合にTrue"""
+    started_at: float = field(default_factory=time.perf_counter, init=False, repr=False)
+    finished_at: Optional[float] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self.buffer = bytearray(self.size)
+        self._view = memoryview(self.buffer)
+        self._request = SDOCommandMessage(sdo_service=SdoService.REQUEST, station_address=self.station_address)
+        self._request.sdo_command = SdoRequestCommand.SDOREQ_UPLOAD_SEGMENTED
+        self._request.sdo_command_data = None
+        self._request.index = self.index
+        self._request.sub_index = self.sub_index
+
+    @property
+    def elapsed(self) -> float:
+        """転送開始からの経過時間（秒）。完了後は転送に要した時間"""
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """転送速度（バイト/秒）"""
+        elapsed = self.elapsed
+        return self.received / elapsed if elapsed > 0 else 0.0
+
+    def write(self, data: Union[bytes, memoryview]):
+        """データをバッファの続きに書き込む。総サイズを超える部分は捨てる。"""
+        size = min(len(data), self.size - self.received)
+        self._view[self.received : self.received + size] = data[:size]
+        self.received += size
+
+    def request_frame(self) -> bytes:
+        """次のセグメントを要求する Upload SDO Segment リクエストフレームを作成する"""
+        # the toggle bit is bit 4 of the command byte, the position of CompleteAccess in SDORequest
+        self._request.complete_access = bool(self.toggle)
+        return self._request.make_request_frame()
+
+    def feed(self, response: bytes):
+        """Upload SDO Segment レスポンスのデータをバッファへ書き込む
+
+        Args:
+            response(bytes): 受信したフレーム
+
+        Raises:
+            ValueError: SDO Abort などセグメント以外のレスポンスを受信した場合、トグルビットが交互にならない場合、
+                総サイズに満たずに最後のセグメントを受信した場合
+        """
+        view = memoryview(response)
+        data_offset = MailBoxFrameOffsetAddress.SDO_HEADER.value + 1
+        if len(view) < data_offset:
+            raise ValueError(f"Segment response of {hex(self.index)}:{hex(self.sub_index)} is too short.")
+        mailbox_header = MailboxHeader.from_buffer_copy(view, MailBoxFrameOffsetAddress.MAILBOX_HEADER.value)
+        header = SDOSegmentHeader.from_buffer_copy(view, MailBoxFrameOffsetAddress.SDO_HEADER.value)
+        if header.CommandSpecifier != SdoResponseCommand.SDORES_UPLOAD_SEGMENTED.value:
+            raise ValueError(
+                f"Segmented upload of {hex(self.index)}:{hex(self.sub_index)} aborted by command "
+                f"{header.CommandSpecifier}.{_abort_code(view)}"
+            )
+        if header.Toggle != self.toggle:
+            raise ValueError(f"Toggle bit of {hex(self.index)}:{hex(self.sub_index)} segment is not alternated.")
+
+        # segment data: mailbox length - CoE header and SDO segment header. Short segments are padded to 7 bytes.
+        segment_size = mailbox_header.Length - 3
+        if segment_size <= 7:
+            segment_size = 7 - header.SegDataSize
+        self.write(view[data_offset : data_offset + segment_size])
+        self.segments += 1
+        self.toggle ^= 1
+        if header.LastSegment or self.received >= self.size:
+            if self.received < self.size:
+                raise ValueError(
+                    f"Segmented upload of {hex(self.index)}:{hex(self.sub_index)} ended at {self.received} bytes, "
+                    f"{self.size} bytes announced."
+                )
+            self.completed = True
+            self.finished_at = time.perf_counter()
+
+
+@dataclass
+class SdoInfoFragments:
+    """SDO Information service のフラグメントの受信状態
+
+    Incomplete が立ったレスポンスから FragmentsLeft が0のレスポンスまで、各フラグメントのデータをひとつのバッファへ追記する。
+
+    Args:
+        opcode(int): 最初のフラグメントのオペコード
+        fragments_left(int): 最初のフラグメントの FragmentsLeft
+    """
+
+    opcode: int
+    fragments_left: int
+    buffer: bytearray = field(default_factory=bytearray, init=False, repr=False)
+    """受信データを格納するバッファ"""
+    fragments: int = field(default=0, init=False)
+    """受信したフラグメント数"""
+    completed: bool = field(default=False, init=False)
+    """最後のフラグメントを受信した場合にTrue"""
+
+    def write(self, data: Union[bytes, memoryview]):
+        """データをバッファの末尾に追記する"""
+        self.buffer += data
+        self.fragments += 1
+
+    def feed(self, response: bytes) -> bool:
+        """フラグメントのデータをバッファへ追記する
+
+        Args:
+            response(bytes): 受信したフレーム
+
+        Return:
+            bool: 追記した場合True。受信済みのフラグメントの重複は読み捨ててFalse
+
+        Raises:
+            ValueError: オペコードが異なる場合、フラグメントが欠落した場合
+        """
+        view = memoryview(response)
+        if len(view) < MailBoxFrameOffsetAddress.SDO_DATA.value:
+            raise ValueError(f"SDO Information fragment is too short: {bytes(view).hex()}")
+        header = SDOInformationHeader.from_buffer_copy(view, MailBoxFrameOffsetAddress.SDO_HEADER.value)
+        if header.Opcode != self.opcode:
+            raise ValueError(f"SDO Information fragment opcode {header.Opcode} differs from {self.opcode}.")
+        if header.FragmentsLeft >= self.fragments_left:
+            # duplicate of a received fragment, e.g. the response to a retransmitted request
+            return False
+        if header.FragmentsLeft != self.fragments_left - 1:
+            raise ValueError(
+                f"SDO Information fragment lost: {header.FragmentsLeft} fragments left, "
+                f"{self.fragments_left - 1} expected."
+            )
+        self.write(view[MailBoxFrameOffsetAddress.SDO_DATA.value :])
+        self.fragments_left = header.FragmentsLeft
+        self.completed = self.fragments_left == 0
+        return True
+
+
+@dataclass
+class SdoTransaction:
+    """:class:`SdoDataController` の1回のリクエストの状態
+
+    リクエスト毎に作成し、送信から受信データのマッピングまでの状態を保持する。コントローラはリクエスト間で共有する状態を
+    持たないため、1つのコントローラで複数のリクエストを同時に実行できる。 :meth:`SdoDataController.fetch` と
+    :meth:`SdoDataController.download` は完了したリクエストの状態としてこのオブジェクトを返す。
+
+    Args:
+        sdo_metadata(SdoMetadata): リクエストするインデックスを設定したメタデータ（ :meth:`SdoMetadata.for_request` ）
+        sdo_data(SdoDataBody): 受信したSDOデータを格納するコンテナオブジェクト
+    """
+
+    sdo_metadata: SdoMetadata
+    sdo_data: SdoDataBody
+    request_message: Optional[Union[SDORequestInfoMessage, SDOCommandMessage, SDODownloadMessage]] = field(
+        default=None, repr=False
+    )
+    response_message: Optional[SDOResponseMessage] = field(default=None, repr=False)
+    data_body_size: int = field(default=0)
+    """レスポンスのデータ本体のサイズ"""
+    segmented_upload: Optional[SegmentedUpload] = field(default=None)
+    """セグメント転送で受信した場合の受信状態"""
+
+
 @dataclass
 class SdoDataController:
     """SDO メッセージサービス
@@ -359,178 +1129,497 @@ class SdoDataController:
     Args:
         session(EtherCATMasterConnection): 通信コネクタオブジェクト
         get_info(bool): SDO Information serviceの問い合わせ時はTrueにする
+        station_address(int): リクエストの宛先ステーションアドレス。既定はマスター (0x0000)
+        frame_cache(RequestFrameCache): リクエストフレームのキャッシュ。既定はコントローラ毎に作成する。複数のコントローラで
+            共有する場合は同じインスタンスを渡す。Noneの場合は毎回フレームを作成する。
+        in_place(bool): Trueの場合、リストの値は既存のリストの要素を書き換える（ :meth:`UnpackPlan.apply` ）。
+            周期的な収集で要素毎の確保を避けられるが、以前に取り出したリストの内容も更新される。
+        column_store(DiagnosisStore): 登録したデータコンテナのレスポンスを直接書き込む
+            :class:`DiagnosisStore <pyetg1510.diagnosis_store.DiagnosisStore>` 。Noneの場合は使用しない。
+        lazy(bool): Trueの場合、受信データを保持し、エントリの値は参照した時に復号する（ :class:`LazySdoEntry` ）。
+            収集毎の処理量が参照するエントリの数に比例する。
+        track_changes(bool): Trueの場合、受信データを前回の受信データと比較し、同じであれば復号を省く。
+            異なる場合は値が変化したエントリの :attr:`SdoEntry.changed` と :attr:`SdoDataBody.changed_fields` を設定する。
+
+    リクエスト毎の状態は :class:`SdoTransaction` に保持するため、1つのコントローラで複数の :meth:`fetch` を
+    ``asyncio.gather`` などで同時に実行できる。メタデータは :meth:`SdoMetadata.for_request` でリクエスト毎に作成する。
     """
 
     session: EtherCATMasterConnection
-    sdo_data: SdoDataBody = field(default=None)
     get_info: bool = field(default=False)
-
-    def __post_init__(self):
-        self.data_body_size: int = 0
-        self.index_counter: int = 0
-
-    def _map(self, raw_data: bytes):
+    station_address: int = field(default=0x0000)
+    frame_cache: Optional[RequestFrameCache] = field(default_factory=RequestFrameCache)
+    in_place: bool = field(default=False)
+    column_store: Optional["DiagnosisStore"] = field(default=None)
+    lazy: bool = field(default=False)
+    track_changes: bool = field(default=False)
+
+    def _map(self, sdo_data: SdoDataBody, raw_data: bytes):
         """SDOデータ本体部分の内部モデルへのマッピング関数
 
         Unpack received data and put there on each member of 'values' array at the 'SdoFormat' instance as a 'SdoEntry' data type.
         受信したバイトデータをアンパックし、 :meth:`get_object_dictionary <pyetg1510.etg_1510.MasterODSpecification.get_object_dictionary>` で作成したSdoFormat
 
         Args:
-            raw_data(bytes): Upload commandで受信したレスポンスデータのデータ本体部分
-            self.sdo_data(SdoDataBody): マッピング先のデータコンテナ
+            sdo_data(SdoDataBody): マッピング先のデータコンテナ
+            raw_data(Union[bytes, memoryview]): Upload commandで受信したレスポンスデータのデータ本体部分
         Raises:
             TypeError: struct.unpackにおけるformat指定が不正な場合、または、サイズが合わない場合。
             struct.error: struct.unpack 処理が失敗した場合。
         """
-        logger.info(self.sdo_data)
-        logger.info(
-            f"Before adjusting size, Unpack format:{self.sdo_data.unpack_format}, format size:{calcsize(self.sdo_data.unpack_format)}, Setting size: {self.sdo_data.total_size}, Actual size: {len(raw_data)}"
-        )
-        if self.sdo_data.total_size < len(raw_data):
-            lastkey = next(reversed(asdict(self.sdo_data)), None)
-            current_value = getattr(self.sdo_data, lastkey)
-            current_value.size += len(raw_data) - self.sdo_data.total_size
-            setattr(self.sdo_data, lastkey, current_value)
-        unpack_format = self.sdo_data.unpack_format
-        format_size = calcsize(unpack_format)
+        if self.lazy:
+            payload = sdo_data.__dict__.get("_lazy_payload")
+            if payload is not None and payload.fits(raw_data):
+                payload.load(payload.plan, raw_data)
+                return
+        plan = sdo_data.unpack_plan
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(sdo_data)
+            logger.info(
+                f"Before adjusting size, Unpack format:{plan.format}, format size:{plan.struct.size}, Setting size: {plan.total_size}, Actual size: {len(raw_data)}"
+            )
+        # compare with the packed size: padding bytes of the unpack format are not part of total_size
+        if plan.struct.size < len(raw_data):
+            last_entry = getattr(sdo_data, sdo_data._field_names()[-1])
+            last_entry.size += len(raw_data) - plan.struct.size
+            plan = sdo_data.unpack_plan
+        format_size = plan.struct.size
         if format_size <= 0:
-            raise ValueError(f"All member are disabled. ({unpack_format}) Nothing to fetch data.")
+            raise ValueError(f"All member are disabled. ({plan.format}) Nothing to fetch data.")
 
-        logger.info(
-            f"Unpack format: {unpack_format}, Unpack size: {format_size}, Calculated size: {self.sdo_data.total_size},raw bytes data size : {len(raw_data)}"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                f"Unpack format: {plan.format}, Unpack size: {format_size}, Calculated size: {plan.total_size},raw bytes data size : {len(raw_data)}"
+            )
         if len(raw_data) < format_size:
-            logger.error(f"Data: {raw_data}, Unpack format: {unpack_format}")
-            raw_data += b"\0" * (format_size - len(raw_data))
+            logger.error(f"Data: {bytes(raw_data)}, Unpack format: {plan.format}")
+            raw_data = bytes(raw_data) + b"\0" * (format_size - len(raw_data))
             # raise ValueError(f"Required data size at least {format_size} byte. actual: {len(raw_data)} byte")
+        if self.lazy:
+            if len(plan.assignments) > plan.item_count:
+                raise ValueError(
+                    f"Mismatching configured SDO data number and received data. {plan.format}, model:{sdo_data}"
+                )
+            payload = sdo_data.__dict__.get("_lazy_payload")
+            if payload is None:
+                payload = LazyPayload.attach(sdo_data)
+            payload.load(plan, raw_data)
+            return
         try:
-            _data = list(unpack(unpack_format, raw_data))
+            _data = plan.struct.unpack_from(raw_data)
         except error as e:
             logger.exception(
-                f"""unpack error: unpack format size: {calcsize(unpack_format)}, data size: {len(raw_data)}
-    Specified datamodel: {self.sdo_data}
+                f"""unpack error: unpack format size: {format_size}, data size: {len(raw_data)}
+    Specified datamodel: {sdo_data}
             """
             )
 
             raise
-        _data = [f.strip(b"\0").decode() if type(f) is bytes else f for f in _data]
-        sdo_data_dict = asdict(self.sdo_data)
-        sdo_data_dict = {k: sdo_data_dict[k] for k in sdo_data_dict if sdo_data_dict[k]["enable"]}
-        if len(sdo_data_dict) > len(_data):
+        if len(plan.assignments) > plan.item_count:
             raise ValueError(
                 f"""Mismatching configured SDO data number and received data.
-    Received data: count: {len(_data)}, unpack format {unpack_format}, Unpack data: {_data}
-    Configured model: count: {len(sdo_data_dict)}, model:{sdo_data_dict}"""
+    Received data: count: {plan.item_count}, unpack format {plan.format}, Unpack data: {_data}
+    Configured model: count: {len(plan.assignments)}, model:{sdo_data}"""
             )
-        k = 0
-        i = 0
-        for key in sdo_data_dict:
-            if is_primitive(getattr(self.sdo_data, key).value):
-                value = getattr(self.sdo_data, key)
-                value.value = _data[i]
-                setattr(self.sdo_data, key, value)
-                i += 1
-            elif type(getattr(self.sdo_data, key).value) is type(_data):
-                byte_size = getattr(self.sdo_data, key).size
-                list_size = int(byte_size / calcsize(getattr(self.sdo_data, key).format))
-                set_list = _data[i : i + list_size]
-                value = getattr(self.sdo_data, key)
-                value.value = set_list
-                setattr(self.sdo_data, key, value)
-                i += len(set_list)
-            else:
-                raise TypeError(
-                    f"Type unmatched. \n {self.sdo_data[key].name} :type(self.sdo_data[key].value)\n specified:{type(_data[i])}"
-                )
-
-            k += 1
+        plan.apply(sdo_data, _data, in_place=self.in_place)
+
+    def _info_opcode(self, sdo_metadata: SdoMetadata) -> Optional[SdoInfoOpcode]:
+        """SDO Information service のオペコードを返す"""
+        # per request copies of the metadata differ in the index: compare the containers
+        if sdo_metadata.response_container is ODListFormat.response_container:
+            logger.info("Fetching OD List")
+            return SdoInfoOpcode.GET_OD_LIST_REQ
+        elif sdo_metadata.response_container is SDOInfoDescriptionFormat.response_container:
+            logger.info("Fetching Object Description")
+            return SdoInfoOpcode.GET_DESCRIPTION_REQ
+        elif sdo_metadata.response_container is SDOInfoEntryFormat.response_container:
+            logger.info("Fetching Entry Description")
+            return SdoInfoOpcode.GET_ENTRY_REQ
+        return None
 
-    def _object_initialization(self, sdo_metadata: SdoMetadata):
+    def _object_initialization(self, transaction: SdoTransaction, opcode: Optional[SdoInfoOpcode] = None):
         """リクエスト、レスポンス各メッセージコンテナを初期化する。"""
 
         if self.get_info:
-            self.response_message = SDOResponseMessage(sdo_service=SdoService.INFO)
-            self.request_message = SDORequestInfoMessage(sdo_service=SdoService.INFO)
-            if sdo_metadata == ODListFormat:
-                logger.info("Fetching OD List")
-                self.request_message.opcode = SdoInfoOpcode.GET_OD_LIST_REQ
-            elif sdo_metadata == SDOInfoDescriptionFormat:
-                logger.info("Fetching Object Description")
-                self.request_message.opcode = SdoInfoOpcode.GET_DESCRIPTION_REQ
-            elif sdo_metadata == SDOInfoEntryFormat:
-                logger.info("Fetching Entry Description")
-                self.request_message.opcode = SdoInfoOpcode.GET_ENTRY_REQ
+            transaction.response_message = SDOResponseMessage(sdo_service=SdoService.INFO)
+            transaction.request_message = SDORequestInfoMessage(
+                sdo_service=SdoService.INFO, station_address=self.station_address
+            )
+            if opcode is not None:
+                transaction.request_message.opcode = opcode
         else:
-            self.response_message = SDOResponseMessage(sdo_service=SdoService.RESPONSE)
-            self.request_message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
-
-        self.request_message.sdo_command_data = sdo_metadata.request_container()
+            transaction.response_message = SDOResponseMessage(sdo_service=SdoService.RESPONSE)
+            transaction.request_message = SDOCommandMessage(
+                sdo_service=SdoService.REQUEST, station_address=self.station_address
+            )
 
-    async def fetch(self, sdo_metadata: SdoMetadata, sdo_data: SdoDataBody):
-        """SDO Upload リクエストを発行し、SdoDataBodyモデルへマッピングする
+        transaction.request_message.sdo_command_data = transaction.sdo_metadata.request_container()
 
-        Args:
-            sdo_metadata(SdoMetaData): :obj:`SDOメタデータ <pyetg1510.mailbox.sdo_data_factory.SdoMetadata>`
-            sdo_data(SdoDataBody): 受信したSDOデータを格納するコンテナオブジェクト
-        """
-        self.sdo_data = sdo_data
-        self._object_initialization(sdo_metadata=sdo_metadata)
-        self.request_message.index = sdo_metadata.index
-        self.request_message.sub_index = sdo_metadata.sub_index
-        self.request_message.complete_access = sdo_metadata.support_complete_access
+    def _build_request(self, transaction: SdoTransaction, opcode: Optional[SdoInfoOpcode]) -> bytes:
+        """リクエストフレームを生成する"""
+        self._object_initialization(transaction=transaction, opcode=opcode)
+        sdo_metadata, request_message = transaction.sdo_metadata, transaction.request_message
+        request_message.index = sdo_metadata.index
+        request_message.sub_index = sdo_metadata.sub_index
+        request_message.complete_access = sdo_metadata.support_complete_access
 
         logger.debug(
-            f"Command to be requested index:{self.request_message.index}, subindex: {self.request_message.sub_index}, complete access: {self.request_message.complete_access}"
+            f"Command to be requested index:{request_message.index}, subindex: {request_message.sub_index}, complete access: {request_message.complete_access}"
         )
-        # request and wait response
+        return request_message.make_request_frame()
+
+    def _make_request(self, transaction: SdoTransaction) -> bytes:
+        """リクエストフレームを取得する。 :attr:`frame_cache` に作成済みのフレームがあれば再利用する。"""
+        sdo_metadata = transaction.sdo_metadata
+        opcode = self._info_opcode(sdo_metadata) if self.get_info else None
+        if self.frame_cache is None:
+            return self._build_request(transaction=transaction, opcode=opcode)
+
+        transaction.response_message = SDOResponseMessage(
+            sdo_service=SdoService.INFO if self.get_info else SdoService.RESPONSE
+        )
+        service = (SdoService.INFO, opcode) if self.get_info else (SdoService.REQUEST, sdo_metadata.request_container)
+        key = (
+            self.station_address,
+            sdo_metadata.index,
+            sdo_metadata.sub_index,
+            sdo_metadata.support_complete_access,
+            service,
+        )
+        return self.frame_cache.get(key, lambda: self._build_request(transaction=transaction, opcode=opcode))
+
+    def _handle_response(
+        self, transaction: SdoTransaction, response: bytes
+    ) -> Optional[Union[SegmentedUpload, SdoInfoFragments]]:
+        """レスポンスフレームを解析し、SdoDataBodyモデルへマッピングする
 
-        await self.session.send_data(self.request_message.make_request_frame())
+        Return:
+            Union[SegmentedUpload, SdoInfoFragments]: データがレスポンスに収まらずセグメント転送が必要な場合、または
+            SDO Information のレスポンスがフラグメントに分かれている場合、先頭のデータを書き込んだ受信状態。
+            マッピングまで完了した場合はNone
+
+        Raises:
+            ValueError: SDO Upload に SDO Abort が返された場合
+        """
         # parse until CoE header message
-        self.response_message.parse_response_frame(self.session.received_data)
+        response_message = transaction.response_message
+        response_message.parse_response_frame(response)
+        if (
+            not isinstance(response_message.sdo_header, SDOInformationHeader)
+            and response_message.sdo_header.CommandSpecifier == SdoRequestCommand.SDOREQ_ABORT_TRANSFER.value
+        ):
+            # the 4 data bytes are the abort code, not the value
+            sdo_metadata = transaction.sdo_metadata
+            raise ValueError(
+                f"Upload of {hex(sdo_metadata.index)}:{hex(sdo_metadata.sub_index)} aborted by command "
+                f"{response_message.sdo_header.CommandSpecifier}.{_abort_code(response)}"
+            )
 
         # Parse SDO message
         # 1. Make sure data size either specified size or default size by SizeIndicator
         # 2. If SizeIndicator is True and expedited bit is True, data size is specified at 2bit.
         data_body_offset = 0
         if (
-            "SizeIndicator" in [f[0] for f in self.response_message.sdo_header._fields_]
-            and self.response_message.sdo_header.SizeIndicator == 1
+            "SizeIndicator" in [f[0] for f in response_message.sdo_header._fields_]
+            and response_message.sdo_header.SizeIndicator == 1
         ):
-            if self.response_message.sdo_header.TransferType == 1:
+            if response_message.sdo_header.TransferType == 1:
                 # case : SDO upload expedited response]
-                self.data_body_size = 4 - self.response_message.sdo_header.DataSetSize
+                transaction.data_body_size = 4 - response_message.sdo_header.DataSetSize
                 logger.debug(
-                    f"Expedited : True, size specified: {self.response_message.sdo_header.DataSetSize}, Calculated size:{self.data_body_size}"
+                    f"Expedited : True, size specified: {response_message.sdo_header.DataSetSize}, Calculated size:{transaction.data_body_size}"
                 )
             else:
-                temp = unpack_from("@I", self.response_message.data_body, 0)
-                self.data_body_size = temp[0]
+                temp = unpack_from("@I", response_message.data_body, 0)
+                transaction.data_body_size = temp[0]
                 data_body_offset = 4
         else:
-            self.data_body_size = 4
-        if len(self.response_message.data_body[data_body_offset:]) < self.data_body_size:
+            transaction.data_body_size = 4
+        if len(response_message.data_body[data_body_offset:]) < transaction.data_body_size:
+            if (
+                data_body_offset
+                and response_message.sdo_header.CommandSpecifier == SdoResponseCommand.SDORES_UPLOAD.value
+            ):
+                # case : SDO upload normal response followed by upload segments
+                upload = SegmentedUpload(
+                    index=response_message.sdo_header.Index,
+                    sub_index=response_message.sdo_header.SubIndex,
+                    size=transaction.data_body_size,
+                    station_address=self.station_address,
+                )
+                # data of the initiate response: mailbox length - CoE header, SDO header and complete size
+                frame_data_size = response_message.mailbox_header.Length - 10
+                upload.write(response_message.data_body[data_body_offset : data_body_offset + frame_data_size])
+                logger.debug(f"Segmented upload: {upload.size} bytes, {upload.received} bytes in initiate response")
+                return upload
             logger.warning("!!!STOP!!! Size too low")
-            self.index_counter = 0
             raise StopAsyncIteration()
         # SDO Information service checkking Opcode
         if self.get_info and (
-            "Opcode" in [f[0] for f in self.response_message.sdo_header._fields_]
-            and self.response_message.sdo_header.Opcode == SdoInfoOpcode.SDO_INFO_ERR_REQ.value
+            "Opcode" in [f[0] for f in response_message.sdo_header._fields_]
+            and response_message.sdo_header.Opcode == SdoInfoOpcode.SDO_INFO_ERR_REQ.value
         ):
-            self.sdo_data = SDOInfoErrorFormat.response_container()
-            sdo_metadata = SDOInfoErrorFormat
+            transaction.sdo_data = SDOInfoErrorFormat.response_container()
+            transaction.sdo_metadata = SDOInfoErrorFormat
+        elif self.get_info and response_message.sdo_header.Incomplete == 1:
+            # case : SDO Information response followed by fragments
+            fragments = SdoInfoFragments(
+                opcode=response_message.sdo_header.Opcode,
+                fragments_left=response_message.sdo_header.FragmentsLeft,
+            )
+            fragments.write(response_message.data_body)
+            logger.debug(f"SDO Information response fragmented: {fragments.fragments_left} fragments left")
+            return fragments
 
+        self._map_response(transaction=transaction, raw_data=response_message.data_body[data_body_offset:])
+        return None
+
+    def _map_response(self, transaction: SdoTransaction, raw_data: Union[bytes, memoryview]):
+        """受信したデータ本体をSdoDataBodyモデルへマッピングする"""
+        sdo_data, sdo_metadata = transaction.sdo_data, transaction.sdo_metadata
         # Mapping SDO data body to native model
         # try:
-        logger.debug(f"SDO Body message {self.response_message.data_body[data_body_offset:]}")
-        self._map(raw_data=self.response_message.data_body[data_body_offset:])
-        logger.debug(f"mapped data: {self.sdo_data}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"SDO Body message {raw_data.hex()}")
+        if not isinstance(raw_data, memoryview) or not raw_data.readonly:
+            # the container keeps the data for snapshots and change tracking; a received frame never changes,
+            # a reassembled bytearray does
+            raw_data = bytes(raw_data)
+        if self.track_changes and self._unchanged(sdo_data, raw_data):
+            logger.debug("Same data as previous response. Skip mapping.")
+        else:
+            if self.column_store is None or not self.column_store.decode(sdo_data, raw_data):
+                self._map(sdo_data=sdo_data, raw_data=raw_data)
+            # the plan the response was just mapped with
+            plan = sdo_data.__dict__.get("_unpack_plan") or sdo_data.unpack_plan
+            if len(raw_data) < plan.struct.size:
+                raw_data = bytes(raw_data) + b"\0" * (plan.struct.size - len(raw_data))
+            if self.track_changes:
+                self._record_changes(sdo_data, raw_data, plan)
+            sdo_data._fetched = (plan, raw_data)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"mapped data: {sdo_data}")
         # except (ValueError, TypeError, TimeoutError, asyncio.exceptions.CancelledError, asyncio.exceptions.InvalidStateError) as e:
         #    logger.warning(e)
-        #    self.index_counter = 0
         #    raise StopAsyncIteration()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Mapped: {hex(sdo_metadata.index)}:{hex(sdo_metadata.sub_index)}")
+
+    def _unchanged(self, sdo_data: SdoDataBody, raw_data: Union[bytes, memoryview]) -> bool:
+        """受信データが前回と同じ場合True。前回の収集で設定した変化フラグは戻す。"""
+        for name in sdo_data.changed_fields:
+            getattr(sdo_data, name).changed = False
+        sdo_data._changed_fields = ()
+        previous = sdo_data.__dict__.get("_previous_raw")
+        return previous is not None and previous == raw_data
+
+    def _record_changes(self, sdo_data: SdoDataBody, raw_data: Union[bytes, memoryview], plan: UnpackPlan):
+        """マッピングした受信データを前回の受信データとエントリ毎に比較し、値が変化したエントリを記録する"""
+        previous = sdo_data.__dict__.get("_previous_raw")
+        if previous is None or plan is not sdo_data.__dict__.get("_previous_plan"):
+            # first response or a new layout
+            changed = tuple(name for name, _, _, _ in plan.assignments)
+        else:
+            changed = tuple(
+                name
+                for (name, _, _, _), offset, entry_struct in zip(plan.assignments, plan.offsets, plan.entry_structs)
+                if previous[offset : offset + entry_struct.size] != raw_data[offset : offset + entry_struct.size]
+            )
+        for name in changed:
+            getattr(sdo_data, name).changed = True
+        sdo_data._changed_fields = changed
+        sdo_data._previous_raw = raw_data
+        sdo_data._previous_plan = plan
+
+    def _finish_segmented_upload(self, transaction: SdoTransaction, upload: SegmentedUpload):
+        """セグメント転送で受信したデータをSdoDataBodyモデルへマッピングする"""
+        transaction.segmented_upload = upload
         logger.debug(
-            f"Sequence number: {hex(sdo_metadata.index)}:{hex(sdo_metadata.sub_index)} / {self.index_counter}"
+            f"Segmented upload {hex(upload.index)}:{hex(upload.sub_index)} completed: {upload.size} bytes, "
+            f"{upload.segments} segments, {upload.throughput:.0f} bytes/s"
+        )
+        self._map_response(transaction=transaction, raw_data=memoryview(upload.buffer))
+
+    def _finish_info_fragments(self, transaction: SdoTransaction, fragments: SdoInfoFragments):
+        """フラグメントを連結したデータをSdoDataBodyモデルへマッピングする"""
+        logger.debug(
+            f"SDO Information response reassembled: {len(fragments.buffer)} bytes, {fragments.fragments} fragments"
+        )
+        self._map_response(transaction=transaction, raw_data=memoryview(fragments.buffer))
+
+    def _make_download(self, transaction: SdoTransaction, sub_index: Optional[int]) -> bytes:
+        """SDO Download リクエストフレームを作成する"""
+        sdo_metadata, sdo_data = transaction.sdo_metadata, transaction.sdo_data
+        # values were set on the model: the next response is mapped even if it equals the previous one
+        sdo_data.__dict__.pop("_previous_raw", None)
+        if sub_index is None and sdo_metadata.support_complete_access:
+            # whole object by complete access
+            sub_index, complete_access, data = sdo_metadata.sub_index, True, sdo_data.pack()
+        else:
+            if sub_index is None:
+                sub_index = sdo_metadata.sub_index
+            entry = sdo_data.get_value(sub_index)
+            # an array entry covers consecutive subindexes, which needs complete access
+            complete_access, data = not is_primitive(entry.value), entry.pack()
+
+        transaction.response_message = SDOResponseMessage(sdo_service=SdoService.RESPONSE)
+        request_message = transaction.request_message = SDODownloadMessage(
+            sdo_service=SdoService.REQUEST, station_address=self.station_address
         )
-        self.index_counter += 1
-        # return copy.deepcopy(self.sdo_data)
+        request_message.index = sdo_metadata.index
+        request_message.sub_index = sub_index
+        request_message.complete_access = complete_access
+        request_message.data = data
+        return request_message.make_request_frame(increase_session=False)
+
+    def _handle_download_response(self, transaction: SdoTransaction, response: bytes):
+        """SDO Download のレスポンスフレームを確認する
+
+        Raises:
+            ValueError: SDO Abort などダウンロード完了以外のレスポンスを受信した場合
+        """
+        transaction.response_message.parse_response_frame(response)
+        header = transaction.response_message.sdo_header
+        request_message = transaction.request_message
+        if header.CommandSpecifier != SdoResponseCommand.SDORES_DOWNLOAD.value:
+            raise ValueError(
+                f"Download of {hex(request_message.index)}:{hex(request_message.sub_index)} aborted by "
+                f"command {header.CommandSpecifier}.{_abort_code(response)}"
+            )
+        logger.debug(f"Downloaded {hex(header.Index)}:{hex(header.SubIndex)}")
+
+    async def fetch(self, sdo_metadata: SdoMetadata, sdo_data: SdoDataBody) -> SdoTransaction:
+        """SDO Upload リクエストを発行し、SdoDataBodyモデルへマッピングする
+
+        データが1つのレスポンスに収まらない場合は、Upload SDO Segment リクエストを繰り返して全てのデータを受信する。
+        SDO Information service のレスポンスがフラグメントに分かれている場合は、最後のフラグメントまで受信して連結する。
+
+        Args:
+            sdo_metadata(SdoMetaData): :obj:`SDOメタデータ <pyetg1510.mailbox.sdo_data_factory.SdoMetadata>`
+            sdo_data(SdoDataBody): 受信したSDOデータを格納するコンテナオブジェクト
+
+        Return:
+            SdoTransaction: 完了したリクエスト。 :attr:`SdoTransaction.sdo_data` は受信したSDOデータコンテナで、
+            SDO Information service がエラーを返した場合は :class:`SDOInfoError` のコンテナ
+
+        Raises:
+            ValueError: アップロードまたはセグメント転送が中断 (SDO Abort) された場合、フラグメントが欠落した場合
+        """
+        transaction = SdoTransaction(sdo_metadata=sdo_metadata, sdo_data=sdo_data)
+        request = self._make_request(transaction=transaction)
+        if self.get_info:
+            responses = self.session.request_fragments(request)
+            try:
+                fragments = self._handle_response(transaction=transaction, response=await responses.__anext__())
+                if fragments is not None:
+                    while not fragments.completed:
+                        fragments.feed(await responses.__anext__())
+                    self._finish_info_fragments(transaction=transaction, fragments=fragments)
+            finally:
+                await responses.aclose()
+            return transaction
+
+        # request and wait response
+        response = await self.session.send_data(request)
+        upload = self._handle_response(transaction=transaction, response=response)
+        if upload is not None:
+            while not upload.completed:
+                upload.feed(await self.session.send_data(upload.request_frame()))
+            self._finish_segmented_upload(transaction=transaction, upload=upload)
+        return transaction
+
+    async def download(
+        self, sdo_metadata: SdoMetadata, sdo_data: SdoDataBody, sub_index: Optional[int] = None
+    ) -> SdoTransaction:
+        """SdoDataBodyモデルの値を SDO Download リクエストで書き込む
+
+        値は読み込み時と同じエントリの format でバイト列に変換する。
+
+        Args:
+            sdo_metadata(SdoMetaData): :obj:`SDOメタデータ <pyetg1510.mailbox.sdo_data_factory.SdoMetadata>`
+            sdo_data(SdoDataBody): 書き込む値を格納したコンテナオブジェクト
+            sub_index(int): 書き込むエントリのサブインデックス。Noneの場合、Complete Access をサポートするオブジェクトは
+                有効なエントリ全体を、それ以外はメタデータのサブインデックスのエントリを書き込む。
+
+        Return:
+            SdoTransaction: 完了したリクエスト
+
+        Raises:
+            ValueError: サブインデックスのエントリが無い場合、ダウンロードが中断 (SDO Abort) された場合
+        """
+        transaction = SdoTransaction(sdo_metadata=sdo_metadata, sdo_data=sdo_data)
+        request = self._make_download(transaction=transaction, sub_index=sub_index)
+        self._handle_download_response(transaction, await self.session.send_data(request))
+        return transaction
+
+
+@dataclass
+class BlockingSdoDataController(SdoDataController):
+    """SDO メッセージサービス（同期版）
+
+    :class:`SdoDataController` と同じフレームとデータモデルを用い、 :class:`BlockingEtherCATMasterConnection
+    <pyetg1510.mailbox.connection.BlockingEtherCATMasterConnection>` でブロッキング通信する。
+
+    Args:
+        session(BlockingEtherCATMasterConnection): 通信コネクタオブジェクト
+        get_info(bool): SDO Information serviceの問い合わせ時はTrueにする
+    """
+
+    session: BlockingEtherCATMasterConnection
+
+    def fetch(self, sdo_metadata: SdoMetadata, sdo_data: SdoDataBody) -> SdoTransaction:
+        """SDO Upload リクエストを発行し、SdoDataBodyモデルへマッピングする
+
+        Args:
+            sdo_metadata(SdoMetaData): :obj:`SDOメタデータ <pyetg1510.mailbox.sdo_data_factory.SdoMetadata>`
+            sdo_data(SdoDataBody): 受信したSDOデータを格納するコンテナオブジェクト
+
+        Return:
+            SdoTransaction: 完了したリクエスト。 :attr:`SdoTransaction.sdo_data` は受信したSDOデータコンテナで、
+            SDO Information service がエラーを返した場合は :class:`SDOInfoError` のコンテナ
+
+        Raises:
+            ValueError: アップロードまたはセグメント転送が中断 (SDO Abort) された場合、フラグメントが欠落した場合
+        """
+        transaction = SdoTransaction(sdo_metadata=sdo_metadata, sdo_data=sdo_data)
+        request = self._make_request(transaction=transaction)
+        if self.get_info:
+            responses = self.session.request_fragments(request)
+            try:
+                fragments = self._handle_response(transaction=transaction, response=next(responses))
+                if fragments is not None:
+                    while not fragments.completed:
+                        fragments.feed(next(responses))
+                    self._finish_info_fragments(transaction=transaction, fragments=fragments)
+            finally:
+                responses.close()
+            return transaction
+
+        response = self.session.send_data(request)
+        upload = self._handle_response(transaction=transaction, response=response)
+        if upload is not None:
+            while not upload.completed:
+                upload.feed(self.session.send_data(upload.request_frame()))
+            self._finish_segmented_upload(transaction=transaction, upload=upload)
+        return transaction
+
+    def download(
+        self, sdo_metadata: SdoMetadata, sdo_data: SdoDataBody, sub_index: Optional[int] = None
+    ) -> SdoTransaction:
+        """SdoDataBodyモデルの値を SDO Download リクエストで書き込む
+
+        Args:
+            sdo_metadata(SdoMetaData): :obj:`SDOメタデータ <pyetg1510.mailbox.sdo_data_factory.SdoMetadata>`
+            sdo_data(SdoDataBody): 書き込む値を格納したコンテナオブジェクト
+            sub_index(int): 書き込むエントリのサブインデックス。省略時は :meth:`SdoDataController.download` と同じ。
+
+        Return:
+            SdoTransaction: 完了したリクエスト
+
+        Raises:
+            ValueError: サブインデックスのエントリが無い場合、ダウンロードが中断 (SDO Abort) された場合
+        """
+        transaction = SdoTransaction(sdo_metadata=sdo_metadata, sdo_data=sdo_data)
+        request = self._make_download(transaction=transaction, sub_index=sub_index)
+        self._handle_download_response(transaction, self.session.send_data(request))
+        return transaction
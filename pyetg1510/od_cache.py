@@ -0,0 +1,91 @@
+"""
+オブジェクトディクショナリのキャッシュ
+
+:meth:`MasterODSpecification.get_object_dictionary <pyetg1510.etg_1510.MasterODSpecification.get_object_dictionary>`
+で収集したODの構成（有効なエントリ、サイズ、名前、最大サブインデックス）を JSON ファイルに保存する。キーはメインデバイスの
+Identity Object (0x1018) と OD List のハッシュ値で、次回以降の起動では OD List と 0x1018 の2つのリクエストだけで構成を復元する。
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+from pyetg1510.helper import SysLog
+from pyetg1510.sdo_1xxx_master_object import IndentityObjectData
+
+logger = SysLog.logger
+
+
+@dataclass
+class ObjectDictionaryCache:
+    """メインデバイス毎のODの構成を保存するキャッシュファイル
+
+    1つのファイルに複数のメインデバイスの構成を保持できる。メインデバイスの識別情報またはODリストが変わった場合は
+    キーが変わるため、ODを収集し直して追加する。
+
+    使用例:
+        .. code-block:: python
+
+            master_od = MasterODSpecification(connection=connection, od_cache=ObjectDictionaryCache("cache/od.json"))
+            await master_od.get_object_dictionary()
+
+    Args:
+        path(str): キャッシュファイルのパス。ディレクトリが無い場合は作成する。
+    """
+
+    path: str
+    _layouts: Optional[Dict[str, dict]] = field(default=None, init=False, repr=False)
+
+    @staticmethod
+    def key(identity: IndentityObjectData, indexes: Iterable[int]) -> str:
+        """メインデバイスの識別情報とODリストからキーを作成する
+
+        Args:
+            identity(IndentityObjectData): 0x1018 Identity Object
+            indexes(Iterable[int]): OD List のインデックス
+
+        Return:
+            str: ベンダID、プロダクトコード、リビジョン、シリアル番号と、ODリストの SHA-256 の先頭16桁
+        """
+        digest = hashlib.sha256(b"".join(index.to_bytes(2, "little") for index in indexes)).hexdigest()
+        values = (
+            identity.VendorID.value,
+            identity.ProductCode.value,
+            identity.RevisionNumber.value,
+            identity.SerialNumber.value,
+        )
+        return "-".join(f"{value:08x}" for value in values) + f"-{digest[:16]}"
+
+    def _load(self) -> Dict[str, dict]:
+        """キャッシュファイルを読み込む。無いファイル、読み込めないファイルは空のキャッシュとする。"""
+        if self._layouts is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as fp:
+                    self._layouts = json.load(fp)
+            except FileNotFoundError:
+                self._layouts = {}
+            except ValueError as e:
+                logger.warning(f"OD cache {self.path} is broken and will be rebuilt: {e}")
+                self._layouts = {}
+        return self._layouts
+
+    def get(self, key: str) -> Optional[dict]:
+        """キーに対応するODの構成を返す。無い場合はNone"""
+        return self._load().get(key)
+
+    def put(self, key: str, layout: dict):
+        """ODの構成を保存する
+
+        Args:
+            key(str): :meth:`key` で作成したキー
+            layout(dict): :meth:`MasterODSpecification.layout <pyetg1510.etg_1510.MasterODSpecification.layout>`
+        """
+        layouts = self._load()
+        layouts[key] = layout
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # replace the file at once: a process reading it never sees a partial file
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as fp:
+            json.dump(layouts, fp, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporary, self.path)
@@ -0,0 +1,747 @@
+"""Mailbox Gateway (ETG.8200) シミュレータモジュール
+
+EtherCATマスタが無い環境で :class:`MasterODSpecification <pyetg1510.etg_1510.MasterODSpecification>` や
+:class:`ETG1510Profile <pyetg1510.etg_1510.ETG1510Profile>` を動作させるため、 :mod:`pyetg1510.mailbox.mailbox_gateway`
+と同じ EtherCAT/Mailbox/CoE フレームで SDO Information service (フラグメントを含む) 、 SDO Upload (セグメント転送を含む)
+と SDO Download に応答する asyncio UDP サーバ。
+
+コマンドラインから起動することもできる。
+
+.. code-block:: shell
+
+    python -m pyetg1510.simulator --port 34980 --subdevices 16 --latency 0.002 --jitter 0.001 --loss 0.01 --mailbox-size 128
+"""
+import argparse
+import asyncio
+import copy
+import random
+import struct
+from ctypes import Structure
+from dataclasses import dataclass, field, fields
+from typing import Dict, Iterator, List, Optional, Tuple
+from pyetg1510.helper import SysLog
+from pyetg1510.mailbox.mailbox_gateway import (
+    CoEHeader,
+    EtherCATHeader,
+    EtherCATProtocolType,
+    MailboxHeader,
+    MailBoxFrameOffsetAddress,
+    SDOInformationDescriptionRequest,
+    SDOInformationEntryRequest,
+    SDOInformationHeader,
+    SDODownloadRequest,
+    SDORequest,
+    SDOResponse,
+    SDOSegmentHeader,
+    SdoInfoOpcode,
+    SdoRequestCommand,
+    SdoResponseCommand,
+    SdoService,
+)
+from pyetg1510.mailbox.sdo_application_interface import SdoDataBody, SdoEntry, is_primitive
+from pyetg1510.sdo_1xxx_master_object import (
+    DeviceNameData,
+    DeviceTypeData,
+    HardwareVersionData,
+    IndentityObjectData,
+    SoftwareVersionData,
+)
+from pyetg1510.sdo_8xxx_configuration_data import ConfigurationData
+from pyetg1510.sdo_axxx_master_diagnosis import DiagnosisData
+from pyetg1510.sdo_fxxx_controls import (
+    ConfiguredAddressList,
+    DetectModulesCommand,
+    DiagInterfaceControl,
+    MasterDiagData,
+)
+
+logger = SysLog.logger
+
+OBJECT_CODE_VAR = 0x07
+OBJECT_CODE_RECORD = 0x09
+
+ABORT_OBJECT_DOES_NOT_EXIST = 0x06020000
+"""SDO Abort code: Object does not exist in the object dictionary"""
+ABORT_SUBINDEX_DOES_NOT_EXIST = 0x06090011
+"""SDO Abort code: Subindex does not exist"""
+ABORT_COMMAND_NOT_SUPPORTED = 0x05040001
+"""SDO Abort code: Client/server command specifier not valid or unknown"""
+ABORT_TOGGLE_BIT_NOT_ALTERNATED = 0x05030000
+"""SDO Abort code: Toggle bit not alternated"""
+ABORT_READ_ONLY = 0x06010002
+"""SDO Abort code: Attempt to write a read only object"""
+ABORT_DATA_LENGTH_DOES_NOT_MATCH = 0x06070010
+"""SDO Abort code: Data type does not match, length of service parameter does not match"""
+
+_DATA_TYPES = {
+    "?": 0x0001,
+    "b": 0x0002,
+    "h": 0x0003,
+    "i": 0x0004,
+    "l": 0x0004,
+    "q": 0x0015,
+    "B": 0x0005,
+    "H": 0x0006,
+    "I": 0x0007,
+    "L": 0x0007,
+    "Q": 0x001B,
+    "f": 0x0008,
+    "d": 0x0011,
+    "s": 0x0009,
+}
+"""struct format文字と CoE データ型の対応"""
+
+
+@dataclass
+class SimulatedObject:
+    """シミュレータが応答するオブジェクト
+
+    ``data`` の ``enable`` がTrueのエントリを存在するサブインデックスとして扱い、 ``value`` をその値として応答する。
+
+    Args:
+        name(str): Object Description で返すオブジェクト名
+        data(SdoDataBody): サブインデックスの定義と値を保持するデータモデル
+        writable(bool): SDO Download を受け付ける場合True
+    """
+
+    name: str
+    data: SdoDataBody
+    writable: bool = field(default=False)
+
+    def __post_init__(self):
+        for each_field in fields(self.data):
+            entry = getattr(self.data, each_field.name)
+            entry.name = entry.name or each_field.name
+        for entry in self.entries():
+            # the wire size of a string is the length of its value unless the model fixes it
+            if isinstance(entry.value, str) and entry.size < len(entry.value.encode()):
+                entry.size = len(entry.value.encode())
+
+    def entries(self) -> Iterator[SdoEntry]:
+        """存在するエントリを返す"""
+        for each_field in fields(self.data):
+            entry = getattr(self.data, each_field.name)
+            if entry.enable:
+                yield entry
+
+    def _entry_length(self, entry: SdoEntry) -> int:
+        """エントリが占めるサブインデックスの数"""
+        if is_primitive(entry.value):
+            return 1
+        return len(entry.value)
+
+    @property
+    def object_code(self) -> int:
+        """Object Code (VAR/RECORD)"""
+        entries = list(self.entries())
+        if len(entries) == 1 and entries[0].sub_index == 0 and is_primitive(entries[0].value):
+            return OBJECT_CODE_VAR
+        return OBJECT_CODE_RECORD
+
+    @property
+    def max_sub_index(self) -> int:
+        """最大サブインデックス番号"""
+        return max((e.sub_index + self._entry_length(e) - 1 for e in self.entries()), default=0)
+
+    def find_entry(self, sub_index: int) -> Optional[Tuple[SdoEntry, int]]:
+        """サブインデックスを含むエントリと、配列の場合はその要素番号を返す。存在しない場合はNone"""
+        for entry in self.entries():
+            if entry.sub_index <= sub_index < entry.sub_index + self._entry_length(entry):
+                return entry, sub_index - entry.sub_index
+        return None
+
+    def upload(self, sub_index: int, complete_access: bool) -> Optional[bytes]:
+        """SDO Upload のデータを返す。サブインデックスが存在しない場合はNone
+
+        Complete Access の場合は ``sub_index`` 以降の全てのエントリを、データモデルの
+        :attr:`unpack_format <pyetg1510.mailbox.sdo_application_interface.SdoDataBody.unpack_format>` でパックする。
+        """
+        if complete_access:
+            data = self._complete_access_data(sub_index)
+            if data is None:
+                return None
+            return data.pack()
+        found = self.find_entry(sub_index)
+        if found is None:
+            return None
+        entry, offset = found
+        if isinstance(entry.value, str):
+            value = entry.value.encode()
+        elif is_primitive(entry.value):
+            value = entry.value
+        else:
+            value = entry.value[offset]
+        return struct.pack(self._entry_format(entry), value)
+
+    def download(self, sub_index: int, complete_access: bool, data: bytes) -> Optional[int]:
+        """SDO Download のデータを値に設定する
+
+        Complete Access の場合は ``sub_index`` 以降の全てのエントリを、データモデルの
+        :attr:`unpack_format <pyetg1510.mailbox.sdo_application_interface.SdoDataBody.unpack_format>` でアンパックする。
+
+        Return:
+            int: 設定できない場合の SDO Abort code。設定した場合はNone
+        """
+        if complete_access:
+            selected = self._complete_access_data(sub_index)
+            if selected is None:
+                return ABORT_SUBINDEX_DOES_NOT_EXIST
+            unpack_format = selected.unpack_format
+            if struct.calcsize(unpack_format) != len(data):
+                return ABORT_DATA_LENGTH_DOES_NOT_MATCH
+            values = iter(struct.unpack(unpack_format, data))
+            for entry in self.entries():
+                if entry.sub_index < sub_index:
+                    continue
+                if isinstance(entry.value, str):
+                    entry.value = next(values).strip(b"\0").decode()
+                elif is_primitive(entry.value):
+                    entry.value = next(values)
+                else:
+                    entry.value = [next(values) for _ in entry.value]
+            return None
+        found = self.find_entry(sub_index)
+        if found is None:
+            return ABORT_SUBINDEX_DOES_NOT_EXIST
+        entry, offset = found
+        unpack_format = self._entry_format(entry)
+        if struct.calcsize(unpack_format) != len(data):
+            return ABORT_DATA_LENGTH_DOES_NOT_MATCH
+        value = struct.unpack(unpack_format, data)[0]
+        if isinstance(entry.value, str):
+            entry.value = value.strip(b"\0").decode()
+        elif is_primitive(entry.value):
+            entry.value = value
+        else:
+            entry.value[offset] = value
+        return None
+
+    def _complete_access_data(self, sub_index: int) -> Optional[SdoDataBody]:
+        """``sub_index`` 以降のエントリのみを有効にしたデータモデルの複製。該当するエントリが無い場合はNone"""
+        data = copy.deepcopy(self.data)
+        for each_field in fields(data):
+            entry = getattr(data, each_field.name)
+            entry.enable = entry.enable and entry.sub_index >= sub_index
+        if not any(getattr(data, each_field.name).enable for each_field in fields(data)):
+            return None
+        return data
+
+    def _entry_format(self, entry: SdoEntry) -> str:
+        """サブインデックス1つ分の struct format"""
+        if isinstance(entry.value, str):
+            return f"={entry.size}s"
+        return f"={entry.format}"
+
+
+def _enable_all(data: SdoDataBody) -> SdoDataBody:
+    for each_field in fields(data):
+        getattr(data, each_field.name).enable = True
+    return data
+
+
+def create_virtual_network(subdevices: int = 4) -> Dict[int, SimulatedObject]:
+    """``subdevices`` 台のサブデバイスが接続されたマスタのオブジェクトディクショナリを作成する
+
+    0x1000-0x1018 のマスタ情報、サブデバイス毎の 0x8nnn (Configuration data) と 0xAnnn (Diagnosis data)、
+    0xF002 (Detect modules command) 、0xF020 (Configured address list) 、0xF120 (Master diag data) 、
+    0xF200 (Diag interface control) を含む。0xF002 と 0xF200 は SDO Download で書き込める。
+
+    Args:
+        subdevices(int): サブデバイスの台数
+
+    Return:
+        Dict[int, SimulatedObject]: インデックスとオブジェクトの辞書
+    """
+    if not 0 <= subdevices <= 125:
+        raise ValueError(f"subdevices must be within 0-125. Set to {subdevices}")
+    objects: Dict[int, SimulatedObject] = {}
+
+    device_type = _enable_all(DeviceTypeData())
+    device_type.DeviceType.value = 0x00001389
+    objects[0x1000] = SimulatedObject("Device type", device_type)
+    device_name = _enable_all(DeviceNameData())
+    device_name.DeviceName.value = "PyETG1510 Simulator"
+    objects[0x1008] = SimulatedObject("Device name", device_name)
+    hardware_version = _enable_all(HardwareVersionData())
+    hardware_version.HardwareVersion.value = "1.0"
+    objects[0x1009] = SimulatedObject("Hardware version", hardware_version)
+    software_version = _enable_all(SoftwareVersionData())
+    software_version.SoftwareVersion.value = "0.1.3"
+    objects[0x100A] = SimulatedObject("Software version", software_version)
+    identity = _enable_all(IndentityObjectData())
+    identity.NumberOfEntries.value = 4
+    identity.VendorID.value = 0x00000002
+    identity.ProductCode.value = 0x15100000
+    identity.RevisionNumber.value = 0x00010000
+    identity.SerialNumber.value = 0
+    objects[0x1018] = SimulatedObject("Identity", identity)
+
+    for i in range(subdevices):
+        station_address = 1001 + i
+        configuration = _enable_all(ConfigurationData())
+        configuration.NumberOfEntries.value = 40
+        configuration.FixedStationAddress.value = station_address
+        configuration.Type.value = "EL1008"
+        configuration.Name.value = f"Term {i + 1} (EL1008)"
+        configuration.VendorId.value = 0x00000002
+        configuration.ProductCode.value = 0x03F03052
+        configuration.RevisionNumber.value = 0x00100000
+        configuration.MailboxOutSize.value = 128
+        configuration.MailboxInSize.value = 128
+        configuration.LinkStatus.value = 0x03
+        objects[0x8000 + i] = SimulatedObject(f"Configuration data Station {station_address}", configuration)
+
+        diagnosis = _enable_all(DiagnosisData())
+        diagnosis.NumberOfEntries.value = 19
+        diagnosis.ALStatus.value = 0x0008
+        diagnosis.ALControl.value = 0x0008
+        diagnosis.LinkConnStatus.value = 0x33
+        diagnosis.FixedAddressConnPort.value = [station_address - 1 if i else 0, station_address + 1, 0, 0]
+        diagnosis.FrameErrorCounterPort.value = [i % 3, 0, 0, 0]
+        diagnosis.CyclicWCErrorCounter.value = i % 5
+        objects[0xA000 + i] = SimulatedObject(f"Diagnosis data Station {station_address}", diagnosis)
+
+    detect_modules = _enable_all(DetectModulesCommand())
+    detect_modules.NumberofEntries.value = 3
+    objects[0xF002] = SimulatedObject("Detect modules command", detect_modules, writable=True)
+    address_list = _enable_all(ConfiguredAddressList())
+    address_list.NumberofSlaves.value = subdevices
+    address_list.ConfiguredAddress.value = [1001 + i for i in range(subdevices)] + [0] * (125 - subdevices)
+    objects[0xF020] = SimulatedObject("Configured address list", address_list)
+    master_diag = _enable_all(MasterDiagData())
+    master_diag.NumberOfEntries.value = 16
+    master_diag.CyclicFramesPerSecond.value = 1000
+    master_diag.CyclicLostFrames.value = 2
+    master_diag.MasterState.value = 0x0008
+    objects[0xF120] = SimulatedObject("Master diag data", master_diag)
+    diag_control = _enable_all(DiagInterfaceControl())
+    diag_control.NumberOfEntries.value = 16
+    objects[0xF200] = SimulatedObject("Diag interface control", diag_control, writable=True)
+    return objects
+
+
+@dataclass
+class _SegmentedTransfer:
+    """セグメント転送中のデータ"""
+
+    data: bytes
+    position: int
+    toggle: int = 0
+    last_segment: Optional[Tuple[int, bytes, bool]] = None
+    """直前に送信したセグメント (toggle, data, last)。リクエストの再送に同じセグメントを返す。"""
+
+
+@dataclass
+class SimulatorStatistics:
+    """シミュレータの統計"""
+
+    requests: int = 0
+    """受信したリクエスト数"""
+    responses: int = 0
+    """送信したレスポンス数"""
+    dropped: int = 0
+    """パケットロスとして破棄したリクエスト数"""
+    malformed: int = 0
+    """解釈できずに破棄したデータグラム数"""
+    segments: int = 0
+    """送信した Upload SDO Segment レスポンス数"""
+    fragments: int = 0
+    """フラグメントに分けて送信した SDO Information レスポンス数"""
+    downloads: int = 0
+    """書き込んだ SDO Download リクエスト数"""
+
+
+class _SimulatorProtocol(asyncio.DatagramProtocol):
+    def __init__(self, simulator: "MailboxGatewaySimulator"):
+        self.simulator = simulator
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.simulator._received(self.transport, data, addr)
+
+
+@dataclass
+class MailboxGatewaySimulator:
+    """Mailbox Gateway のUDPサーバシミュレータ
+
+    リクエスト毎に ``latency`` + 0..``jitter`` 秒の遅延を加えて応答し、 ``loss`` の確率でリクエストを破棄する。
+
+    使用例:
+        .. code-block:: python
+
+            async with MailboxGatewaySimulator(subdevices=16, latency=0.001) as simulator:
+                host, port = simulator.address
+                async with EtherCATMasterConnection(host, port, window=7) as connection:
+                    master_od = MasterODSpecification(connection=connection)
+                    await master_od.get_object_dictionary()
+
+    Args:
+        subdevices(int): 仮想ネットワークのサブデバイス台数
+        latency(float): 応答までの遅延（秒）
+        jitter(float): 遅延に加えるランダムな揺らぎの最大値（秒）
+        loss(float): リクエストを破棄する確率（0..1）
+        seed(int): 揺らぎとパケットロスの乱数シード
+        objects(Dict[int, SimulatedObject]): 応答するオブジェクトディクショナリ。省略時は :func:`create_virtual_network` で作成する。
+        mailbox_size(int): Mailbox のデータ長（Mailbox header の Length）の上限。収まらない SDO Upload はセグメント転送、
+            SDO Information はフラグメントで応答する。Noneの場合は上限なし。
+    """
+
+    subdevices: int = field(default=4)
+    latency: float = field(default=0.0)
+    jitter: float = field(default=0.0)
+    loss: float = field(default=0.0)
+    seed: Optional[int] = field(default=None)
+    objects: Dict[int, SimulatedObject] = field(default=None)
+    mailbox_size: Optional[int] = field(default=None)
+    statistics: SimulatorStatistics = field(default_factory=SimulatorStatistics, init=False)
+    _transport: asyncio.DatagramTransport = field(default=None, init=False, repr=False)
+    _uploads: Dict[Tuple[int, int], _SegmentedTransfer] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        if not 0.0 <= self.loss <= 1.0:
+            raise ValueError(f"loss must be within 0-1. Set to {self.loss}")
+        if self.mailbox_size is not None and self.mailbox_size < 10:
+            raise ValueError(f"mailbox_size must be 10 or more. Set to {self.mailbox_size}")
+        if self.objects is None:
+            self.objects = create_virtual_network(self.subdevices)
+        self._random = random.Random(self.seed)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """待ち受けているアドレスとポート番号"""
+        return self._transport.get_extra_info("sockname")[:2]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, int]:
+        """UDPサーバを開始する
+
+        Args:
+            host(str): 待ち受けるアドレス
+            port(int): 待ち受けるポート番号。0の場合は空いているポートを割り当てる。
+
+        Return:
+            Tuple[str, int]: 待ち受けているアドレスとポート番号
+        """
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _SimulatorProtocol(self), local_addr=(host, port)
+        )
+        logger.info(f"Mailbox gateway simulator started on {self.address}")
+        return self.address
+
+    def close(self):
+        """UDPサーバを停止する"""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _received(self, transport: asyncio.DatagramTransport, data: bytes, addr):
+        self.statistics.requests += 1
+        if self.loss and self._random.random() < self.loss:
+            self.statistics.dropped += 1
+            return
+        try:
+            responses = self.respond_all(data)
+        except (ValueError, IndexError) as e:
+            logger.warning(f"Malformed request {data}: {e}")
+            responses = []
+        if not responses:
+            self.statistics.malformed += 1
+            return
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._send, transport, responses, addr)
+        else:
+            self._send(transport, responses, addr)
+
+    def _send(self, transport: asyncio.DatagramTransport, responses: List[bytes], addr):
+        for response in responses:
+            if transport.is_closing():
+                return
+            transport.sendto(response, addr)
+            self.statistics.responses += 1
+
+    def respond(self, request: bytes) -> Optional[bytes]:
+        """リクエストフレームに対するレスポンスフレームを返す。応答できないフレームの場合はNone
+
+        Args:
+            request(bytes): 受信したフレーム
+
+        Return:
+            bytes: レスポンスフレーム。フラグメントに分かれる場合は最初のフラグメント
+        """
+        responses = self.respond_all(request)
+        return responses[0] if responses else None
+
+    def respond_all(self, request: bytes) -> List[bytes]:
+        """リクエストフレームに対するレスポンスフレームを送信順に返す。応答できないフレームの場合は空のリスト
+
+        Args:
+            request(bytes): 受信したフレーム
+
+        Return:
+            List[bytes]: レスポンスフレーム。SDO Information のレスポンスが ``mailbox_size`` に収まらない場合はフラグメント
+        """
+        if len(request) < MailBoxFrameOffsetAddress.SDO_DATA.value:
+            return []
+        ethercat_header = EtherCATHeader.from_buffer_copy(request, MailBoxFrameOffsetAddress.ETHERCAT_HEADER.value)
+        if ethercat_header.DataType != EtherCATProtocolType.MAILBOX.value:
+            return []
+        mailbox_header = MailboxHeader.from_buffer_copy(request, MailBoxFrameOffsetAddress.MAILBOX_HEADER.value)
+        coe_header = CoEHeader.from_buffer_copy(request, MailBoxFrameOffsetAddress.COE_HEADER.value)
+        if coe_header.Service == SdoService.REQUEST.value:
+            if request[MailBoxFrameOffsetAddress.SDO_HEADER.value] >> 5 == SdoRequestCommand.SDOREQ_DOWNLOAD.value:
+                return [self._respond_download(mailbox_header, request)]
+            return [self._respond_upload(mailbox_header, request)]
+        if coe_header.Service == SdoService.INFO.value:
+            return self._respond_info(mailbox_header, request)
+        return []
+
+    def _frame(self, mailbox_header: MailboxHeader, service: SdoService, sdo_header: Structure, body: bytes) -> bytes:
+        """リクエストの Mailbox header (Address, Type, Cnt) を引き継いだレスポンスフレームを作成する"""
+        coe_header = CoEHeader(Number=0, Reserved=0, Service=service.value)
+        payload = bytes(coe_header) + bytes(sdo_header) + body
+        response_mailbox_header = MailboxHeader(
+            Length=len(payload),
+            Address=mailbox_header.Address,
+            Channel=0,
+            Prio=0,
+            Type=mailbox_header.Type,
+            Cnt=mailbox_header.Cnt,
+            Reserved=0,
+        )
+        ethercat_header = EtherCATHeader(
+            Length=len(payload) + len(bytes(response_mailbox_header)),
+            Reserved=0,
+            DataType=EtherCATProtocolType.MAILBOX.value,
+        )
+        return bytes(ethercat_header) + bytes(response_mailbox_header) + payload
+
+    def _abort(self, mailbox_header: MailboxHeader, index: int, sub_index: int, abort_code: int) -> bytes:
+        sdo_header = SDOResponse(
+            CommandSpecifier=SdoRequestCommand.SDOREQ_ABORT_TRANSFER.value, Index=index, SubIndex=sub_index
+        )
+        return self._frame(mailbox_header, SdoService.REQUEST, sdo_header, struct.pack("<I", abort_code))
+
+    def _respond_upload(self, mailbox_header: MailboxHeader, request: bytes) -> bytes:
+        sdo_request = SDORequest.from_buffer_copy(
+            request.ljust(MailBoxFrameOffsetAddress.SDO_HEADER.value + 8, b"\0"),
+            MailBoxFrameOffsetAddress.SDO_HEADER.value,
+        )
+        index, sub_index = sdo_request.Index, sdo_request.SubIndex
+        if sdo_request.CommandSpecifier == SdoRequestCommand.SDOREQ_UPLOAD_SEGMENTED.value:
+            # the toggle bit is bit 4 of the command byte, the position of CompleteAccess in SDORequest
+            return self._respond_upload_segment(mailbox_header, index, sub_index, sdo_request.CompleteAccess)
+        if sdo_request.CommandSpecifier != SdoRequestCommand.SDOREQ_UPLOAD.value:
+            return self._abort(mailbox_header, index, sub_index, ABORT_COMMAND_NOT_SUPPORTED)
+        # a new initiate upload cancels an unfinished segmented transfer of the same entry
+        self._uploads.pop((index, sub_index), None)
+        if index not in self.objects:
+            return self._abort(mailbox_header, index, sub_index, ABORT_OBJECT_DOES_NOT_EXIST)
+        data = self.objects[index].upload(sub_index, bool(sdo_request.CompleteAccess))
+        if data is None:
+            return self._abort(mailbox_header, index, sub_index, ABORT_SUBINDEX_DOES_NOT_EXIST)
+        sdo_header = SDOResponse(
+            SizeIndicator=1,
+            CompleteAccess=sdo_request.CompleteAccess,
+            CommandSpecifier=SdoResponseCommand.SDORES_UPLOAD.value,
+            Index=index,
+            SubIndex=sub_index,
+        )
+        if len(data) <= 4:
+            # expedited transfer
+            sdo_header.TransferType = 1
+            sdo_header.DataSetSize = 4 - len(data)
+            return self._frame(mailbox_header, SdoService.RESPONSE, sdo_header, data.ljust(4, b"\0"))
+        if self.mailbox_size is not None and 10 + len(data) > self.mailbox_size:
+            # normal transfer with the first part of the data, the rest follows in upload segments
+            first_size = self.mailbox_size - 10
+            self._uploads[(index, sub_index)] = _SegmentedTransfer(data=data, position=first_size)
+            body = struct.pack("<I", len(data)) + data[:first_size]
+            return self._frame(mailbox_header, SdoService.RESPONSE, sdo_header, body)
+        return self._frame(mailbox_header, SdoService.RESPONSE, sdo_header, struct.pack("<I", len(data)) + data)
+
+    def _respond_upload_segment(self, mailbox_header: MailboxHeader, index: int, sub_index: int, toggle: int) -> bytes:
+        transfer = self._uploads.get((index, sub_index))
+        if transfer is None:
+            return self._abort(mailbox_header, index, sub_index, ABORT_COMMAND_NOT_SUPPORTED)
+        if transfer.last_segment is not None and transfer.last_segment[0] == toggle:
+            # retransmitted request: the previous response has been lost
+            _, data, last = transfer.last_segment
+        elif toggle != transfer.toggle:
+            del self._uploads[(index, sub_index)]
+            return self._abort(mailbox_header, index, sub_index, ABORT_TOGGLE_BIT_NOT_ALTERNATED)
+        else:
+            segment_size = self.mailbox_size - 3
+            data = transfer.data[transfer.position : transfer.position + segment_size]
+            transfer.position += len(data)
+            last = transfer.position >= len(transfer.data)
+            transfer.last_segment = (toggle, data, last)
+            transfer.toggle ^= 1
+        self.statistics.segments += 1
+        sdo_header = SDOSegmentHeader(
+            LastSegment=int(last),
+            SegDataSize=max(0, 7 - len(data)),
+            Toggle=toggle,
+            CommandSpecifier=SdoResponseCommand.SDORES_UPLOAD_SEGMENTED.value,
+        )
+        return self._frame(mailbox_header, SdoService.RESPONSE, sdo_header, data.ljust(7, b"\0"))
+
+    def _respond_download(self, mailbox_header: MailboxHeader, request: bytes) -> bytes:
+        sdo_request = SDODownloadRequest.from_buffer_copy(request, MailBoxFrameOffsetAddress.SDO_HEADER.value)
+        index, sub_index = sdo_request.Index, sdo_request.SubIndex
+        body = request[MailBoxFrameOffsetAddress.SDO_DATA.value :].ljust(4, b"\0")
+        if sdo_request.TransferType == 1:
+            # expedited transfer
+            data = body[: 4 - sdo_request.DataSetSize]
+        else:
+            size = struct.unpack_from("<I", body)[0]
+            data = body[4 : 4 + size]
+            if len(data) < size:
+                # download segments are not simulated
+                return self._abort(mailbox_header, index, sub_index, ABORT_COMMAND_NOT_SUPPORTED)
+        if index not in self.objects:
+            return self._abort(mailbox_header, index, sub_index, ABORT_OBJECT_DOES_NOT_EXIST)
+        simulated = self.objects[index]
+        if not simulated.writable:
+            return self._abort(mailbox_header, index, sub_index, ABORT_READ_ONLY)
+        abort_code = simulated.download(sub_index, bool(sdo_request.CompleteAccess), data)
+        if abort_code is not None:
+            return self._abort(mailbox_header, index, sub_index, abort_code)
+        self.statistics.downloads += 1
+        self._downloaded(index)
+        sdo_header = SDOResponse(
+            CompleteAccess=sdo_request.CompleteAccess,
+            CommandSpecifier=SdoResponseCommand.SDORES_DOWNLOAD.value,
+            Index=index,
+            SubIndex=sub_index,
+        )
+        return self._frame(mailbox_header, SdoService.RESPONSE, sdo_header, b"\0" * 4)
+
+    def _downloaded(self, index: int):
+        """書き込まれたコマンドを実行する"""
+        if index == 0xF200:
+            control = self.objects[index].data
+            if control.ResetDiagInfo.value:
+                # reset the diagnosis counters of the master and all subdevices
+                control.ResetDiagInfo.value = False
+                for diagnosis_index in range(0xA000, 0xB000):
+                    if diagnosis_index in self.objects:
+                        diagnosis = self.objects[diagnosis_index].data
+                        diagnosis.FrameErrorCounterPort.value = [0] * len(diagnosis.FrameErrorCounterPort.value)
+                        diagnosis.CyclicWCErrorCounter.value = 0
+                        diagnosis.SlaveNotPresentCounter.value = 0
+                        diagnosis.AbnormalStateChangeCounter.value = 0
+                if 0xF120 in self.objects:
+                    master_diag = self.objects[0xF120].data
+                    master_diag.CyclicLostFrames.value = 0
+                    master_diag.ACyclicLostFrames.value = 0
+        elif index == 0xF002:
+            command = self.objects[index].data
+            if command.ScanCommandRequest.value:
+                # the simulated network has no unexpected modules: the scan finishes immediately without error
+                command.ScanCommandStatus.value = 1
+                command.ScanCommandResponse.value = ""
+
+    def _respond_info(self, mailbox_header: MailboxHeader, request: bytes) -> List[bytes]:
+        info_header = SDOInformationHeader.from_buffer_copy(request, MailBoxFrameOffsetAddress.SDO_HEADER.value)
+        body = request[MailBoxFrameOffsetAddress.SDO_DATA.value :]
+        if info_header.Opcode == SdoInfoOpcode.GET_OD_LIST_REQ.value:
+            list_type = struct.unpack_from("<H", body)[0]
+            indexes = sorted(self.objects)
+            return self._info(
+                mailbox_header,
+                SdoInfoOpcode.GET_OD_LIST_RES,
+                struct.pack(f"<H{len(indexes)}H", list_type, *indexes),
+            )
+        if info_header.Opcode == SdoInfoOpcode.GET_DESCRIPTION_REQ.value:
+            index = SDOInformationDescriptionRequest.from_buffer_copy(body).Index
+            if index not in self.objects:
+                return self._info_error(mailbox_header, ABORT_OBJECT_DOES_NOT_EXIST)
+            simulated = self.objects[index]
+            entries = list(simulated.entries())
+            data_type = _DATA_TYPES.get(entries[0].format[-1], 0) if simulated.object_code == OBJECT_CODE_VAR else 0
+            return self._info(
+                mailbox_header,
+                SdoInfoOpcode.GET_DESCRIPTION_RES,
+                struct.pack("<HHBB", index, data_type, simulated.max_sub_index, simulated.object_code)
+                + simulated.name.encode(),
+            )
+        if info_header.Opcode == SdoInfoOpcode.GET_ENTRY_REQ.value:
+            entry_request = SDOInformationEntryRequest.from_buffer_copy(body)
+            index, sub_index = entry_request.Index, entry_request.Subindex
+            if index not in self.objects:
+                return self._info_error(mailbox_header, ABORT_OBJECT_DOES_NOT_EXIST)
+            found = self.objects[index].find_entry(sub_index)
+            if found is None:
+                return self._info_error(mailbox_header, ABORT_SUBINDEX_DOES_NOT_EXIST)
+            entry, _ = found
+            bit_length = entry.size * 8 if is_primitive(entry.value) else struct.calcsize(entry.format) * 8
+            # value info is not returned (ValueInfo=0): the description ends with the entry name
+            return self._info(
+                mailbox_header,
+                SdoInfoOpcode.GET_ENTRY_RES,
+                struct.pack("<HBBHHH", index, sub_index, 0, _DATA_TYPES.get(entry.format[-1], 0), bit_length, 0x0007)
+                + entry.name.encode(),
+            )
+        return self._info_error(mailbox_header, ABORT_COMMAND_NOT_SUPPORTED)
+
+    def _info(self, mailbox_header: MailboxHeader, opcode: SdoInfoOpcode, body: bytes) -> List[bytes]:
+        """SDO Information のレスポンスを作成する。 ``mailbox_size`` に収まらない場合はフラグメントに分ける。"""
+        fragment_size = len(body) if self.mailbox_size is None else self.mailbox_size - 6
+        chunks = [body[i : i + fragment_size] for i in range(0, len(body), fragment_size)] or [b""]
+        frames = []
+        for i, chunk in enumerate(chunks):
+            fragments_left = len(chunks) - 1 - i
+            info_header = SDOInformationHeader(
+                Opcode=opcode.value, Incomplete=int(fragments_left > 0), Reserved=0, FragmentsLeft=fragments_left
+            )
+            frames.append(self._frame(mailbox_header, SdoService.INFO, info_header, chunk))
+        if len(frames) > 1:
+            self.statistics.fragments += len(frames)
+        return frames
+
+    def _info_error(self, mailbox_header: MailboxHeader, abort_code: int) -> List[bytes]:
+        return self._info(mailbox_header, SdoInfoOpcode.SDO_INFO_ERR_REQ, struct.pack("<I", abort_code))
+
+
+async def _serve(args: argparse.Namespace):
+    simulator = MailboxGatewaySimulator(
+        subdevices=args.subdevices,
+        latency=args.latency,
+        jitter=args.jitter,
+        loss=args.loss,
+        seed=args.seed,
+        mailbox_size=args.mailbox_size,
+    )
+    host, port = await simulator.start(args.host, args.port)
+    print(f"Mailbox gateway simulator listening on {host}:{port} with {args.subdevices} subdevices")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        simulator.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETG.8200 mailbox gateway simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=34980)
+    parser.add_argument("--subdevices", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random delay added to latency in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability to drop a request")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--mailbox-size", type=int, default=None, help="maximum mailbox data length in bytes")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
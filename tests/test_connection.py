@@ -0,0 +1,198 @@
+import asyncio
+import dataclasses
+import time
+from typing import Optional, Tuple
+
+import pytest
+
+from pyetg1510.mailbox import *
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+
+def upload_request(index: int = 0x1000, sub_index: int = 0) -> bytes:
+    message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
+    message.sdo_command_data = None
+    message.index = index
+    message.sub_index = sub_index
+    return message.make_request_frame()
+
+
+def upload_response(request: bytes, session_counter: Optional[int] = None) -> bytes:
+    """Expedited upload response whose data is the requested index and subindex"""
+    response = bytearray(request[:14]) + request[11:14] + b"\0"
+    # CoE service 3 (SDO response), command 2 (upload response), expedited with 4 bytes
+    response[9] = 0x30
+    response[10] = 0x43
+    if session_counter is not None:
+        set_session_counter(response, session_counter)
+    return bytes(response)
+
+
+class ReorderingGateway(asyncio.DatagramProtocol):
+    """Holds the requests and answers them in reverse order once ``window`` requests arrived or after 20 ms"""
+
+    def __init__(self, window: int, stale: bool = False):
+        self.window = window
+        self.stale = stale
+        self.held = []
+        self.max_held = 0
+        self.transport = None
+        self.flush = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.held.append((data, addr))
+        self.max_held = max(self.max_held, len(self.held))
+        if self.flush is not None:
+            self.flush.cancel()
+        if len(self.held) >= self.window:
+            self.respond()
+        else:
+            self.flush = asyncio.get_running_loop().call_later(0.02, self.respond)
+
+    def respond(self):
+        held, self.held = self.held, []
+        for request, addr in reversed(held):
+            if self.stale:
+                # a Cnt nothing waits for, then the right Cnt for another index
+                unused = {get_session_counter(each) for each, _ in held} ^ set(range(1, MAX_SESSION_COUNTER + 1))
+                self.transport.sendto(upload_response(request, min(unused)), addr)
+                other = bytearray(request)
+                other[11] ^= 0xFF
+                self.transport.sendto(upload_response(bytes(other)), addr)
+            self.transport.sendto(upload_response(request), addr)
+
+
+async def reordering_gateway(**options) -> Tuple[asyncio.DatagramTransport, ReorderingGateway]:
+    loop = asyncio.get_running_loop()
+    return await loop.create_datagram_endpoint(lambda: ReorderingGateway(**options), local_addr=("127.0.0.1", 0))
+
+
+@pytest.mark.parametrize("stale", [False, True])
+def test_responses_reach_their_requests(stale):
+    async def run():
+        transport, gateway = await reordering_gateway(window=3, stale=stale)
+        host, port = transport.get_extra_info("sockname")
+        try:
+            async with EtherCATMasterConnection(host, port, window=3) as connection:
+                addresses = [(0x8000 + index, index % 5) for index in range(20)]
+                responses = await asyncio.gather(
+                    *(connection.send_data(upload_request(*address)) for address in addresses)
+                )
+                # each request got the response for its own index and subindex
+                assert [(int.from_bytes(r[14:16], "little"), r[16]) for r in responses] == addresses
+                assert connection.statistics.retransmissions == 0
+                assert connection.in_flight == 0
+        finally:
+            transport.close()
+        # never more than window requests in flight
+        assert gateway.max_held == 3
+
+    asyncio.run(run())
+
+
+def test_rtt_estimator_floor():
+    estimator = RttEstimator()
+    assert estimator.min_rto == 0.1
+    estimator.update(0.002)
+    assert estimator.rto == estimator.min_rto
+    estimator.update(10.0)
+    assert estimator.rto == estimator.max_rto
+
+
+def test_timeout_backs_off_only_the_request():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=1, loss=1.0) as simulator:
+            host, port = simulator.address
+            estimator = RttEstimator(initial_rto=0.01)
+            async with EtherCATMasterConnection(
+                host, port, window=7, retries=2, rtt_estimator=estimator
+            ) as connection:
+                results = await asyncio.gather(
+                    *(connection.send_data(upload_request()) for _ in range(7)), return_exceptions=True
+                )
+                assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+                assert connection.statistics.retransmissions == 7 * 2
+                assert connection.statistics.timeouts == 7
+                # 7 timed out requests must not multiply the shared RTO
+                assert connection.rto == 0.01
+
+    asyncio.run(run())
+
+
+def test_no_spurious_retransmission():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=1, latency=0.002) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                for _ in range(10):
+                    await asyncio.gather(*(connection.send_data(upload_request()) for _ in range(7)))
+                assert connection.statistics.retransmissions == 0
+                assert connection.rto == connection.rtt_estimator.min_rto
+
+    asyncio.run(run())
+
+
+def test_blocking_timeout_keeps_rto():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=1, loss=1.0) as simulator:
+            host, port = simulator.address
+            estimator = RttEstimator(initial_rto=0.01)
+            connection = BlockingEtherCATMasterConnection(host, port, retries=2, rtt_estimator=estimator)
+            loop = asyncio.get_running_loop()
+            with connection:
+                with pytest.raises(TimeoutError):
+                    await loop.run_in_executor(None, connection.send_data, upload_request())
+            assert connection.statistics.retransmissions == 2
+            assert connection.rto == 0.01
+
+    asyncio.run(run())
+
+
+def test_rate_limiter():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=1) as simulator:
+            host, port = simulator.address
+            limiter = RateLimiter(requests_per_second=100, burst_requests=5)
+            async with EtherCATMasterConnection(host, port, window=7, rate_limiter=limiter) as connection:
+                started = time.monotonic()
+                await asyncio.gather(*(connection.send_data(upload_request()) for _ in range(25)))
+                elapsed = time.monotonic() - started
+                # the burst goes out at once, the other 20 requests at 100 per second
+                assert elapsed >= 0.9 * (25 - 5) / 100
+                assert connection.statistics.throttled >= 20 - 1
+                assert connection.statistics.throttle_time > 0
+
+    asyncio.run(run())
+
+
+def test_rate_limiter_is_shared_by_per_request_connections():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=1) as simulator:
+            host, port = simulator.address
+            # slow enough that opening an endpoint per request does not refill a token
+            limiter = RateLimiter(requests_per_second=20, burst_requests=2)
+            connection = EtherCATMasterConnection(host, port, rate_limiter=limiter)
+            assert dataclasses.replace(connection).rate_limiter is limiter
+            # without open() every request uses its own endpoint, but the same limiter
+            started = time.monotonic()
+            for _ in range(10):
+                await connection.send_data(upload_request())
+            assert time.monotonic() - started >= 0.9 * (10 - 2) / 20
+            assert connection.statistics.throttled >= 8 - 1
+
+    asyncio.run(run())
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve(1, now=bucket.updated_at) == 0.0
+    assert bucket.reserve(1, now=bucket.updated_at) == 0.0
+    # tokens are borrowed in order of reservation
+    assert bucket.reserve(1, now=bucket.updated_at) == pytest.approx(0.1)
+    assert bucket.reserve(1, now=bucket.updated_at) == pytest.approx(0.2)
+    assert bucket.reserve(1, now=bucket.updated_at + 0.3) == pytest.approx(0.0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
@@ -0,0 +1,77 @@
+import asyncio
+import copy
+
+import pytest
+
+from pyetg1510 import *
+from pyetg1510.mailbox import *
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+numpy = pytest.importorskip("numpy")
+
+
+def test_columnar_profile():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=6, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+                result = await ETG1510Profile(master_od=master_od).fetch_all()
+                expected = {index: copy.deepcopy(sdo_data).values for index, sdo_data in result.items()}
+
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+                profile = ETG1510Profile(master_od=master_od, columnar=True)
+                store = profile.diagnosis_store
+                assert store.indexes == [0xA000 + address for address in range(6)]
+                result = await profile.fetch_all()
+                assert {index: sdo_data.values for index, sdo_data in result.items()} == expected
+
+                # the containers read their values from the rows of the store
+                assert result[0xA002] is store.view(0xA002)
+                assert store.data["CyclicWCErrorCounter"].tolist() == [
+                    expected[index]["CyclicWCErrorCounter"] for index in store.indexes
+                ]
+                row = store.row(0xA001)
+                assert store.data["FrameErrorCounterPort"][row].tolist() == expected[0xA001]["FrameErrorCounterPort"]
+                copied = copy.deepcopy(result[0xA001])
+                assert type(copied.ALStatus) is SdoEntry
+                assert copied.values == expected[0xA001]
+
+                assert store.data["CyclicWCErrorCounter"].any()
+                profile.sdo_database[0xF200].ResetDiagInfo.value = True
+                await profile.download(0xF200, sub_index=16)
+                await profile.fetch_all()
+                assert not store.data["CyclicWCErrorCounter"].any()
+                assert copied.values == expected[0xA001]
+
+    asyncio.run(run())
+
+
+def test_store_is_allocated_after_discovery():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=3, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                # built before the OD is collected, as in main.py
+                master_od = MasterODSpecification(connection=connection)
+                profile = ETG1510Profile(master_od=master_od, columnar=True)
+                with pytest.raises(ValueError):
+                    profile.diagnosis_store
+                await master_od.get_object_dictionary()
+                result = await profile.fetch_all()
+                store = profile.diagnosis_store
+                assert store.indexes == [0xA000, 0xA001, 0xA002]
+                assert result[0xA001] is store.view(0xA001)
+                assert store.data["CyclicWCErrorCounter"].tolist() == [
+                    result[index].CyclicWCErrorCounter.value for index in store.indexes
+                ]
+
+                # collecting the OD again creates new containers
+                await master_od.get_object_dictionary()
+                await profile.get_sdo(0xA001)
+                assert profile.diagnosis_store is not store
+                assert profile.diagnosis_store.holds(0xA001, profile.sdo_database[0xA001])
+
+    asyncio.run(run())
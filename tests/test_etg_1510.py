@@ -1,3 +1,383 @@
+import asyncio
+import copy
+
 import pytest
 
 from pyetg1510 import *
+from pyetg1510.mailbox import *
+from pyetg1510.sdo_axxx_master_diagnosis import DiagnosisData
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+
+def run_with_simulator(test, subdevices: int = 4, window: int = 7, **options):
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=subdevices, seed=1, **options) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=window) as connection:
+                await test(simulator, connection)
+
+    asyncio.run(run())
+
+
+async def discover(connection: EtherCATMasterConnection, **options) -> ETG1510Profile:
+    master_od = MasterODSpecification(connection=connection)
+    await master_od.get_object_dictionary()
+    return ETG1510Profile(master_od=master_od, **options)
+
+
+def snapshot_values(result) -> dict:
+    return {index: copy.deepcopy(sdo_data).values for index, sdo_data in result.items()}
+
+
+def test_lazy_decoding():
+    async def test(simulator, connection):
+        expected = snapshot_values(await (await discover(connection)).fetch_all())
+        profile = await discover(connection, lazy=True)
+        result = await profile.fetch_all()
+        diagnosis = result[0xA001]
+        assert isinstance(diagnosis.ALStatus, LazySdoEntry)
+        assert diagnosis.ALStatus.value_kind == SdoEntry(sub_index=0, value=0, format="H").value_kind
+        assert diagnosis.FrameErrorCounterPort.value_kind == "list"
+        # nothing is decoded until an entry is read
+        assert diagnosis._lazy_payload.decoded == {}
+        assert {index: sdo_data.values for index, sdo_data in result.items()} == expected
+
+        # a value of another kind changes the layout of the received data
+        diagnosis.ALStatus.value = [1, 2]
+        assert diagnosis._lazy_payload.stale
+
+        copied = copy.deepcopy(diagnosis)
+        assert type(copied.ALStatus) is SdoEntry
+        assert copied.ALStatus.value == [1, 2]
+        assert copied.FrameErrorCounterPort.value == expected[0xA001]["FrameErrorCounterPort"]
+
+    run_with_simulator(test)
+
+
+def test_get_many():
+    async def test(simulator, connection):
+        profile = await discover(connection)
+        expected = snapshot_values(await profile.fetch_all())
+        indexes = [0xA003, 0x1234, 0xA000, 0xA003, 0x1018]
+        results = await profile.get_many(indexes, concurrency=3)
+        assert list(results) == [0xA003, 0x1234, 0xA000, 0x1018]
+        assert isinstance(results[0x1234], KeyError)
+        assert {index: results[index].values for index in (0xA003, 0xA000, 0x1018)} == {
+            index: expected[index] for index in (0xA003, 0xA000, 0x1018)
+        }
+        with pytest.raises(ValueError):
+            await profile.get_many(indexes, concurrency=0)
+
+    run_with_simulator(test)
+
+
+def test_get_many_reports_an_upload_abort_per_index():
+    async def test(simulator, connection):
+        profile = await discover(connection)
+        del simulator.objects[0xA001]
+        results = await profile.get_many([0xA000, 0xA001, 0xA002])
+        assert isinstance(results[0xA001], ValueError)
+        assert "0x6020000" in str(results[0xA001])
+        assert not isinstance(results[0xA000], Exception)
+        assert not isinstance(results[0xA002], Exception)
+
+    run_with_simulator(test)
+
+
+def test_get_many_reports_a_timeout_per_index():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=2, seed=1) as simulator:
+            host, port = simulator.address
+            rtt_estimator = RttEstimator(initial_rto=0.1, max_rto=0.2)
+            async with EtherCATMasterConnection(
+                host, port, window=7, retries=1, rtt_estimator=rtt_estimator
+            ) as connection:
+                profile = await discover(connection)
+                simulator.loss = 1.0
+                results = await profile.get_many([0xA000, 0xA001])
+                assert all(isinstance(result, asyncio.TimeoutError) for result in results.values())
+
+                # closing the connection fails the requests in flight
+                requests = asyncio.ensure_future(profile.get_many([0xA000, 0xA001]))
+                await asyncio.sleep(0.01)
+                connection.close()
+                results = await requests
+                assert all(isinstance(result, ConnectionError) for result in results.values())
+
+    asyncio.run(run())
+
+
+def test_blocking_get_many():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=2, seed=1) as simulator:
+            host, port = simulator.address
+            del simulator.objects[0xA001]
+
+            def read():
+                with BlockingEtherCATMasterConnection(host, port) as connection:
+                    master_od = BlockingMasterODSpecification(connection=connection)
+                    master_od.get_object_dictionary()
+                    profile = BlockingETG1510Profile(master_od=master_od)
+                    return profile.get_many([0xA000, 0x1234, 0xA000])
+
+            results = await asyncio.to_thread(read)
+            assert list(results) == [0xA000, 0x1234]
+            assert not isinstance(results[0xA000], Exception)
+            assert isinstance(results[0x1234], KeyError)
+
+    asyncio.run(run())
+
+
+def test_as_completed():
+    async def test(simulator, connection):
+        profile = await discover(connection)
+        expected = snapshot_values(await profile.fetch_all())
+        received = {}
+        async for index, sdo_data in profile.as_completed(concurrency=4):
+            assert index not in received
+            received[index] = copy.deepcopy(sdo_data).values
+        assert received == expected
+
+        # closing the iteration early cancels the requests in flight
+        iteration = profile.as_completed(concurrency=4)
+        for _ in range(3):
+            await iteration.__anext__()
+        await iteration.aclose()
+        assert connection._pending == {}
+
+    run_with_simulator(test, latency=0.002, jitter=0.002)
+
+
+def test_blocking_as_completed():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=2, seed=1) as simulator:
+            host, port = simulator.address
+
+            def read():
+                with BlockingEtherCATMasterConnection(host, port) as connection:
+                    master_od = BlockingMasterODSpecification(connection=connection)
+                    master_od.get_object_dictionary()
+                    profile = BlockingETG1510Profile(master_od=master_od)
+                    return profile.sdo_index_list, list(profile.as_completed())
+
+            indexes, results = await asyncio.to_thread(read)
+            assert [index for index, _ in results] == indexes
+            assert not any(isinstance(sdo_data, Exception) for _, sdo_data in results)
+
+    asyncio.run(run())
+
+
+def test_download():
+    async def test(simulator, connection):
+        profile = await discover(connection)
+        profile.sdo_database[0xF200].ResetDiagInfo.value = True
+        await profile.download(0xF200, sub_index=16)
+        assert simulator.statistics.downloads == 1
+        result = await profile.fetch_all()
+        assert result[0xF120].CyclicLostFrames.value == 0
+        assert all(result[index].CyclicWCErrorCounter.value == 0 for index in range(0xA000, 0xA004))
+        assert result[0xF200].ResetDiagInfo.value is False
+
+        with pytest.raises(ValueError):
+            await profile.download(0x1008)
+
+    run_with_simulator(test)
+
+
+def test_download_all():
+    async def test(simulator, connection):
+        profile = await discover(connection)
+        profile.sdo_database[0xF200].ResetDiagInfo.value = True
+        downloads = [SdoDownload(0xF200, 16), SdoDownload(0x1008), SdoDownload(0x1234), SdoDownload(0xF200)]
+        results = await profile.download_all(downloads)
+        assert results == downloads
+        assert results[0].error is None and results[3].error is None
+        assert isinstance(results[1].error, ValueError)
+        assert isinstance(results[2].error, KeyError)
+        assert simulator.statistics.downloads == 2
+
+    run_with_simulator(test)
+
+
+def test_blocking_download_all():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=2, seed=1) as simulator:
+            host, port = simulator.address
+
+            def write():
+                with BlockingEtherCATMasterConnection(host, port) as connection:
+                    master_od = BlockingMasterODSpecification(connection=connection)
+                    master_od.get_object_dictionary()
+                    profile = BlockingETG1510Profile(master_od=master_od)
+                    profile.sdo_database[0xF200].ResetDiagInfo.value = True
+                    return profile.download_all([SdoDownload(0xF200, 16), SdoDownload(0x1008)])
+
+            results = await asyncio.to_thread(write)
+            assert results[0].error is None
+            assert isinstance(results[1].error, ValueError)
+            assert simulator.statistics.downloads == 1
+
+    asyncio.run(run())
+
+
+def simulated_values(simulator: MailboxGatewaySimulator, index: int) -> dict:
+    data = simulator.objects[index].data
+    return {name: getattr(data, name).value for name in data.values if getattr(data, name).enable}
+
+
+def test_object_dictionary_discovery():
+    async def test(simulator, connection):
+        master_od = MasterODSpecification(connection=connection)
+        await master_od.get_object_dictionary()
+        indexes = list(master_od.sdo_data_entity.entries)
+        assert indexes == sorted(indexes)
+        assert [0xA000 + address for address in range(4)] == [index for index in indexes if index & 0xF000 == 0xA000]
+        assert {0x1018, 0xF120, 0xF200} <= set(indexes)
+        for index in indexes:
+            assert master_od.max_sub_indexes[index] == simulator.objects[index].max_sub_index
+
+    run_with_simulator(test)
+
+
+def test_profile_iteration():
+    async def test(simulator, connection):
+        profile = await discover(connection)
+        iterated = [(index, copy.deepcopy(sdo_data).values) async for index, sdo_data in profile]
+        assert [index for index, _ in iterated] == profile.sdo_index_list
+        for index, values in iterated:
+            expected = simulated_values(simulator, index)
+            assert {name: values[name] for name in expected} == expected
+        # the iteration starts over
+        assert [index async for index, _ in profile] == profile.sdo_index_list
+        assert snapshot_values(await profile.fetch_all()) == dict(iterated)
+
+        watched = await discover(connection, watch_index_list=[0xA002, 0xF120])
+        assert [index async for index, _ in watched] == [0xA002, 0xF120]
+
+    run_with_simulator(test)
+
+
+def test_blocking_profile_iteration():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=2, seed=1) as simulator:
+            host, port = simulator.address
+
+            def read():
+                with BlockingEtherCATMasterConnection(host, port) as connection:
+                    master_od = BlockingMasterODSpecification(connection=connection)
+                    master_od.get_object_dictionary()
+                    profile = BlockingETG1510Profile(master_od=master_od)
+                    return profile.sdo_index_list, [
+                        (index, copy.deepcopy(sdo_data).values) for index, sdo_data in profile
+                    ]
+
+            indexes, iterated = await asyncio.to_thread(read)
+            assert [index for index, _ in iterated] == indexes
+            for index, values in iterated:
+                expected = simulated_values(simulator, index)
+                assert {name: values[name] for name in expected} == expected
+
+            # the asynchronous iteration of ETG1510Profile is not inherited
+            profile = BlockingETG1510Profile(master_od=BlockingMasterODSpecification(connection=None))
+            with pytest.raises(TypeError):
+                async for _ in profile:
+                    pass
+            with pytest.raises(TypeError):
+                await profile.__anext__()
+            assert profile.watch_address == 0
+
+    asyncio.run(run())
+
+
+def test_in_place():
+    async def test(simulator, connection):
+        expected = snapshot_values(await (await discover(connection)).fetch_all())
+        profile = await discover(connection, in_place=True)
+        result = await profile.fetch_all()
+        assert snapshot_values(result) == expected
+        counters = result[0xA001].FrameErrorCounterPort.value
+        addresses = result[0xF020].ConfiguredAddress.value
+        assert any(counters)
+
+        # the next fetch writes the received values into the same lists
+        profile.sdo_database[0xF200].ResetDiagInfo.value = True
+        await profile.download(0xF200, sub_index=16)
+        result = await profile.fetch_all()
+        assert result[0xA001].FrameErrorCounterPort.value is counters
+        assert result[0xF020].ConfiguredAddress.value is addresses
+        assert counters == simulated_values(simulator, 0xA001)["FrameErrorCounterPort"]
+        assert not any(counters)
+
+    run_with_simulator(test)
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True}, {"in_place": True}, {"columnar": True}])
+def test_track_changes(options):
+    if options.get("columnar"):
+        pytest.importorskip("numpy")
+
+    async def test(simulator, connection):
+        profile = await discover(connection, track_changes=True, **options)
+        first = dict([change async for change in profile.changes()])
+        assert list(first) == profile.sdo_index_list
+        assert first[0xA001] == simulated_values(simulator, 0xA001)
+        assert [change async for change in profile.changes()] == []
+
+        profile.sdo_database[0xF200].ResetDiagInfo.value = True
+        await profile.download(0xF200, sub_index=16)
+        changes = dict([change async for change in profile.changes()])
+        # a written object counts as new: every entry is yielded with the device's value
+        assert changes[0xF200] == simulated_values(simulator, 0xF200)
+        assert changes[0xF200]["ResetDiagInfo"] is False
+        assert changes[0xA001]["CyclicWCErrorCounter"] == 0
+        assert "ALStatus" not in changes[0xA001]
+        diagnosis = profile.sdo_database[0xA001]
+        assert diagnosis.CyclicWCErrorCounter.changed and not diagnosis.ALStatus.changed
+        assert [change async for change in profile.changes()] == []
+
+    run_with_simulator(test)
+
+
+def test_changes_requires_track_changes():
+    async def test(simulator, connection):
+        profile = await discover(connection)
+        with pytest.raises(ValueError):
+            [change async for change in profile.changes()]
+
+    run_with_simulator(test, subdevices=1)
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True}, {"track_changes": True}, {"columnar": True}])
+def test_snapshot_all(options):
+    if options.get("columnar"):
+        pytest.importorskip("numpy")
+
+    async def test(simulator, connection):
+        profile = await discover(connection, **options)
+        snapshots = await profile.snapshot_all()
+        assert list(snapshots) == profile.sdo_index_list
+        before = {index: simulated_values(simulator, index) for index in snapshots}
+        assert {index: snapshot.values for index, snapshot in snapshots.items()} == before
+
+        profile.sdo_database[0xF200].ResetDiagInfo.value = True
+        await profile.download(0xF200, sub_index=16)
+        current = await profile.snapshot_all()
+        # the earlier snapshots keep the values they were taken with
+        assert {index: snapshot.values for index, snapshot in snapshots.items()} == before
+        assert current[0xA001]["CyclicWCErrorCounter"] == 0 != snapshots[0xA001]["CyclicWCErrorCounter"]
+
+        snapshot = snapshots[0xA001]
+        assert "ALStatus" in snapshot and "X" not in snapshot
+        assert snapshot.get("X", 1) == 1
+        with pytest.raises(KeyError):
+            snapshot["X"]
+        sdo_data = snapshot.to_sdo_data()
+        assert type(sdo_data) is snapshot.container
+        assert {name: sdo_data.values[name] for name in snapshot.fields} == before[0xA001]
+
+    run_with_simulator(test)
+
+
+def test_snapshot_requires_a_response():
+    with pytest.raises(ValueError):
+        DiagnosisData().snapshot()
@@ -0,0 +1,104 @@
+import pytest
+
+from pyetg1510.mailbox import *
+from pyetg1510.mailbox.mailbox_gateway import CoEHeader, EtherCATHeader
+
+# EtherCAT header: Length 16, Type 5 (mailbox) / Mailbox header: Length 10, Address 0, Type 3 (CoE), Cnt 2
+# CoE header: Service 2 (SDO request)
+SDO_REQUEST_HEADER = bytes.fromhex("1050 0a00 0000 00 23 0020")
+
+
+def test_header_bitfields():
+    # Length 11 bits, Reserved 1 bit, DataType 4 bits (5: mailbox)
+    assert bytes(EtherCATHeader(Length=16, Reserved=0, DataType=5)) == bytes.fromhex("1050")
+    assert EtherCATHeader.from_buffer_copy(bytes.fromhex("1050")).DataType == 5
+    # Number 9 bits, Reserved 3 bits, Service 4 bits (2: SDO request, 3: SDO response)
+    assert bytes(CoEHeader(Number=0, Reserved=0, Service=2)) == bytes.fromhex("0020")
+    assert CoEHeader.from_buffer_copy(bytes.fromhex("0030")).Service == 3
+
+
+def test_make_header_frame():
+    message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
+    assert message.make_header_frame(8) == SDO_REQUEST_HEADER
+    assert message.session_counter == 2
+    assert message.make_header_frame(8, increase_session=False) == SDO_REQUEST_HEADER
+
+
+def test_make_header_frame_session_counter_wraps():
+    message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
+    counters = []
+    for _ in range(8):
+        counters.append(message.make_header_frame(8)[7] >> 4)
+    assert counters == [2, 3, 4, 5, 6, 7, 1, 2]
+
+
+def test_make_header_frame_rejects_invalid_session_counter():
+    message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
+    message.session_counter = 8
+    with pytest.raises(ValueError):
+        message.make_header_frame(8)
+
+
+def test_upload_request_frame():
+    message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
+    message.sdo_command_data = None
+    message.index = 0x1018
+    message.sub_index = 1
+    # SDO header: Command 2 (upload request), Index 0x1018, SubIndex 1
+    assert message.make_request_frame() == SDO_REQUEST_HEADER + bytes.fromhex("40 1810 01 00000000")
+
+
+def test_upload_request_frame_complete_access():
+    message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
+    message.sdo_command_data = None
+    message.index = 0xF020
+    message.sub_index = 0
+    message.complete_access = True
+    assert message.make_request_frame() == SDO_REQUEST_HEADER + bytes.fromhex("50 20f0 00 00000000")
+
+
+def test_od_list_request_frame():
+    message = SDORequestInfoMessage(sdo_service=SdoService.INFO, opcode=SdoInfoOpcode.GET_OD_LIST_REQ)
+    message.sdo_command_data = SDOInformationODListRequest()
+    # Length 14 / 8, CoE Service 8 (SDO information), Opcode 1, ListType 1 (all objects)
+    assert message.make_request_frame() == bytes.fromhex("0e50 0800 0000 00 23 0080 01 00 0000 0100")
+
+
+def test_entry_description_request_frame():
+    message = SDORequestInfoMessage(sdo_service=SdoService.INFO, opcode=SdoInfoOpcode.GET_ENTRY_REQ)
+    message.sdo_command_data = SDOInformationEntryRequest()
+    message.index = 0x8001
+    message.sub_index = 5
+    assert message.make_request_frame() == bytes.fromhex("1050 0a00 0000 00 23 0080 05 00 0000 0180 05 7f")
+
+
+def test_expedited_download_request_frame():
+    message = SDODownloadMessage(sdo_service=SdoService.REQUEST)
+    message.index = 0xF002
+    message.sub_index = 1
+    message.data = b"\x01\x00"
+    # Size indicated, expedited, 2 unused bytes, Command 1 (download request)
+    assert message.make_request_frame() == SDO_REQUEST_HEADER + bytes.fromhex("2b 02f0 01 01000000")
+
+
+def test_normal_download_request_frame():
+    message = SDODownloadMessage(sdo_service=SdoService.REQUEST)
+    message.index = 0x8001
+    message.sub_index = 0
+    message.complete_access = True
+    message.data = bytes(range(6))
+    assert message.make_request_frame() == bytes.fromhex("1650 1000 0000 00 23 0020 31 0180 00 06000000 000102030405")
+
+
+def test_response_frame_round_trip():
+    message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
+    message.sdo_command_data = None
+    message.index = 0x1018
+    message.sub_index = 1
+    response = SDOResponseMessage(sdo_service=SdoService.RESPONSE)
+    response.parse_response_frame(message.make_request_frame())
+    assert response.ethercat_header.Length == 16
+    assert response.ethercat_header.DataType == EtherCATProtocolType.MAILBOX.value
+    assert response.mailbox_header.Cnt == 2
+    assert response.coe_header.Service == SdoService.REQUEST.value
+    assert bytes(response.data_body) == bytes(4)
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from pyetg1510.mailbox import *
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+pytestmark = pytest.mark.skipif(not MMSG_SUPPORTED, reason="sendmmsg/recvmmsg are only available on Linux")
+
+
+def number_of_subdevices_request() -> bytes:
+    message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
+    message.sdo_command_data = None
+    message.index = 0xF020
+    message.sub_index = 0
+    return message.make_request_frame()
+
+
+def test_shared_endpoint_batches_across_gateways():
+    async def run():
+        simulators = [MailboxGatewaySimulator(subdevices=n) for n in (1, 2, 3)]
+        addresses = [await simulator.start() for simulator in simulators]
+        endpoint = MmsgEndpoint()
+        connections = [
+            EtherCATMasterConnection(host, port, window=7, backend=TransportBackend.MMSG, mmsg_endpoint=endpoint)
+            for host, port in addresses
+        ]
+        try:
+            for connection in connections:
+                await connection.open()
+            results = await asyncio.gather(
+                *(connection.send_data(number_of_subdevices_request()) for connection in connections for _ in range(7))
+            )
+            # each reply goes back to the connection of the gateway that sent it
+            values = [result[14] for result in results]
+            assert values == [1] * 7 + [2] * 7 + [3] * 7
+            # 21 requests from 3 connections go out in one system call
+            assert endpoint.sent == 21
+            assert endpoint.send_calls == 1
+            assert endpoint.received == 21
+        finally:
+            for connection in connections:
+                connection.close()
+            for simulator in simulators:
+                simulator.close()
+        assert not endpoint.is_open
+
+    asyncio.run(run())
+
+
+def test_private_endpoint():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=4) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7, backend=TransportBackend.MMSG) as connection:
+                results = await asyncio.gather(
+                    *(connection.send_data(number_of_subdevices_request()) for _ in range(7))
+                )
+                assert all(result[14] == 4 for result in results)
+            assert not connection.is_open
+
+    asyncio.run(run())
+
+
+def test_endpoint_rejects_second_transport_to_same_gateway():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=1) as simulator:
+            host, port = simulator.address
+            endpoint = MmsgEndpoint()
+            first = EtherCATMasterConnection(host, port, backend=TransportBackend.MMSG, mmsg_endpoint=endpoint)
+            second = EtherCATMasterConnection(host, port, backend=TransportBackend.MMSG, mmsg_endpoint=endpoint)
+            async with first:
+                with pytest.raises(ValueError):
+                    await second.open()
+            assert not endpoint.is_open
+
+    asyncio.run(run())
+
+
+def test_endpoint_requires_mmsg_backend():
+    with pytest.raises(ValueError):
+        EtherCATMasterConnection("127.0.0.1", 34980, mmsg_endpoint=MmsgEndpoint())
@@ -0,0 +1,119 @@
+import asyncio
+import dataclasses
+import json
+
+from pyetg1510 import *
+from pyetg1510.mailbox import *
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+
+def snapshot(result: dict) -> dict:
+    return {index: dataclasses.asdict(sdo_data) for index, sdo_data in result.items()}
+
+
+def entries(master_od) -> dict:
+    return snapshot(master_od.sdo_data_entity.entries)
+
+
+async def discover(connection, od_cache=None):
+    master_od = MasterODSpecification(connection=connection, od_cache=od_cache)
+    requests = connection.statistics.requests
+    await master_od.get_object_dictionary()
+    return master_od, connection.statistics.requests - requests
+
+
+def test_miss_then_hit(tmp_path):
+    path = str(tmp_path / "od" / "cache.json")
+
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=8, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                expected, scan_requests = await discover(connection)
+                missed, miss_requests = await discover(connection, ObjectDictionaryCache(path))
+                # the full scan plus the identity object
+                assert miss_requests == scan_requests + 1
+                assert entries(missed) == entries(expected)
+
+                hit, hit_requests = await discover(connection, ObjectDictionaryCache(path))
+                # OD list and identity object only
+                assert hit_requests == 2
+                assert entries(hit) == entries(expected)
+                assert hit.max_sub_indexes == expected.max_sub_indexes
+                assert snapshot(await ETG1510Profile(master_od=hit).fetch_all()) == snapshot(
+                    await ETG1510Profile(master_od=expected).fetch_all()
+                )
+
+    asyncio.run(run())
+
+
+def test_other_topology_and_broken_file(tmp_path):
+    path = str(tmp_path / "cache.json")
+
+    async def run():
+        for subdevices in (2, 3):
+            async with MailboxGatewaySimulator(subdevices=subdevices, seed=1) as simulator:
+                host, port = simulator.address
+                async with EtherCATMasterConnection(host, port, window=7) as connection:
+                    _, requests = await discover(connection, ObjectDictionaryCache(path))
+                    assert requests > 2
+        with open(path, encoding="utf-8") as fp:
+            assert len(json.load(fp)) == 2
+
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write("{broken")
+        async with MailboxGatewaySimulator(subdevices=2, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                _, requests = await discover(connection, ObjectDictionaryCache(path))
+                assert requests > 2
+        with open(path, encoding="utf-8") as fp:
+            assert len(json.load(fp)) == 1
+
+    asyncio.run(run())
+
+
+def test_unreadable_identity_skips_the_cache(tmp_path):
+    path = str(tmp_path / "cache.json")
+
+    async def timeout(*args, **kwargs):
+        raise asyncio.TimeoutError()
+
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=2, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection, od_cache=ObjectDictionaryCache(path))
+                master_od.identity_handler.fetch = timeout
+                await master_od.get_object_dictionary()
+                assert master_od.sdo_data_entity.entries
+
+    asyncio.run(run())
+    assert not (tmp_path / "cache.json").exists()
+
+
+def test_blocking_hit(tmp_path):
+    path = str(tmp_path / "cache.json")
+
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=2, seed=1) as simulator:
+            host, port = simulator.address
+
+            def read():
+                with BlockingEtherCATMasterConnection(host, port) as connection:
+                    results = []
+                    for _ in range(2):
+                        master_od = BlockingMasterODSpecification(
+                            connection=connection, od_cache=ObjectDictionaryCache(path)
+                        )
+                        requests = connection.statistics.requests
+                        master_od.get_object_dictionary()
+                        results.append((entries(master_od), connection.statistics.requests - requests))
+                    return results
+
+            (missed, miss_requests), (hit, hit_requests) = await asyncio.to_thread(read)
+            assert hit == missed
+            assert miss_requests > 2
+            assert hit_requests == 2
+
+    asyncio.run(run())
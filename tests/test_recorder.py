@@ -0,0 +1,90 @@
+import asyncio
+import dataclasses
+import time
+
+import pytest
+
+from pyetg1510 import *
+from pyetg1510.mailbox import *
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+
+def upload_request(index: int = 0x1000, sub_index: int = 0) -> bytes:
+    message = SDOCommandMessage(sdo_service=SdoService.REQUEST)
+    message.sdo_command_data = None
+    message.index = index
+    message.sub_index = sub_index
+    return message.make_request_frame()
+
+
+def without_counter(frame: bytes) -> bytes:
+    frame = bytearray(frame)
+    set_session_counter(frame, 0)
+    return bytes(frame)
+
+
+async def collect(connection) -> tuple:
+    master_od = MasterODSpecification(connection=connection)
+    await master_od.get_object_dictionary()
+    result = await ETG1510Profile(master_od=master_od).fetch_all()
+    entries = {index: dataclasses.asdict(sdo_data) for index, sdo_data in master_od.sdo_data_entity.entries.items()}
+    return entries, master_od.max_sub_indexes, {index: sdo_data.values for index, sdo_data in result.items()}
+
+
+def test_record_and_replay(tmp_path):
+    path = tmp_path / "session.etgrec.gz"
+
+    async def run():
+        # small mailbox: the record also holds segments and fragments
+        async with MailboxGatewaySimulator(subdevices=4, mailbox_size=32, seed=1) as simulator:
+            host, port = simulator.address
+            with SessionRecorder(path) as recorder:
+                async with EtherCATMasterConnection(host, port, window=7, recorder=recorder) as connection:
+                    recorded = await collect(connection)
+            assert recorder.count == connection.statistics.responses
+
+        # no socket from here on
+        connection = ReplayConnection.load(path, speed=None, window=7)
+        assert await collect(connection) == recorded
+        assert connection.statistics.responses == recorder.count
+
+        with pytest.raises(KeyError):
+            await ReplayConnection.load(path, speed=None).send_data(upload_request(0x1234))
+
+    asyncio.run(run())
+
+
+def test_replay_keeps_the_recorded_request_gaps(tmp_path):
+    path = tmp_path / "session.etgrec"
+
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=1) as simulator:
+            host, port = simulator.address
+            with SessionRecorder(path) as recorder:
+                async with EtherCATMasterConnection(host, port, recorder=recorder) as connection:
+                    expected = [await connection.send_data(upload_request())]
+                    await asyncio.sleep(0.3)
+                    expected.append(await connection.send_data(upload_request(0x1018, 1)))
+
+        for speed, gap in ((1.0, 0.3), (3.0, 0.1)):
+            connection = ReplayConnection.load(path, speed=speed)
+            started = time.perf_counter()
+            responses = [
+                await connection.send_data(upload_request()),
+                await connection.send_data(upload_request(0x1018, 1)),
+            ]
+            assert time.perf_counter() - started >= 0.9 * gap
+            # the Cnt follows the replayed request
+            assert [without_counter(response) for response in responses] == [
+                without_counter(response) for response in expected
+            ]
+
+        # later passes of a looped record replay the round trip times only
+        connection = ReplayConnection.load(path, speed=1.0)
+        await connection.send_data(upload_request())
+        await connection.send_data(upload_request(0x1018, 1))
+        started = time.perf_counter()
+        await connection.send_data(upload_request(0x1018, 1))
+        assert time.perf_counter() - started < 0.2
+
+    asyncio.run(run())
@@ -0,0 +1,260 @@
+import asyncio
+import copy
+import dataclasses
+
+from pyetg1510 import *
+from pyetg1510.mailbox import *
+from pyetg1510.sdo_axxx_master_diagnosis import DiagnosisDataFormat
+from pyetg1510.simulator import MailboxGatewaySimulator
+
+
+def test_concurrent_fetch_on_one_controller():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=8, latency=0.001, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+                profile = ETG1510Profile(master_od=master_od)
+                indexes = profile.sdo_index_list
+                expected = {index: copy.deepcopy(await profile.get_sdo(index)).values for index in indexes}
+
+                controller = SdoDataController(session=connection)
+                containers = {index: copy.deepcopy(profile.sdo_database[index]) for index in indexes}
+                transactions = await asyncio.gather(
+                    *(
+                        controller.fetch(
+                            MasterDiagnosisMetadataMapper.find(index).metadata.for_request(index), containers[index]
+                        )
+                        for index in indexes
+                    )
+                )
+                for index, transaction in zip(indexes, transactions):
+                    assert isinstance(transaction, SdoTransaction)
+                    assert transaction.sdo_metadata.index == index
+                    assert transaction.sdo_data is containers[index]
+                    assert transaction.sdo_data.values == expected[index]
+                # per-request state stays in the transactions
+                for name in (
+                    "sdo_data",
+                    "request_message",
+                    "response_message",
+                    "data_body_size",
+                    "segmented_upload",
+                    "index_counter",
+                    "session_counter",
+                ):
+                    assert not hasattr(controller, name)
+                # the connection sets the Cnt, the cached frames are sent as they are
+                assert controller.frame_cache.misses == len(indexes)
+                assert connection.statistics.retransmissions == 0
+
+    asyncio.run(run())
+
+
+def test_metadata_for_request():
+    metadata = DiagnosisDataFormat.for_request(0xA005, 3, max_sub_index=12)
+    assert (metadata.index, metadata.sub_index, metadata.max_sub_index) == (0xA005, 3, 12)
+    assert metadata.response_container is DiagnosisDataFormat.response_container
+    default = DiagnosisDataFormat.for_request(0xA005)
+    assert (default.sub_index, default.max_sub_index) == (
+        DiagnosisDataFormat.sub_index,
+        DiagnosisDataFormat.max_sub_index,
+    )
+    assert DiagnosisDataFormat.index == 0xA000
+
+
+def test_frame_cache_is_per_controller():
+    first = SdoDataController(session=None)
+    second = SdoDataController(session=None)
+    assert first.frame_cache is not second.frame_cache
+    shared = RequestFrameCache(maxsize=16)
+    assert SdoDataController(session=None, frame_cache=shared).frame_cache is shared
+    assert SdoDataController(session=None, frame_cache=None).frame_cache is None
+    frame = shared.get("key", lambda: b"frame")
+    assert shared.get("key", lambda: b"other") is frame
+    assert (shared.hits, shared.misses) == (1, 1)
+
+
+def test_discovery_leaves_shared_metadata_untouched():
+    async def run():
+        before = dataclasses.astuple(DiagnosisDataFormat)
+        async with MailboxGatewaySimulator(subdevices=3, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+                profile = ETG1510Profile(master_od=master_od)
+                max_sub_index = master_od.max_sub_indexes[0xA001]
+                assert max_sub_index == simulator.objects[0xA001].max_sub_index
+                assert profile._metadata(0xA001).max_sub_index == max_sub_index
+        assert dataclasses.astuple(DiagnosisDataFormat) == before
+
+    asyncio.run(run())
+
+
+def simulated_values(simulator: MailboxGatewaySimulator, index: int) -> dict:
+    data = simulator.objects[index].data
+    return {name: getattr(data, name).value for name in data.values if getattr(data, name).enable}
+
+
+def test_segmented_upload():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=20, mailbox_size=32, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+                profile = ETG1510Profile(master_od=master_od)
+                controller = SdoDataController(session=connection)
+
+                transaction = await controller.fetch(profile._metadata(0xF020), profile.sdo_database[0xF020])
+                upload = transaction.segmented_upload
+                assert upload is not None and upload.completed
+                assert upload.segments > 0 and upload.received == upload.size
+                assert transaction.sdo_data.values == simulated_values(simulator, 0xF020)
+                transaction = await controller.fetch(profile._metadata(0x1018), profile.sdo_database[0x1018])
+                assert transaction.segmented_upload is None
+
+                segments = simulator.statistics.segments
+                result = await profile.fetch_all()
+                assert simulator.statistics.segments > segments
+                for index, sdo_data in result.items():
+                    expected = simulated_values(simulator, index)
+                    assert {name: sdo_data.values[name] for name in expected} == expected
+
+    asyncio.run(run())
+
+
+def test_response_body_is_copied_only_from_a_reassembled_buffer():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=20, mailbox_size=32, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+                profile = ETG1510Profile(master_od=master_od)
+                controller = SdoDataController(session=connection)
+
+                # decoded straight from the received frame
+                transaction = await controller.fetch(profile._metadata(0x1018), profile.sdo_database[0x1018])
+                _, raw_data = transaction.sdo_data._fetched
+                assert isinstance(raw_data, memoryview) and raw_data.readonly
+                assert raw_data.obj is transaction.response_message.data_body.obj
+                snapshot = transaction.sdo_data.snapshot()
+                assert type(snapshot.raw_data) is bytes and snapshot.values == transaction.sdo_data.values
+                assert copy.deepcopy(transaction.sdo_data).values == transaction.sdo_data.values
+
+                # the segments are reassembled in a bytearray
+                transaction = await controller.fetch(profile._metadata(0xF020), profile.sdo_database[0xF020])
+                _, raw_data = transaction.sdo_data._fetched
+                assert type(raw_data) is bytes
+                transaction.segmented_upload.buffer[:] = bytes(len(raw_data))
+                assert transaction.sdo_data.snapshot().values == simulated_values(simulator, 0xF020)
+
+    asyncio.run(run())
+
+
+def test_blocking_segmented_upload():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=20, mailbox_size=32, seed=1) as simulator:
+            host, port = simulator.address
+
+            def read():
+                with BlockingEtherCATMasterConnection(host, port) as connection:
+                    master_od = BlockingMasterODSpecification(connection=connection)
+                    master_od.get_object_dictionary()
+                    profile = BlockingETG1510Profile(master_od=master_od)
+                    controller = BlockingSdoDataController(session=connection)
+                    return controller.fetch(profile._metadata(0xF020), profile.sdo_database[0xF020])
+
+            transaction = await asyncio.to_thread(read)
+            assert transaction.segmented_upload is not None and transaction.segmented_upload.completed
+            assert transaction.sdo_data.values == simulated_values(simulator, 0xF020)
+
+    asyncio.run(run())
+
+
+def discovered(master_od) -> tuple:
+    entries = {index: dataclasses.asdict(sdo_data) for index, sdo_data in master_od.sdo_data_entity.entries.items()}
+    return entries, master_od.max_sub_indexes
+
+
+def test_fragmented_information_responses():
+    async def discover(mailbox_size):
+        async with MailboxGatewaySimulator(subdevices=8, mailbox_size=mailbox_size, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+                return discovered(master_od), simulator.statistics.fragments
+
+    async def run():
+        expected, fragments = await discover(None)
+        assert fragments == 0
+        for mailbox_size in (16, 32):
+            result, fragments = await discover(mailbox_size)
+            assert fragments > 0
+            assert result == expected
+
+    asyncio.run(run())
+
+
+def test_blocking_fragmented_information_responses():
+    async def run():
+        async with MailboxGatewaySimulator(subdevices=8, seed=1) as simulator:
+            host, port = simulator.address
+            async with EtherCATMasterConnection(host, port, window=7) as connection:
+                master_od = MasterODSpecification(connection=connection)
+                await master_od.get_object_dictionary()
+                expected = discovered(master_od)
+
+        async with MailboxGatewaySimulator(subdevices=8, mailbox_size=32, seed=1) as simulator:
+            host, port = simulator.address
+
+            def read():
+                with BlockingEtherCATMasterConnection(host, port) as connection:
+                    master_od = BlockingMasterODSpecification(connection=connection)
+                    master_od.get_object_dictionary()
+                    return discovered(master_od)
+
+            assert await asyncio.to_thread(read) == expected
+            assert simulator.statistics.fragments > 0
+
+    asyncio.run(run())
+
+
+def linear_find(mapper: type, index: int):
+    return next((m for m in mapper.members().values() if m.index_range[0] <= index <= m.index_range[1]), None)
+
+
+def test_mapping_table_matches_a_linear_scan():
+    mapper = MasterDiagnosisMetadataMapper
+    assert all(mapper.find(index) is linear_find(mapper, index) for index in range(0x10000))
+    table = mapper.mapping_table()
+    assert list(table.starts) == sorted(table.starts)
+    assert mapper.mapping_table() is table
+
+
+def test_mapping_table_of_a_subclass():
+    class VendorMetadataMapper(MasterDiagnosisMetadataMapper):
+        vendor = MappingMember(index_range=(0x2000, 0x2FFF), metadata=DeviceTypeFormat)
+        inner = MappingMember(index_range=(0xA010, 0xA01F), metadata=DeviceTypeFormat)
+
+    base = MasterDiagnosisMetadataMapper
+    assert VendorMetadataMapper.find(0x2100) is VendorMetadataMapper.vendor
+    assert base.find(0x2100) is None
+    # the subclass takes priority inside the base class range
+    assert VendorMetadataMapper.find(0xA015) is VendorMetadataMapper.inner
+    assert VendorMetadataMapper.find(0xA00F) is base.diagnosis_data
+    assert VendorMetadataMapper.find(0xA020) is base.diagnosis_data
+    assert all(
+        VendorMetadataMapper.find(index) is linear_find(VendorMetadataMapper, index) for index in range(0x10000)
+    )
+
+    # a definition added later rebuilds the table
+    VendorMetadataMapper.late = MappingMember(index_range=(0x3000, 0x3000), metadata=DeviceTypeFormat)
+    assert VendorMetadataMapper.find(0x3000) is VendorMetadataMapper.late
+    del VendorMetadataMapper.late
+    assert VendorMetadataMapper.find(0x3000) is None
+    assert base.find(0x3000) is None